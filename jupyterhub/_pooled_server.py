@@ -0,0 +1,101 @@
+"""Pre-started single-user server process for LocalProcessSpawner's server pool
+
+Imports the single-user server ahead of time,
+then waits for the Hub to assign it to a user,
+by sending one JSON line on stdin with:
+
+- username: the user to run the server as
+- module: the module to run as the server
+- argv: the command line the server would have been launched with
+- env: the environment of the server
+
+If stdin is closed without an assignment, exits without starting a server.
+
+.. versionadded:: 2.3
+"""
+import json
+import os
+import runpy
+import site
+import sys
+
+
+def warm_up():
+    """Import the slow parts of starting a single-user server
+
+    The single-user server picks its Application class from the environment
+    when it is imported, so only import what it is built on
+    until the environment is known.
+    """
+    # for dropping privileges like LocalProcessSpawner does
+    import jupyterhub.spawner  # noqa
+
+    app = os.environ.get("JUPYTERHUB_SINGLEUSER_APP")
+    if app:
+        names = [app.rpartition('.')[0]]
+    else:
+        names = ["jupyter_server.serverapp", "notebook.notebookapp"]
+    for name in names:
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        else:
+            break
+
+
+def reset_user_site():
+    """Replace the Hub user's site-packages with the assigned user's
+
+    The user's site-packages depends on $HOME and the uid,
+    which have both changed since the interpreter started.
+    """
+    old_site = site.USER_SITE
+    if old_site in sys.path:
+        index = sys.path.index(old_site)
+        sys.path.remove(old_site)
+    else:
+        # where the interpreter would have put it, before the system site-packages
+        system_sites = [path for path in site.getsitepackages() if path in sys.path]
+        if system_sites:
+            index = sys.path.index(system_sites[0])
+        else:
+            index = len(sys.path)
+    site.USER_BASE = None
+    site.USER_SITE = None
+    site.ENABLE_USER_SITE = site.check_enableusersite()
+    if not site.ENABLE_USER_SITE:
+        return
+    before = list(sys.path)
+    site.addusersitepackages(set(sys.path))
+    added = [path for path in sys.path if path not in before]
+    sys.path[:] = before[:index] + added + before[index:]
+
+
+def main():
+    warm_up()
+    line = sys.stdin.readline()
+    if not line.strip():
+        # not assigned
+        return
+    assignment = json.loads(line)
+
+    # the server doesn't read from the Hub's pipe
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+    from jupyterhub.spawner import set_user_setuid
+
+    set_user_setuid(assignment['username'])()
+    os.environ.clear()
+    os.environ.update(assignment['env'])
+    reset_user_site()
+    sys.argv = assignment['argv']
+    # run like `python -m module` from the user's home directory
+    sys.path[0] = os.getcwd()
+    runpy.run_module(assignment['module'], run_name='__main__', alter_sys=True)
+
+
+if __name__ == '__main__':
+    main()
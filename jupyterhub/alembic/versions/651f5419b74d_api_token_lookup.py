@@ -0,0 +1,34 @@
+"""Add APIToken.lookup for indexed lookup of generated tokens
+
+Revision ID: 651f5419b74d
+Revises: 833da8570507
+Create Date: 2026-10-18 11:20:31.561354
+
+"""
+# revision identifiers, used by Alembic.
+revision = '651f5419b74d'
+down_revision = '833da8570507'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    engine = op.get_bind().engine
+    tables = sa.inspect(engine).get_table_names()
+    if 'api_tokens' in tables:
+        op.add_column(
+            'api_tokens', sa.Column('lookup', sa.Unicode(length=64), nullable=True)
+        )
+        op.create_index(
+            op.f('ix_api_tokens_lookup'), 'api_tokens', ['lookup'], unique=False
+        )
+    # lookup keys can't be computed from stored hashes.
+    # They are backfilled by APIToken.find the first time each token is used.
+
+
+def downgrade():
+    op.drop_index(op.f('ix_api_tokens_lookup'), table_name='api_tokens')
+    op.drop_column('api_tokens', 'lookup')
@@ -1,8 +1,10 @@
 """Authorization handlers"""
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
+import hashlib
 import itertools
 import json
+import time
 from datetime import datetime
 from urllib.parse import parse_qsl
 from urllib.parse import quote
@@ -16,6 +18,7 @@ from tornado import web
 from .. import orm
 from .. import roles
 from .. import scopes
+from ..scopes import needs_scope
 from ..utils import get_browser_protocol
 from ..utils import token_authenticated
 from .base import APIHandler
@@ -64,6 +67,110 @@ class TokenAPIHandler(APIHandler):
         )
 
 
+class TokenOwnerMixin:
+    """Mixin for handlers getting models for the owners of tokens
+    other than the one making the request
+
+    .. versionadded:: 2.3
+    """
+
+    def token_owner_model(self, orm_token):
+        """The /api/user model for a token's owner
+
+        As seen by the token itself.
+        """
+        if orm_token.service:
+            owner = orm_token.service
+            get_model = self.service_model
+        else:
+            owner = self.users[orm_token.user]
+            get_model = self.user_model
+
+        expanded_scopes, parsed_scopes = scopes.get_cached_scopes_for(orm_token)
+        # ensure the token can identify its owner, as in /api/user
+        added_scopes = scopes.identify_scopes(
+            orm_token.user or orm_token.service
+        ).difference(expanded_scopes)
+        if added_scopes:
+            expanded_scopes = expanded_scopes | added_scopes
+            parsed_scopes = scopes.parse_scopes(expanded_scopes)
+
+        request_scopes = (self.expanded_scopes, self.parsed_scopes)
+        self.expanded_scopes, self.parsed_scopes = expanded_scopes, parsed_scopes
+        # scope filters are cached for the handler's scopes,
+        # which are only the token's scopes while building its model
+        self.get_scope_filter.cache_clear()
+        try:
+            model = get_model(owner)
+        finally:
+            self.expanded_scopes, self.parsed_scopes = request_scopes
+            self.get_scope_filter.cache_clear()
+        model["session_id"] = orm_token.session_id
+        model["scopes"] = sorted(expanded_scopes.difference(added_scopes))
+        return model
+
+
+class TokenOwnersAPIHandler(TokenOwnerMixin, APIHandler):
+    """Identify the owners of many tokens in one request
+
+    For services authenticating many users,
+    which would otherwise make one request to /api/user per token.
+    Each token is resolved as if it had been used to request /api/user.
+    Because the reply reveals which tokens are valid,
+    this requires the `read:tokens:owners` scope,
+    which can only be used by services.
+
+    .. versionadded:: 2.3
+    """
+
+    # the maximum number of tokens in one request
+    max_tokens = 100
+
+    @needs_scope('read:tokens:owners')
+    async def post(self):
+        """Identify the owner of each token
+
+        Request body: `{"tokens": ["token1", "token2", ...]}`
+
+        Reply: `{"owners": [model1, null, ...]}`,
+        with the /api/user model for each token, in order,
+        or null if the token is not valid.
+
+        Looking up a token doesn't count as activity for the token or its owner.
+        """
+        if not isinstance(self.current_user, orm.Service):
+            raise web.HTTPError(403, "Only services may identify tokens in bulk")
+        body = self.get_json_body()
+        tokens = body.get("tokens") if isinstance(body, dict) else None
+        if not isinstance(tokens, list) or not all(
+            isinstance(token, str) for token in tokens
+        ):
+            raise web.HTTPError(400, "Request body must be {'tokens': [...]}")
+        if len(tokens) > self.max_tokens:
+            raise web.HTTPError(400, "At most %i tokens per request" % self.max_tokens)
+
+        owners = []
+        for token in tokens:
+            orm_token = orm.APIToken.find(self.db, token)
+            if orm_token is None or not (orm_token.user or orm_token.service):
+                owners.append(None)
+                continue
+            owners.append(self.token_owner_model(orm_token))
+        self.write(json.dumps({"owners": owners}))
+
+
+class IdentityKeysAPIHandler(APIHandler):
+    """Publish the public keys for verifying identity assertions
+
+    .. versionadded:: 2.3
+    """
+
+    def get(self):
+        signer = self.settings.get('identity_signer')
+        keys = signer.public_keys if signer else {}
+        self.write(json.dumps({"keys": keys}))
+
+
 class CookieAPIHandler(APIHandler):
     @token_authenticated
     def get(self, cookie_name, cookie_value=None):
@@ -413,7 +520,7 @@ class OAuthAuthorizeHandler(OAuthHandler, BaseHandler):
             self.send_oauth_response(headers, body, status)
 
 
-class OAuthTokenHandler(OAuthHandler, APIHandler):
+class OAuthTokenHandler(TokenOwnerMixin, OAuthHandler, APIHandler):
     def post(self):
         uri, http_method, body, headers = self.extract_oauth_params()
         credentials = {}
@@ -425,11 +532,46 @@ class OAuthTokenHandler(OAuthHandler, APIHandler):
         except oauth2.FatalClientError as e:
             raise web.HTTPError(e.status_code, e.description)
         else:
+            if status == 200 and self.settings.get('identity_signer'):
+                body = self.add_identity_assertion(body)
             self.send_oauth_response(headers, body, status)
 
+    def add_identity_assertion(self, body):
+        """Add a signed identity assertion to a token response
+
+        The assertion identifies the token's owner,
+        with the same model as /api/user,
+        so the client can identify the user without asking the Hub
+        until the assertion expires.
+
+        .. versionadded:: 2.3
+        """
+        token_reply = json.loads(body)
+        orm_token = orm.APIToken.find(self.db, token_reply['access_token'])
+        if orm_token is None or orm_token.user is None:
+            return body
+        now = int(time.time())
+        claims = {
+            "iss": "jupyterhub",
+            "sub": orm_token.user.name,
+            "aud": orm_token.client_id,
+            "iat": now,
+            "exp": now + self.settings['identity_assertion_max_age'],
+            "token_sha256": hashlib.sha256(
+                token_reply['access_token'].encode('utf8')
+            ).hexdigest(),
+            "identity": self.token_owner_model(orm_token),
+        }
+        token_reply['identity_assertion'] = self.settings['identity_signer'].sign(
+            claims
+        )
+        return json.dumps(token_reply)
+
 
 default_handlers = [
     (r"/api/authorizations/cookie/([^/]+)(?:/([^/]+))?", CookieAPIHandler),
+    (r"/api/authorizations/keys", IdentityKeysAPIHandler),
+    (r"/api/authorizations/tokens", TokenOwnersAPIHandler),
     (r"/api/authorizations/token/([^/]+)", TokenAPIHandler),
     (r"/api/authorizations/token", TokenAPIHandler),
     (r"/api/oauth2/authorize", OAuthAuthorizeHandler),
@@ -2,6 +2,9 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 import json
+import time
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
 from functools import lru_cache
 from http.client import responses
 from urllib.parse import parse_qs
@@ -21,6 +24,187 @@ from ..utils import url_path_join
 PAGINATION_MEDIA_TYPE = "application/jupyterhub-pagination+json"
 
 
+def encode_cursor(last_id):
+    """Encode the id of the last item on a page as an opaque pagination cursor"""
+    data = json.dumps({"id": last_id}).encode("utf8")
+    return urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor from `encode_cursor`
+
+    Raises ValueError if the cursor is invalid.
+    """
+    try:
+        data = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        last_id = data["id"]
+    except Exception:
+        raise ValueError(f"Invalid pagination cursor: {cursor!r}")
+    if not isinstance(last_id, int):
+        raise ValueError(f"Invalid pagination cursor: {cursor!r}")
+    return last_id
+
+
+class _TotalCountCache:
+    """Cache of total result counts for paginated queries
+
+    Keyed by the query's SQL and parameters,
+    so a client paging through results with a cursor
+    doesn't count the whole table on every page.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._cache = {}
+
+    def get(self, key, ttl):
+        if key not in self._cache:
+            return None
+        count, timestamp = self._cache[key]
+        if time.monotonic() - timestamp > ttl:
+            self._cache.pop(key, None)
+            return None
+        return count
+
+    def set(self, key, count):
+        if len(self._cache) >= self.max_size:
+            self._cache.clear()
+        self._cache[key] = (count, time.monotonic())
+
+    def clear(self):
+        self._cache.clear()
+
+
+_total_count_cache = _TotalCountCache()
+
+
+def _cached_count(db, query, ttl):
+    """Count results of a query, cached for `ttl` seconds"""
+    compiled = query.statement.compile(db.get_bind())
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    if ttl:
+        total_count = _total_count_cache.get(key, ttl)
+        if total_count is not None:
+            return total_count
+    total_count = query.count()
+    if ttl:
+        _total_count_cache.set(key, total_count)
+    return total_count
+
+
+def paginate_query(
+    db,
+    query,
+    id_column,
+    offset,
+    limit,
+    after=None,
+    include_total=False,
+    total_cache_ttl=0,
+):
+    """Get one page of results for a query
+
+    With `after` (the id of the last item seen), use keyset pagination,
+    selecting rows with `id_column` greater than `after`.
+    The total count is only computed with `include_total`,
+    and cached for `total_cache_ttl` seconds.
+
+    Otherwise, use offset pagination with an exact total count.
+
+    May be called from a worker thread with its own `db` session.
+
+    Returns (items, total_count, next_cursor).
+    `next_cursor` is None if there are no more results.
+
+    .. versionadded:: 2.3
+    """
+    query = query.with_session(db)
+    if after is None:
+        page = query.order_by(id_column.asc()).offset(offset).limit(limit)
+        items = page.all()
+        total_count = query.count()
+        has_more = offset + limit < total_count
+    else:
+        page = (
+            query.filter(id_column > after)
+            .distinct()
+            .order_by(id_column.asc())
+            .limit(limit + 1)
+        )
+        items = page.all()
+        has_more = len(items) > limit
+        items = items[:limit]
+        total_count = None
+        if include_total:
+            total_count = _cached_count(db, query, total_cache_ttl)
+
+    next_cursor = None
+    if has_more and items:
+        next_cursor = encode_cursor(items[-1].id)
+    return items, total_count, next_cursor
+
+
+class JSONStream:
+    """A list or dict to be serialized lazily by `iter_json`
+
+    `items` is an iterable of list items,
+    or of (key, value) pairs if `is_dict`.
+    Items are only produced as the output is written,
+    so the whole collection never needs to be in memory at once.
+
+    .. versionadded:: 2.3
+    """
+
+    def __init__(self, items, is_dict=False):
+        self.items = items
+        self.is_dict = is_dict
+
+
+def iter_json(data):
+    """Serialize data to JSON in chunks
+
+    Like `json.dumps(data)`, producing the same output,
+    but yields pieces of the output as it goes.
+    `JSONStream` collections (and lists and dicts containing them)
+    are serialized incrementally, with one piece per item.
+
+    .. versionadded:: 2.3
+    """
+    streaming = isinstance(data, JSONStream)
+    if streaming:
+        is_dict = data.is_dict
+        items = data.items
+    elif isinstance(data, dict):
+        is_dict = True
+        items = data.items()
+    elif isinstance(data, list):
+        is_dict = False
+        items = data
+    else:
+        yield json.dumps(data)
+        return
+
+    yield "{" if is_dict else "["
+    sep = ""
+    for item in items:
+        if is_dict:
+            key, value = item
+            yield f"{sep}{json.dumps(key)}: "
+        else:
+            value = item
+            yield sep
+        if isinstance(value, JSONStream) or (
+            not streaming and isinstance(value, (dict, list))
+        ):
+            # look for streams in containers,
+            # but serialize each item of a stream in one go
+            yield from iter_json(value)
+        else:
+            yield json.dumps(value)
+        sep = ", "
+    yield "}" if is_dict else "]"
+
+
 class APIHandler(BaseHandler):
     """Base class for API endpoints
 
@@ -145,6 +329,57 @@ class APIHandler(BaseHandler):
             raise web.HTTPError(400, 'Invalid JSON in body of request')
         return model
 
+    # size (in characters) of JSON output to buffer before flushing
+    json_chunk_size = 1 << 16
+    # number of database rows to load at a time for streamed models
+    stream_batch_size = 100
+
+    async def write_json(self, data):
+        """Write JSON data, flushing it to the client in chunks
+
+        Produces the same output as `self.write(json.dumps(data))`,
+        but `data` may contain `JSONStream` collections,
+        which are only produced as output is written.
+        Peak memory is bounded by the chunk size
+        rather than the size of the response,
+        and clients get the first bytes sooner.
+
+        If an error occurs after part of the response has been sent,
+        it is too late to send an error status,
+        so the error is logged and the connection is closed,
+        leaving clients with an incomplete response
+        rather than a truncated one that looks successful.
+
+        .. versionadded:: 2.3
+        """
+        chunk = []
+        size = 0
+        flushed = False
+        try:
+            for piece in iter_json(data):
+                chunk.append(piece)
+                size += len(piece)
+                if size >= self.json_chunk_size:
+                    self.write("".join(chunk))
+                    chunk = []
+                    size = 0
+                    flushed = True
+                    await self.flush()
+        except Exception:
+            if not flushed:
+                # nothing sent yet, send the error response as usual
+                raise
+            self.log.error(
+                "Error writing JSON response for %s %s",
+                self.request.method,
+                self.request.uri,
+                exc_info=True,
+            )
+            self.request.connection.close()
+            raise web.Finish()
+        if chunk:
+            self.write("".join(chunk))
+
     def write_error(self, status_code, **kwargs):
         """Write JSON errors instead of HTML"""
         exc_info = kwargs.get('exc_info')
@@ -426,7 +661,55 @@ class APIHandler(BaseHandler):
             )
         return offset, limit
 
-    def paginated_model(self, items, offset, limit, total_count):
+    def get_api_cursor(self):
+        """Get the keyset pagination cursor from the `after` argument
+
+        Returns the id of the last item seen, or None for offset pagination.
+
+        .. versionadded:: 2.3
+        """
+        after = self.get_argument("after", None)
+        if after is None:
+            return None
+        try:
+            return decode_cursor(after)
+        except ValueError as e:
+            raise web.HTTPError(400, str(e))
+
+    def get_api_include_total(self):
+        """Whether the `include_total` argument requests a total count
+
+        Only used with keyset pagination, where the total is optional.
+
+        .. versionadded:: 2.3
+        """
+        return self.get_argument("include_total", "").lower() in {"1", "true"}
+
+    def paginate_query(
+        self, db, query, id_column, offset, limit, after=None, include_total=False
+    ):
+        """Get one page of results for a query
+
+        See :func:`paginate_query`.
+        Total counts for keyset pagination are cached
+        for `JupyterHub.api_page_total_cache_ttl` seconds.
+
+        .. versionadded:: 2.3
+        """
+        return paginate_query(
+            db,
+            query,
+            id_column,
+            offset,
+            limit,
+            after=after,
+            include_total=include_total,
+            total_cache_ttl=self.settings.get("api_page_total_cache_ttl", 0),
+        )
+
+    def paginated_model(
+        self, items, offset, limit, total_count, after=None, next_cursor=None
+    ):
         """Return the paginated form of a collection (list or dict)
 
         A dict with { items: [], _pagination: {}}
@@ -436,7 +719,19 @@ class APIHandler(BaseHandler):
         the total number of results for the query,
         and information about how to build the next page request
         if there is one.
+
+        .. versionchanged:: 2.3
+            With keyset pagination (`after` is given),
+            pagination info has the current `after` cursor instead of `offset`,
+            the total may be None,
+            and the next page is requested with the `next_cursor`.
+            With offset pagination, the next page info includes
+            an `after` cursor that can be used to switch to keyset pagination.
         """
+        if after is not None:
+            return self._cursor_paginated_model(
+                items, after, limit, total_count, next_cursor
+            )
         next_offset = offset + limit
         data = {
             "items": items,
@@ -462,6 +757,35 @@ class APIHandler(BaseHandler):
                 "limit": limit,
                 "url": next_url,
             }
+            if next_cursor:
+                data["_pagination"]["next"]["after"] = next_cursor
+        return data
+
+    def _cursor_paginated_model(self, items, after, limit, total_count, next_cursor):
+        """Return the keyset-paginated form of a collection"""
+        data = {
+            "items": items,
+            "_pagination": {
+                "after": self.get_argument("after"),
+                "limit": limit,
+                "total": total_count,
+                "next": None,
+            },
+        }
+        if next_cursor:
+            next_url_parsed = urlparse(self.request.full_url())
+            query = parse_qs(next_url_parsed.query)
+            query.pop('offset', None)
+            query['after'] = [next_cursor]
+            query['limit'] = [limit]
+            next_url_parsed = next_url_parsed._replace(
+                query=urlencode(query, doseq=True)
+            )
+            data["_pagination"]["next"] = {
+                "after": next_cursor,
+                "limit": limit,
+                "url": urlunparse(next_url_parsed),
+            }
         return data
 
     def options(self, *args, **kwargs):
@@ -3,12 +3,14 @@
 # Distributed under the terms of the Modified BSD License.
 import json
 
+from sqlalchemy.orm import selectinload
 from tornado import web
 
 from .. import orm
 from ..scopes import needs_scope
 from ..scopes import Scope
 from .base import APIHandler
+from .base import JSONStream
 
 
 class _GroupAPIHandler(APIHandler):
@@ -41,9 +43,9 @@ class _GroupAPIHandler(APIHandler):
 
 class GroupListAPIHandler(_GroupAPIHandler):
     @needs_scope('list:groups')
-    def get(self):
+    async def get(self):
         """List groups"""
-        query = full_query = self.db.query(orm.Group)
+        query = self.db.query(orm.Group)
         sub_scope = self.parsed_scopes['list:groups']
         if sub_scope != Scope.ALL:
             if not set(sub_scope).issubset({'group'}):
@@ -56,19 +58,46 @@ class GroupListAPIHandler(_GroupAPIHandler):
             query = query.filter(orm.Group.name.in_(sub_scope['group']))
 
         offset, limit = self.get_api_pagination()
-        query = query.order_by(orm.Group.id.asc()).offset(offset).limit(limit)
-        group_list = [self.group_model(g) for g in query]
-        total_count = full_query.count()
-        if self.accepts_pagination:
-            data = self.paginated_model(group_list, offset, limit, total_count)
+        after = self.get_api_cursor()
+        include_total = self.get_api_include_total()
+
+        def find_groups(db):
+            groups, total_count, next_cursor = self.paginate_query(
+                db, query, orm.Group.id, offset, limit, after, include_total
+            )
+            return [g.id for g in groups], total_count, next_cursor
+
+        group_ids, total_count, next_cursor = await self.run_db_read(find_groups)
+        query_count = len(group_ids)
+
+        def group_models():
+            batch_size = self.stream_batch_size
+            for i in range(0, len(group_ids), batch_size):
+                # load everything needed for the group models of a batch at once
+                groups = (
+                    self.db.query(orm.Group)
+                    .filter(orm.Group.id.in_(group_ids[i : i + batch_size]))
+                    .options(
+                        selectinload(orm.Group.roles), selectinload(orm.Group.users)
+                    )
+                    .order_by(orm.Group.id.asc())
+                )
+                for group in groups:
+                    yield self.group_model(group)
+
+        # models are built as the response is written
+        group_list = JSONStream(group_models())
+        if self.accepts_pagination or after is not None:
+            data = self.paginated_model(
+                group_list, offset, limit, total_count, after, next_cursor
+            )
         else:
-            query_count = query.count()
             if offset == 0 and total_count > query_count:
                 self.log.warning(
                     f"Truncated group list in request that does not expect pagination. Replying with {query_count} of {total_count} total groups."
                 )
             data = group_list
-        self.write(json.dumps(data))
+        await self.write_json(data)
 
     @needs_scope('admin:groups')
     async def post(self):
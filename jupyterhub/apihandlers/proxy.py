@@ -2,11 +2,13 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 import json
+from itertools import islice
 
 from tornado import web
 
 from ..scopes import needs_scope
 from .base import APIHandler
+from .base import JSONStream
 
 
 class ProxyAPIHandler(APIHandler):
@@ -22,23 +24,20 @@ class ProxyAPIHandler(APIHandler):
         all_routes = await self.proxy.get_all_routes()
 
         if offset == 0 and len(all_routes) < limit:
-            routes = all_routes
+            route_items = all_routes.items()
         else:
-            routes = {}
-            end = offset + limit
-            for i, key in sorted(all_routes.keys()):
-                if i < offset:
-                    continue
-                elif i >= end:
-                    break
-                routes[key] = all_routes[key]
+            route_items = (
+                (key, all_routes[key])
+                for key in islice(sorted(all_routes), offset, offset + limit)
+            )
 
+        routes = JSONStream(route_items, is_dict=True)
         if self.accepts_pagination:
             data = self.paginated_model(routes, offset, limit, len(all_routes))
         else:
             data = routes
 
-        self.write(json.dumps(data))
+        await self.write_json(data)
 
     @needs_scope('proxy')
     async def post(self):
@@ -11,6 +11,8 @@ from async_generator import aclosing
 from dateutil.parser import parse as parse_date
 from sqlalchemy import func
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
 from tornado import web
 from tornado.iostream import StreamClosedError
 
@@ -24,6 +26,7 @@ from ..utils import iterate_until
 from ..utils import maybe_future
 from ..utils import url_path_join
 from .base import APIHandler
+from .base import JSONStream
 
 
 class SelfAPIHandler(APIHandler):
@@ -73,16 +76,16 @@ class SelfAPIHandler(APIHandler):
 
 
 class UserListAPIHandler(APIHandler):
-    def _user_has_ready_spawner(self, orm_user):
+    def _user_has_ready_spawner(self, user):
         """Return True if a user has *any* ready spawners
 
         Used for filtering from active -> ready
         """
-        user = self.users[orm_user]
+        user = self.users[user]
         return any(spawner.ready for spawner in user.spawners.values())
 
     @needs_scope('list:users')
-    def get(self):
+    async def get(self):
         state_filter = self.get_argument("state", None)
         name_filter = self.get_argument("name_filter", None)
         offset, limit = self.get_api_pagination()
@@ -152,28 +155,49 @@ class UserListAPIHandler(APIHandler):
         if name_filter:
             query = query.filter(orm.User.name.ilike(f'%{name_filter}%'))
 
-        full_query = query
-        query = query.order_by(orm.User.id.asc()).offset(offset).limit(limit)
-
-        user_list = []
-        for u in query:
-            if post_filter is None or post_filter(u):
-                user_model = self.user_model(u)
-                if user_model:
-                    user_list.append(user_model)
+        after = self.get_api_cursor()
+        include_total = self.get_api_include_total()
 
-        total_count = full_query.count()
-        if self.accepts_pagination:
-            data = self.paginated_model(user_list, offset, limit, total_count)
+        def find_users(db):
+            users, total_count, next_cursor = self.paginate_query(
+                db, query, orm.User.id, offset, limit, after, include_total
+            )
+            return [u.id for u in users], total_count, next_cursor
+
+        user_ids, total_count, next_cursor = await self.run_db_read(find_users)
+
+        def user_models():
+            batch_size = self.stream_batch_size
+            for i in range(0, len(user_ids), batch_size):
+                batch = user_ids[i : i + batch_size]
+                # load everything needed for the user models of a batch at once
+                orm_users = orm.User.eager_load(self.db, batch)
+                for user_id in batch:
+                    if user_id not in orm_users:
+                        # deleted since the query ran
+                        continue
+                    user = self.users[orm_users[user_id]]
+                    if post_filter is None or post_filter(user):
+                        user_model = self.user_model(user)
+                        if user_model:
+                            yield user_model
+
+        # models are built as the response is written
+        user_list = JSONStream(user_models())
+
+        if self.accepts_pagination or after is not None:
+            data = self.paginated_model(
+                user_list, offset, limit, total_count, after, next_cursor
+            )
         else:
-            query_count = query.count()
+            query_count = len(user_ids)
             if offset == 0 and total_count > query_count:
                 self.log.warning(
                     f"Truncated user list in request that does not expect pagination. Processing {query_count} of {total_count} total users."
                 )
             data = user_list
 
-        self.write(json.dumps(data))
+        await self.write_json(data)
 
     @needs_scope('admin:users')
     async def post(self):
@@ -339,27 +363,69 @@ class UserTokenListAPIHandler(APIHandler):
     """API endpoint for listing/creating tokens"""
 
     @needs_scope('read:tokens')
-    def get(self, user_name):
+    async def get(self, user_name):
         """Get tokens for a given user"""
         user = self.find_user(user_name)
         if not user:
             raise web.HTTPError(404, "No such user: %s" % user_name)
 
         now = datetime.utcnow()
-        api_tokens = []
+        query = (
+            self.db.query(orm.APIToken)
+            .filter(orm.APIToken.user_id == user.id)
+            .options(
+                # load everything needed for the token models at once
+                joinedload(orm.APIToken.user),
+                joinedload(orm.APIToken.oauth_client),
+                selectinload(orm.APIToken.roles),
+            )
+        )
+        after = self.get_api_cursor()
+        # tokens are only paginated if requested,
+        # otherwise all tokens are returned, most recently used last
+        paginate = self.accepts_pagination or after is not None
+        if paginate:
+            offset, limit = self.get_api_pagination()
+            include_total = self.get_api_include_total()
 
         def sort_key(token):
             return token.last_activity or token.created
 
-        for token in sorted(user.api_tokens, key=sort_key):
-            if token.expires_at and token.expires_at < now:
-                # exclude expired tokens
+        def token_models(db):
+            api_tokens = []
+            expired = []
+            if paginate:
+                tokens, total_count, next_cursor = self.paginate_query(
+                    db, query, orm.APIToken.id, offset, limit, after, include_total
+                )
+            else:
+                tokens = sorted(query.with_session(db), key=sort_key)
+                total_count = next_cursor = None
+            for token in tokens:
+                if token.expires_at and token.expires_at < now:
+                    expired.append(token.id)
+                    continue
+                api_tokens.append(self.token_model(token))
+            return api_tokens, expired, total_count, next_cursor
+
+        api_tokens, expired, total_count, next_cursor = await self.run_db_read(
+            token_models
+        )
+        if expired:
+            # exclude expired tokens
+            for token in self.db.query(orm.APIToken).filter(
+                orm.APIToken.id.in_(expired)
+            ):
                 self.db.delete(token)
-                self.db.commit()
-                continue
-            api_tokens.append(self.token_model(token))
+            self.db.commit()
 
-        self.write(json.dumps({'api_tokens': api_tokens}))
+        if paginate:
+            data = self.paginated_model(
+                api_tokens, offset, limit, total_count, after, next_cursor
+            )
+        else:
+            data = {'api_tokens': api_tokens}
+        self.write(json.dumps(data))
 
     async def post(self, user_name):
         body = self.get_json_body() or {}
@@ -852,10 +918,15 @@ class ActivityAPIHandler(APIHandler):
             # is valid and contains only servers that exist
             # and last_activity is defined and a valid datetime object
 
+        # with an activity buffer, activity is written to the database in bulk
+        activity_buffer = self.settings.get('activity_buffer')
+
         # update user.last_activity if specified
         if last_activity_timestamp:
             last_activity = _parse_timestamp(last_activity_timestamp)
-            if (not user.last_activity) or last_activity > user.last_activity:
+            if activity_buffer is not None:
+                activity_buffer.record_user(user.id, last_activity)
+            elif (not user.last_activity) or last_activity > user.last_activity:
                 self.log.debug(
                     "Activity for user %s: %s", user.name, isoformat(last_activity)
                 )
@@ -873,6 +944,10 @@ class ActivityAPIHandler(APIHandler):
                 last_activity = server_info['last_activity']
                 spawner = user.orm_spawners[server_name]
 
+                if activity_buffer is not None:
+                    activity_buffer.record_spawner(spawner.id, last_activity)
+                    continue
+
                 if (not spawner.last_activity) or last_activity > spawner.last_activity:
                     self.log.debug(
                         "Activity on server %s/%s: %s",
@@ -890,7 +965,8 @@ class ActivityAPIHandler(APIHandler):
                         isoformat(user.last_activity),
                     )
 
-        self.db.commit()
+        if activity_buffer is None:
+            self.db.commit()
 
 
 default_handlers = [
@@ -81,6 +81,8 @@ from . import dbutil
 from . import orm
 from . import roles
 from . import scopes
+from .spawner import SpawnerPool
+from .user import SpawnQueue
 from .user import UserDict
 from .oauth.provider import make_provider
 from ._data import DATA_FILES_PATH
@@ -96,9 +98,18 @@ from .utils import (
     print_ps_info,
     make_ssl_context,
 )
+from .metrics import ACTIVITY_FLUSH_DURATION_SECONDS
+from .metrics import ACTIVITY_FLUSH_SIZE
+from .metrics import ACTIVITY_SYNC_DURATION_SECONDS
+from .metrics import ACTIVITY_SYNC_ROWS_UPDATED
+from .metrics import ActivitySyncPhase
+from .metrics import EVENT_LOOP_LAG_SECONDS
 from .metrics import HUB_STARTUP_DURATION_SECONDS
+from .metrics import INIT_SPAWNER_CHECK_DURATION_SECONDS
 from .metrics import INIT_SPAWNERS_DURATION_SECONDS
+from .metrics import INIT_SPAWNERS_PENDING
 from .metrics import RUNNING_SERVERS
+from .metrics import ServerPollStatus
 from .metrics import TOTAL_USERS
 
 # classes for config
@@ -445,6 +456,60 @@ class JupyterHub(Application):
         # convert cookie max age days to seconds
         return int(self.cookie_max_age_days * 24 * 3600)
 
+    identity_assertion_max_age = Integer(
+        0,
+        help="""Issue signed identity assertions with OAuth tokens, valid for this many seconds.
+
+        Services and single-user servers can verify these assertions
+        with the Hub's public key,
+        identifying users without a request to the Hub API
+        until the assertion expires.
+        Changes to a user's permissions on the Hub (e.g. removing a role)
+        may take this long to apply to services.
+
+        The signing key is stored in `identity_signing_key_file`,
+        and published at /hub/api/authorizations/keys.
+
+        0 disables identity assertions.
+        Requires the `cryptography` package.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    identity_signing_key_file = Unicode(
+        'jupyterhub_identity_key',
+        help="""File in which to store the key for signing identity assertions.
+
+        The key is generated if the file doesn't exist,
+        and loaded from it when the Hub restarts,
+        so that assertions issued before a restart can still be verified.
+        Set to '' to generate a new key each time the Hub starts.
+
+        Only used if `identity_assertion_max_age` is set.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    identity_signer = Any()
+
+    api_token_cache_ttl = Integer(
+        300,
+        help="""Time (in seconds) to cache verified API tokens in memory.
+
+        Cached tokens are found without querying the database
+        for their hash on each request.
+        Deleted tokens are removed from the cache immediately,
+        and expiry is always checked, so this only bounds how long
+        changes made by other processes may take to be noticed.
+
+        Set to 0 to disable the cache.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
     redirect_to_server = Bool(
         True, help="Redirect user to server (if running), instead of control panel."
     ).tag(config=True)
@@ -460,6 +525,27 @@ class JupyterHub(Application):
         This avoids too many writes to the Hub database.
         """,
     ).tag(config=True)
+    activity_flush_interval = Float(
+        0,
+        help="""
+        Interval (in seconds) for writing activity reported by single-user servers.
+
+        If set, activity posted to the activity API
+        is collected in memory, keeping only the most recent timestamp
+        for each user and server,
+        and written to the database in one transaction at this interval,
+        instead of one transaction per request.
+
+        This avoids many small writes to the Hub database
+        with many running servers,
+        at the cost of last_activity being up to this many seconds behind.
+
+        0 writes activity immediately.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+    activity_buffer = Any()
     last_activity_interval = Integer(
         300, help="Interval (in seconds) at which to update last-activity timestamps."
     ).tag(config=True)
@@ -1068,6 +1154,20 @@ class JupyterHub(Application):
         200, help="The maximum amount of records that can be returned at once"
     ).tag(config=True)
 
+    api_page_total_cache_ttl = Integer(
+        60,
+        help="""Time (in seconds) to cache total counts for cursor-paginated API requests.
+
+        When paging with the `after` cursor,
+        the total count is only computed if `include_total` is requested,
+        and is cached for this long, so clients paging through large collections
+        don't count the whole collection on every page.
+        Set to 0 to disable caching.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
     authenticate_prometheus = Bool(
         True, help="Authentication for prometheus metrics"
     ).tag(config=True)
@@ -1224,11 +1324,87 @@ class JupyterHub(Application):
         requests will be rejected with a 429 error asking them to try again.
         Users will have to wait for some of the spawning services
         to finish starting before they can start their own.
+        Set `spawn_queue_size` to queue these requests instead.
 
         If set to 0, no limit is enforced.
         """,
     ).tag(config=True)
 
+    server_pool_size = Integer(
+        0,
+        help="""
+        Number of idle servers to keep started, ready to assign to users.
+
+        Starting a server from the pool skips starting it from scratch,
+        so servers are ready sooner, e.g. when many users start servers at once.
+        The pool is refilled in the background as servers are assigned.
+
+        Pooled servers are started by `spawner_class`,
+        which must support a pool (see :meth:`.Spawner.start_pooled`).
+        LocalProcessSpawner keeps Python processes that have already
+        imported the single-user server, and uses them for servers
+        launched with the default command, when it is installed with the Hub's Python.
+        Pooled servers keep the modules the Hub's Python already imported,
+        so they don't pick up packages a user installed to override them.
+
+        If set to 0, no pool is kept.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    spawn_queue_size = Integer(
+        0,
+        help="""
+        Maximum number of spawn requests waiting for `concurrent_spawn_limit`.
+
+        Instead of being rejected with a 429 error,
+        spawn requests over `concurrent_spawn_limit` wait in a queue
+        and start as soon as other spawns finish.
+        Users see their position in the queue and an estimated wait
+        on the spawn pending page and in the spawn progress API.
+
+        Requests are admitted in order of `spawn_queue_group_priority`,
+        then preferring users with no other spawns in progress,
+        then in the order they were made.
+
+        Requests are only rejected when the queue is full.
+
+        If set to 0, requests are not queued.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    spawn_queue_timeout = Integer(
+        600,
+        help="""
+        Maximum number of seconds a spawn request may wait in the spawn queue.
+
+        Requests that are not admitted in this time fail
+        with a 429 error asking the user to try again.
+
+        If set to 0, requests wait until they are admitted.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    spawn_queue_group_priority = Dict(
+        key_trait=Unicode(),
+        value_trait=Integer(),
+        help="""
+        Dict of 'group': priority for queued spawn requests.
+
+        Requests from users in a group with a higher priority
+        are admitted before all requests with a lower priority.
+        Users have the highest priority of all their groups.
+        Users in no listed group have priority 0.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
     spawn_throttle_retry_range = Tuple(
         (30, 60),
         help="""
@@ -1287,6 +1463,33 @@ class JupyterHub(Application):
         """,
     ).tag(config=True)
 
+    init_spawners_concurrency = Integer(
+        100,
+        help="""
+        Maximum number of servers to check at once when the Hub starts
+
+        Servers that were active most recently are checked first.
+
+        0 means no limit.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    init_spawners_add_routes = Bool(
+        True,
+        help="""
+        Add proxy routes for servers as soon as they are checked
+
+        If checking servers takes longer than `init_spawners_timeout`,
+        the Hub starts before all servers are checked.
+        If True, routes for servers found running after that
+        are added right away, instead of after all servers are checked.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
     db_url = Unicode(
         'sqlite:///jupyterhub.sqlite',
         help="url for the database. e.g. `sqlite:///jupyterhub.sqlite`",
@@ -1319,6 +1522,37 @@ class JupyterHub(Application):
     ).tag(config=True)
     session_factory = Any()
 
+    db_read_threads = Integer(
+        0,
+        help="""Number of worker threads for heavy read-only database queries.
+
+        When greater than 0, heavy read paths
+        (listing users, groups and tokens, syncing activity from the proxy,
+        and loading users at startup)
+        run on a pool of this many threads, each query with its own session,
+        so that slow queries don't block the event loop.
+
+        0 (default) runs all database queries on the event loop.
+        Ignored for in-memory sqlite databases,
+        which cannot be shared across threads.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    db_read_pool = Any()
+
+    event_loop_lag_interval = Float(
+        1,
+        help="""Interval (in seconds) at which to measure event loop lag.
+
+        Lag is reported in the jupyterhub_event_loop_lag_seconds metric.
+        Set to 0 to disable.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
     users = Instance(UserDict)
 
     @default('users')
@@ -1818,6 +2052,21 @@ class JupyterHub(Application):
         except orm.DatabaseSchemaMismatch as e:
             self.exit(e)
 
+        if self.db_read_threads > 0:
+            if self.db_url.endswith(':memory:'):
+                self.log.warning(
+                    "Not using db_read_threads with in-memory database %s",
+                    self.db_url,
+                )
+            else:
+                self.db_read_pool = dbutil.ReadPool(
+                    self.session_factory, self.db_read_threads
+                )
+
+        orm.APIToken.token_cache.ttl = self.api_token_cache_ttl
+        # tokens cached from a previous database are not valid
+        orm.APIToken.token_cache.clear()
+
         # ensure the default oauth client exists
         if (
             not self.db.query(orm.OAuthClient)
@@ -1947,9 +2196,12 @@ class JupyterHub(Application):
             )
 
         # add allowed users to the db
+        existing_users = await dbutil.run_read(
+            self.db_read_pool, db, self._find_usernames, allowed_users
+        )
+        existing_users.update(user.name for user in new_users)
         for name in allowed_users:
-            user = orm.User.find(db, name)
-            if user is None:
+            if name not in existing_users:
                 user = orm.User(name=name)
                 new_users.append(user)
                 db.add(user)
@@ -2002,6 +2254,20 @@ class JupyterHub(Application):
 
         TOTAL_USERS.set(total_users)
 
+    @staticmethod
+    def _find_usernames(db, usernames):
+        """Return the set of `usernames` that exist in the database"""
+        usernames = list(usernames)
+        found = set()
+        chunk_size = 500
+        for i in range(0, len(usernames), chunk_size):
+            chunk = usernames[i : i + chunk_size]
+            found.update(
+                name
+                for (name,) in db.query(orm.User.name).filter(orm.User.name.in_(chunk))
+            )
+        return found
+
     async def _get_or_create_user(self, username):
         """Create user if username is found in config but user does not exist"""
         if not (await maybe_future(self.authenticator.check_allowed(username, None))):
@@ -2522,6 +2788,20 @@ class JupyterHub(Application):
                 self.log.info("%s still running", user.name)
                 spawner.add_poll_callback(user_stopped, user, name)
                 spawner.start_polling()
+                spawner._check_pending = False
+                if (
+                    self.init_spawners_add_routes
+                    and getattr(self, '_start_future', None)
+                    and self._start_future.done()
+                ):
+                    # the Hub is up without this server's route, add it now
+                    try:
+                        await self.proxy.add_user(user, name)
+                    except Exception:
+                        # check_routes will add it later
+                        self.log.exception(
+                            "Failed to add route for %s", spawner._log_name
+                        )
             else:
                 # user not running. This is expected if server is None,
                 # but indicates the user's server died while the Hub wasn't running
@@ -2538,13 +2818,14 @@ class JupyterHub(Application):
                     self.log.debug("%s not running", spawner._log_name)
 
             spawner._check_pending = False
+            return status
 
         # parallelize checks for running Spawners
         # run query on extant Server objects
         # so this is O(running servers) not O(total users)
         # Server objects can be associated with either a Spawner or a Service,
         # we are only interested in the ones associated with a Spawner
-        check_futures = []
+        checks = []
         for orm_server in db.query(orm.Server):
             orm_spawner = orm_server.spawner
             if not orm_spawner:
@@ -2562,28 +2843,55 @@ class JupyterHub(Application):
             self.log.debug("Loading state for %s from db", spawner._log_name)
             # signal that check is pending to avoid race conditions
             spawner._check_pending = True
-            f = asyncio.ensure_future(check_spawner(user, spawner.name, spawner))
-            check_futures.append(f)
+            checks.append((orm_spawner.last_activity or datetime.min, user, spawner))
 
         # it's important that we get here before the first await
         # so that we know all spawners are instantiated and in the check-pending state
 
-        # await checks after submitting them all
-        if check_futures:
+        # check the most recently active servers first
+        checks.sort(key=itemgetter(0), reverse=True)
+        total = len(checks)
+        pending = iter(checks)
+        checked = 0
+        INIT_SPAWNERS_PENDING.set(total)
+        last_progress = time.perf_counter()
+
+        async def run_checks():
+            nonlocal checked, last_progress
+            # workers share the iterator, so each server is checked once
+            for last_activity, user, spawner in pending:
+                tic = time.perf_counter()
+                status = await check_spawner(user, spawner.name, spawner)
+                INIT_SPAWNER_CHECK_DURATION_SECONDS.labels(
+                    status=ServerPollStatus.from_status(status)
+                ).observe(time.perf_counter() - tic)
+                checked += 1
+                INIT_SPAWNERS_PENDING.dec()
+                now = time.perf_counter()
+                if now - last_progress >= 10 and checked < total:
+                    last_progress = now
+                    self.log.info("Checked %i/%i spawners", checked, total)
+
+        if checks:
+            workers = total
+            if self.init_spawners_concurrency > 0:
+                workers = min(self.init_spawners_concurrency, total)
             self.log.debug(
-                "Awaiting checks for %i possibly-running spawners", len(check_futures)
+                "Checking %i possibly-running spawners, %i at a time", total, workers
             )
-            await asyncio.gather(*check_futures)
+            await asyncio.gather(*(run_checks() for i in range(workers)))
         db.commit()
 
         # only perform this query if we are going to log it
         if self.log_level <= logging.DEBUG:
             user_summaries = map(_user_summary, self.users.values())
             self.log.debug("Loaded users:\n%s", '\n'.join(user_summaries))
+            # verify incremental server counts against a full scan
+            self.users.check_active_counts()
 
         active_counts = self.users.count_active_users()
         RUNNING_SERVERS.set(active_counts['active'])
-        return len(check_futures)
+        return total
 
     def init_oauth(self):
         base_url = self.hub.base_url
@@ -2593,6 +2901,63 @@ class JupyterHub(Application):
             login_url=url_path_join(base_url, 'login'),
             token_expires_in=self.oauth_token_expires_in,
         )
+        if self.identity_assertion_max_age:
+            try:
+                self.identity_signer = self._load_identity_signer()
+            except crypto.CryptographyUnavailable as e:
+                self.exit("Identity assertions are enabled, but %s" % e)
+
+    def _load_identity_signer(self):
+        """Load the identity assertion signer from identity_signing_key_file
+
+        Generates the key and stores it, if the file doesn't exist yet.
+        """
+        if not self.identity_signing_key_file:
+            self.log.debug("Generating new identity signing key")
+            return crypto.IdentitySigner()
+        key_file = os.path.abspath(os.path.expanduser(self.identity_signing_key_file))
+        if os.path.exists(key_file):
+            self.log.info("Loading identity signing key from %s", key_file)
+            try:
+                if not _mswindows:  # Windows permissions don't follow POSIX rules
+                    perm = os.stat(key_file).st_mode
+                    if perm & 0o07:
+                        msg = "identity_signing_key_file can be read or written by anybody"
+                        raise ValueError(msg)
+                with open(key_file) as f:
+                    private_bytes = binascii.a2b_hex(f.read().strip())
+                return crypto.IdentitySigner(private_bytes)
+            except crypto.CryptographyUnavailable:
+                raise
+            except Exception as e:
+                self.log.error(
+                    "Refusing to run JupyterHub with invalid identity_signing_key_file. "
+                    "%s error was: %s",
+                    key_file,
+                    e,
+                )
+                self.exit(1)
+
+        signer = crypto.IdentitySigner()
+        self.log.info("Writing identity signing key to %s", key_file)
+        try:
+            # only readable by us from the start
+            fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                if not _mswindows:  # Windows permissions don't follow POSIX rules
+                    # in case the umask removed permissions we need
+                    os.fchmod(f.fileno(), 0o600)
+                f.write(binascii.b2a_hex(signer.private_bytes).decode('ascii'))
+                f.write('\n')
+        except OSError as e:
+            self.log.error(
+                "Refusing to run JupyterHub without writing identity_signing_key_file. "
+                "%s error was: %s",
+                key_file,
+                e,
+            )
+            self.exit(1)
+        return signer
 
     def cleanup_oauth_clients(self):
         """Cleanup any OAuth clients that shouldn't be in the database.
@@ -2678,18 +3043,26 @@ class JupyterHub(Application):
                 )
                 oauth_no_confirm_list.add(service.oauth_client_id)
 
+        if self.activity_flush_interval:
+            self.activity_buffer = dbutil.ActivityBuffer()
+
         settings = dict(
             log_function=log_request,
             config=self.config,
             log=self.log,
             db=self.db,
+            db_read_pool=self.db_read_pool,
             proxy=self.proxy,
             hub=self.hub,
             activity_resolution=self.activity_resolution,
+            activity_buffer=self.activity_buffer,
             admin_users=self.authenticator.admin_users,
             admin_access=self.admin_access,
             api_page_default_limit=self.api_page_default_limit,
             api_page_max_limit=self.api_page_max_limit,
+            api_page_total_cache_ttl=self.api_page_total_cache_ttl,
+            identity_signer=self.identity_signer,
+            identity_assertion_max_age=self.identity_assertion_max_age,
             authenticator=self.authenticator,
             spawner_class=self.spawner_class,
             base_url=self.base_url,
@@ -2718,6 +3091,9 @@ class JupyterHub(Application):
             oauth_no_confirm_list=oauth_no_confirm_list,
             concurrent_spawn_limit=self.concurrent_spawn_limit,
             spawn_throttle_retry_range=self.spawn_throttle_retry_range,
+            spawn_queue_size=self.spawn_queue_size,
+            spawn_queue_timeout=self.spawn_queue_timeout,
+            spawn_queue_group_priority=self.spawn_queue_group_priority,
             active_server_limit=self.active_server_limit,
             authenticate_prometheus=self.authenticate_prometheus,
             internal_ssl=self.internal_ssl,
@@ -2738,6 +3114,17 @@ class JupyterHub(Application):
         # constructing users requires access to tornado_settings
         self.tornado_settings['users'] = self.users
         self.tornado_settings['services'] = self._service_map
+        self.tornado_settings['spawn_queue'] = SpawnQueue(
+            self.users, self.tornado_settings
+        )
+        if self.server_pool_size:
+            self.tornado_settings['server_pool'] = SpawnerPool(
+                self.spawner_class,
+                self.server_pool_size,
+                config=self.config,
+                hub=self.hub,
+                authenticator=self.authenticator,
+            )
 
     def init_tornado_application(self):
         """Instantiate the tornado Application object"""
@@ -2899,6 +3286,15 @@ class JupyterHub(Application):
 
             asyncio.ensure_future(finish_init_spawners())
 
+    async def _measure_event_loop_lag(self):
+        """Periodically record how late the event loop is to wake up"""
+        interval = self.event_loop_lag_interval
+        while True:
+            tic = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = time.perf_counter() - tic - interval
+            EVENT_LOOP_LAG_SECONDS.observe(max(lag, 0))
+
     async def cleanup(self):
         """Shutdown managed services and various subprocesses. Cleanup runtime files."""
 
@@ -2910,6 +3306,11 @@ class JupyterHub(Application):
             for service in managed_services:
                 await service.stop()
 
+        server_pool = self.tornado_settings.get('server_pool')
+        if server_pool is not None:
+            # pooled servers belong to nobody, always stop them
+            futures.append(asyncio.ensure_future(server_pool.stop()))
+
         if self.cleanup_servers:
             self.log.info("Cleaning up single-user servers...")
             # request (async) process termination
@@ -2937,8 +3338,14 @@ class JupyterHub(Application):
             except Exception as e:
                 self.log.error("Failed to stop user: %s", e)
 
+        if self.activity_buffer is not None:
+            self.flush_activity()
+
         self.db.commit()
 
+        if self.db_read_pool is not None:
+            self.db_read_pool.shutdown(wait=False)
+
         if self.pid_file and os.path.exists(self.pid_file):
             self.log.info("Cleaning up PID file %s", self.pid_file)
             os.remove(self.pid_file)
@@ -2979,13 +3386,67 @@ class JupyterHub(Application):
         with open(self.config_file, mode='w') as f:
             f.write(config_text)
 
-    @catch_db_error
-    async def update_last_activity(self):
-        """Update User.last_activity timestamps from the proxy"""
-        routes = await self.proxy.get_all_routes()
-        users_count = 0
-        active_users_count = 0
+    @staticmethod
+    def _load_route_activity(db, usernames):
+        """Load current activity for the given users and their spawners
+
+        Returns plain data:
+        ``{username: [user_id, last_activity]}`` and
+        ``{(username, server_name): [spawner_id, last_activity]}``
+        """
+        usernames = sorted(usernames)
+        user_rows = {}
+        spawner_rows = {}
+        chunk_size = 500
+        for i in range(0, len(usernames), chunk_size):
+            chunk = usernames[i : i + chunk_size]
+            for row in (
+                db.query(
+                    orm.User.id,
+                    orm.User.name,
+                    orm.User.last_activity,
+                    orm.Spawner.id,
+                    orm.Spawner.name,
+                    orm.Spawner.last_activity,
+                )
+                .outerjoin(orm.Spawner, orm.Spawner.user_id == orm.User.id)
+                .filter(orm.User.name.in_(chunk))
+            ):
+                (
+                    user_id,
+                    username,
+                    user_activity,
+                    spawner_id,
+                    server_name,
+                    spawner_activity,
+                ) = row
+                user_rows[username] = [user_id, user_activity]
+                if spawner_id is not None:
+                    spawner_rows[(username, server_name)] = [
+                        spawner_id,
+                        spawner_activity,
+                    ]
+        return user_rows, spawner_rows
+
+    async def _sync_route_activity(self, routes):
+        """Apply last_activity from proxy routes to users and spawners in bulk
+
+        Activity is collected per (user, server), the affected users and spawners
+        are loaded with a single query (on the db_read_threads pool, if enabled),
+        and only timestamps that moved forward
+        are written with bulk UPDATE statements.
+
+        Returns (users_count, active_users_count) for the routes.
+
+        .. versionadded:: 2.3
+        """
+        db = self.db
         now = datetime.utcnow()
+        users_count = 0
+
+        # phase 1: collect the latest activity per (user, server_name)
+        tic = time.perf_counter()
+        route_activity = {}
         for prefix, route in routes.items():
             route_data = route['data']
             if 'user' not in route_data:
@@ -2997,40 +3458,105 @@ class JupyterHub(Application):
             if 'last_activity' not in route_data:
                 # no last activity data (possibly proxy other than CHP)
                 continue
-            user = orm.User.find(self.db, route_data['user'])
-            if user is None:
-                self.log.warning("Found no user for route: %s", route)
-                continue
-            spawner = user.orm_spawners.get(route_data['server_name'])
-            if spawner is None:
-                self.log.warning("Found no spawner for route: %s", route)
-                continue
             dt = parse_date(route_data['last_activity'])
             if dt.tzinfo:
                 # strip timezone info to naive UTC datetime
                 dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+            key = (route_data['user'], route_data['server_name'])
+            if key in route_activity:
+                dt = max(dt, route_activity[key])
+            route_activity[key] = dt
+        ACTIVITY_SYNC_DURATION_SECONDS.labels(phase=ActivitySyncPhase.collect).observe(
+            time.perf_counter() - tic
+        )
 
-            if user.last_activity:
-                user.last_activity = max(user.last_activity, dt)
-            else:
-                user.last_activity = dt
-            if spawner.last_activity:
-                spawner.last_activity = max(spawner.last_activity, dt)
-            else:
-                spawner.last_activity = dt
-            if (now - user.last_activity).total_seconds() < self.active_user_window:
+        # phase 2: load current activity for affected users and spawners
+        tic = time.perf_counter()
+        user_rows, spawner_rows = await dbutil.run_read(
+            self.db_read_pool,
+            db,
+            self._load_route_activity,
+            {username for username, _ in route_activity},
+        )
+        ACTIVITY_SYNC_DURATION_SECONDS.labels(phase=ActivitySyncPhase.load).observe(
+            time.perf_counter() - tic
+        )
+
+        # phase 3: write timestamps that moved forward
+        tic = time.perf_counter()
+        users_moved = {}
+        spawners_moved = {}
+        for key, dt in route_activity.items():
+            username, server_name = key
+            if username not in user_rows:
+                self.log.warning("Found no user for route: %s", key)
+                continue
+            if key not in spawner_rows:
+                self.log.warning("Found no spawner for route: %s", key)
+                continue
+            user_row = user_rows[username]
+            if user_row[1] is None or dt > user_row[1]:
+                user_row[1] = dt
+                users_moved[user_row[0]] = dt
+            spawner_row = spawner_rows[key]
+            if spawner_row[1] is None or dt > spawner_row[1]:
+                spawner_row[1] = dt
+                spawners_moved[spawner_row[0]] = dt
+
+        dbutil.bulk_update_last_activity(db, orm.User, users_moved)
+        dbutil.bulk_update_last_activity(db, orm.Spawner, spawners_moved)
+        db.commit()
+        ACTIVITY_SYNC_ROWS_UPDATED.labels(table='users').inc(len(users_moved))
+        ACTIVITY_SYNC_ROWS_UPDATED.labels(table='spawners').inc(len(spawners_moved))
+        ACTIVITY_SYNC_DURATION_SECONDS.labels(phase=ActivitySyncPhase.update).observe(
+            time.perf_counter() - tic
+        )
+
+        active_users_count = 0
+        for username, server_name in route_activity:
+            if (username, server_name) not in spawner_rows:
+                continue
+            last_activity = user_rows[username][1]
+            if (now - last_activity).total_seconds() < self.active_user_window:
                 active_users_count += 1
-        self.statsd.gauge('users.running', users_count)
-        self.statsd.gauge('users.active', active_users_count)
+        return users_count, active_users_count
 
+    def flush_activity(self):
+        """Write activity collected in activity_buffer to the database
+
+        .. versionadded:: 2.3
+        """
+        if not self.activity_buffer:
+            return
+        tic = time.perf_counter()
         try:
-            self.db.commit()
+            users, spawners = self.activity_buffer.flush(self.db)
+        except SQLAlchemyError:
+            self.log.exception("Failed to write activity, will retry")
+            return
+        ACTIVITY_FLUSH_DURATION_SECONDS.observe(time.perf_counter() - tic)
+        ACTIVITY_FLUSH_SIZE.labels(table='users').observe(users)
+        ACTIVITY_FLUSH_SIZE.labels(table='spawners').observe(spawners)
+        self.log.debug("Wrote activity for %i users and %i servers", users, spawners)
+
+    @catch_db_error
+    async def update_last_activity(self):
+        """Update User.last_activity timestamps from the proxy
+
+        .. versionchanged:: 2.3
+            Activity is applied in bulk, see :meth:`_sync_route_activity`.
+        """
+        routes = await self.proxy.get_all_routes()
+        try:
+            users_count, active_users_count = await self._sync_route_activity(routes)
         except SQLAlchemyError:
             self.log.exception("Rolling back session due to database error")
             self.db.rollback()
             return
+        self.statsd.gauge('users.running', users_count)
+        self.statsd.gauge('users.active', active_users_count)
 
-        await self.proxy.check_routes(self.users, self._service_map, routes)
+        await self.proxy.check_routes(self.users, self._service_map, routes, delta=True)
 
     async def start(self):
         """Start the whole thing"""
@@ -3174,6 +3700,19 @@ class JupyterHub(Application):
             self.last_activity_callback = pc
             pc.start()
 
+        if self.activity_buffer is not None:
+            pc = PeriodicCallback(
+                self.flush_activity, 1e3 * self.activity_flush_interval
+            )
+            pc.start()
+
+        if self.event_loop_lag_interval:
+            asyncio.ensure_future(self._measure_event_loop_lag())
+
+        server_pool = self.tornado_settings.get('server_pool')
+        if server_pool is not None:
+            server_pool.fill()
+
         if self.proxy.should_start:
             self.log.info("JupyterHub is now running at %s", self.proxy.public_url)
         else:
@@ -1,6 +1,8 @@
 import base64
+import hashlib
 import json
 import os
+import time
 from binascii import a2b_hex
 from concurrent.futures import ThreadPoolExecutor
 
@@ -15,13 +17,27 @@ from traitlets.config import SingletonConfigurable
 
 try:
     import cryptography
+    from cryptography.exceptions import InvalidSignature
     from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+        Ed25519PrivateKey,
+        Ed25519PublicKey,
+    )
+    from cryptography.hazmat.primitives.serialization import (
+        Encoding,
+        NoEncryption,
+        PrivateFormat,
+        PublicFormat,
+    )
 except ImportError:
     cryptography = None
 
     class InvalidToken(Exception):
         pass
 
+    class InvalidSignature(Exception):
+        pass
+
 
 from .utils import maybe_future
 
@@ -176,3 +192,117 @@ def decrypt(data):
     Returns a Future whose result will be the decrypted, deserialized data.
     """
     return CryptKeeper.instance().decrypt(data)
+
+
+# Signed identity assertions
+# These are JSON Web Tokens (JWT), signed with Ed25519 ('EdDSA')
+
+
+class InvalidAssertion(Exception):
+    """An identity assertion is invalid, expired, or can't be verified"""
+
+
+class UnknownAssertionKey(InvalidAssertion):
+    """An identity assertion is signed with a key we don't know"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(s):
+    if isinstance(s, str):
+        s = s.encode('ascii')
+    return base64.urlsafe_b64decode(s + b'=' * (-len(s) % 4))
+
+
+class IdentitySigner:
+    """Sign identity assertions with an Ed25519 key
+
+    The key is loaded from `private_bytes` (raw, 32 bytes) if given,
+    and generated otherwise.
+    Its public key is published by the Hub,
+    identified by the key id (`kid`).
+
+    .. versionadded:: 2.3
+    """
+
+    def __init__(self, private_bytes=None):
+        if cryptography is None:
+            raise CryptographyUnavailable()
+        if private_bytes is None:
+            self.private_key = Ed25519PrivateKey.generate()
+        else:
+            self.private_key = Ed25519PrivateKey.from_private_bytes(private_bytes)
+        public_key = self.private_key.public_key().public_bytes(
+            Encoding.Raw, PublicFormat.Raw
+        )
+        self.public_key = _b64encode(public_key)
+        self.kid = hashlib.sha256(public_key).hexdigest()[:16]
+
+    @property
+    def private_bytes(self):
+        """The raw private key, for storing it"""
+        return self.private_key.private_bytes(
+            Encoding.Raw, PrivateFormat.Raw, NoEncryption()
+        )
+
+    @property
+    def public_keys(self):
+        """The public keys for verifying assertions, by key id"""
+        return {self.kid: self.public_key}
+
+    def sign(self, claims):
+        """Sign claims (a JSON-serializable dict), returning the assertion"""
+        header = {"alg": "EdDSA", "typ": "JWT", "kid": self.kid}
+        signing_input = '.'.join(
+            _b64encode(json.dumps(part, separators=(',', ':')).encode('utf8'))
+            for part in (header, claims)
+        )
+        signature = self.private_key.sign(signing_input.encode('ascii'))
+        return signing_input + '.' + _b64encode(signature)
+
+
+def verify_identity_assertion(assertion, public_keys, audience=None):
+    """Verify a signed identity assertion
+
+    Args:
+        assertion (str): the assertion, as issued by `IdentitySigner.sign`
+        public_keys (dict): base64-encoded Ed25519 public keys, by key id
+        audience (str): if given, the expected audience (OAuth client id)
+
+    Returns:
+        claims (dict): the verified claims
+
+    Raises:
+        UnknownAssertionKey: if the key isn't in public_keys
+        InvalidAssertion: if the assertion is invalid or expired
+
+    .. versionadded:: 2.3
+    """
+    if cryptography is None:
+        raise CryptographyUnavailable()
+    try:
+        b64_header, b64_claims, b64_signature = assertion.split('.')
+        header = json.loads(_b64decode(b64_header))
+        if not isinstance(header, dict) or not isinstance(header.get('kid'), str):
+            raise ValueError("Malformed header: %r" % header)
+        kid = header['kid']
+        signature = _b64decode(b64_signature)
+    except (ValueError, KeyError, TypeError):
+        raise InvalidAssertion("Malformed identity assertion")
+    if header.get('alg') != 'EdDSA':
+        raise InvalidAssertion("Unsupported algorithm: %r" % header.get('alg'))
+    if kid not in public_keys:
+        raise UnknownAssertionKey("Unknown key: %r" % kid)
+    public_key = Ed25519PublicKey.from_public_bytes(_b64decode(public_keys[kid]))
+    try:
+        public_key.verify(signature, f"{b64_header}.{b64_claims}".encode('ascii'))
+    except InvalidSignature:
+        raise InvalidAssertion("Invalid signature")
+    claims = json.loads(_b64decode(b64_claims))
+    if claims.get('exp', 0) < time.time():
+        raise InvalidAssertion("Identity assertion has expired")
+    if audience is not None and claims.get('aud') != audience:
+        raise InvalidAssertion("Identity assertion is for %r" % claims.get('aud'))
+    return claims
@@ -2,16 +2,22 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 # Based on pgcontents.utils.migrate, used under the Apache license.
+import asyncio
 import os
 import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime
 from subprocess import check_call
 from tempfile import TemporaryDirectory
 from urllib.parse import urlparse
 
+from sqlalchemy import bindparam
 from sqlalchemy import create_engine
+from sqlalchemy import or_
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 
 from . import orm
 
@@ -150,6 +156,143 @@ def shell(args=None):
     IPython.start_ipython(args, user_ns=ns)
 
 
+class ReadPool:
+    """Run read-only database work on a bounded pool of worker threads
+
+    Each call gets its own short-lived session from `session_factory`,
+    so slow queries don't block the event loop.
+    Functions are called as `func(db, *args)` and must return plain data
+    (ids, tuples, dicts), never ORM objects,
+    which are bound to the worker's session.
+
+    .. versionadded:: 2.3
+    """
+
+    def __init__(self, session_factory, max_workers):
+        self.session_factory = session_factory
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="jupyterhub-db-read"
+        )
+
+    def _run(self, func, args):
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    async def run(self, func, *args):
+        """Call `func(db, *args)` in a worker thread and return its result"""
+        return await asyncio.wrap_future(self.executor.submit(self._run, func, args))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+async def run_read(pool, db, func, *args):
+    """Call `func(db, *args)` on `pool` if there is one, otherwise inline with `db`
+
+    .. versionadded:: 2.3
+    """
+    if pool is None:
+        return func(db, *args)
+    return await pool.run(func, *args)
+
+
+def bulk_update_last_activity(db, cls, activity, only_newer=False):
+    """Set last_activity on many rows with one bulk UPDATE
+
+    Args:
+        db: the database session
+        cls: the orm class (e.g. orm.User or orm.Spawner)
+        activity (dict): the new last_activity for each row, by id
+        only_newer (bool): only move last_activity forward,
+            leaving rows with more recent activity unchanged
+
+    Objects already loaded in the session are updated
+    without being marked as modified.
+    Does not commit.
+
+    .. versionadded:: 2.3
+    """
+    if not activity:
+        return
+    table = cls.__table__
+    update = table.update().where(table.c.id == bindparam('_id'))
+    if only_newer:
+        update = update.where(
+            or_(
+                table.c.last_activity == None,
+                table.c.last_activity < bindparam('_last_activity'),
+            )
+        )
+    db.execute(
+        update.values(last_activity=bindparam('_last_activity')),
+        [{'_id': row_id, '_last_activity': dt} for row_id, dt in activity.items()],
+    )
+    # keep objects already loaded in the session in sync
+    for row_id, dt in activity.items():
+        obj = db.identity_map.get(identity_key(cls, row_id))
+        if obj is None:
+            continue
+        if only_newer and obj.last_activity and obj.last_activity >= dt:
+            continue
+        set_committed_value(obj, 'last_activity', dt)
+
+
+class ActivityBuffer:
+    """Collect last_activity timestamps in memory, to write to the database in bulk
+
+    Only the most recent timestamp is kept for each user and spawner,
+    so each is written at most once per flush.
+
+    .. versionadded:: 2.3
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.spawners = {}
+
+    def __len__(self):
+        return len(self.users) + len(self.spawners)
+
+    @staticmethod
+    def _record(pending, row_id, timestamp):
+        if row_id not in pending or timestamp > pending[row_id]:
+            pending[row_id] = timestamp
+
+    def record_user(self, user_id, timestamp):
+        """Record activity for a user"""
+        self._record(self.users, user_id, timestamp)
+
+    def record_spawner(self, spawner_id, timestamp):
+        """Record activity for a spawner"""
+        self._record(self.spawners, spawner_id, timestamp)
+
+    def flush(self, db):
+        """Write buffered activity to the database in one transaction
+
+        Timestamps are only moved forward.
+        If the write fails, activity is kept for the next flush.
+
+        Returns (users, spawners): the number of each written.
+        """
+        users, self.users = self.users, {}
+        spawners, self.spawners = self.spawners, {}
+        try:
+            bulk_update_last_activity(db, orm.User, users, only_newer=True)
+            bulk_update_last_activity(db, orm.Spawner, spawners, only_newer=True)
+            db.commit()
+        except Exception:
+            db.rollback()
+            for user_id, timestamp in users.items():
+                self.record_user(user_id, timestamp)
+            for spawner_id, timestamp in spawners.items():
+                self.record_spawner(spawner_id, timestamp)
+            raise
+        return len(users), len(spawners)
+
+
 def _alembic(args):
     """Run an alembic command with a temporary alembic.ini"""
     from .app import JupyterHub
@@ -30,6 +30,7 @@ from tornado.web import addslash
 from tornado.web import RequestHandler
 
 from .. import __version__
+from .. import dbutil
 from .. import orm
 from .. import roles
 from .. import scopes
@@ -91,6 +92,8 @@ class BaseHandler(RequestHandler):
         The current user (None if not logged in) may be accessed
         via the `self.current_user` property during the handling of any request.
         """
+        # count database queries for this request, logged at debug-level
+        self.db_query_counter = orm.start_query_counter()
         self.expanded_scopes = set()
         try:
             await self.get_current_user()
@@ -146,6 +149,21 @@ class BaseHandler(RequestHandler):
     def db(self):
         return self.settings['db']
 
+    @property
+    def db_read_pool(self):
+        return self.settings.get('db_read_pool')
+
+    async def run_db_read(self, func, *args):
+        """Run read-only database work, off the event loop if enabled
+
+        Calls `func(db, *args)` on the `JupyterHub.db_read_threads` pool
+        with its own session, or inline with `self.db` if there is no pool.
+        `func` must return plain data, not ORM objects.
+
+        .. versionadded:: 2.3
+        """
+        return await dbutil.run_read(self.db_read_pool, self.db, func, *args)
+
     @property
     def users(self):
         return self.settings.setdefault('users', {})
@@ -437,13 +455,17 @@ class BaseHandler(RequestHandler):
 
     def _resolve_roles_and_scopes(self):
         self.expanded_scopes = set()
+        self.parsed_scopes = {}
         if self.current_user:
             orm_token = self.get_token()
             if orm_token:
-                self.expanded_scopes = scopes.get_scopes_for(orm_token)
+                entity = orm_token
             else:
-                self.expanded_scopes = scopes.get_scopes_for(self.current_user)
-        self.parsed_scopes = scopes.parse_scopes(self.expanded_scopes)
+                entity = self.current_user
+            # scopes are cached across requests until roles or groups change
+            self.expanded_scopes, self.parsed_scopes = scopes.get_cached_scopes_for(
+                entity
+            )
 
     @functools.lru_cache()
     def get_scope_filter(self, req_scope):
@@ -844,6 +866,10 @@ class BaseHandler(RequestHandler):
     def active_server_limit(self):
         return self.settings.get('active_server_limit', 0)
 
+    @property
+    def spawn_queue(self):
+        return self.settings.get('spawn_queue')
+
     async def spawn_single_user(self, user, server_name='', options=None):
         # in case of error, include 'try again from /hub/home' message
         if self.authenticator.refresh_pre_spawn:
@@ -869,9 +895,8 @@ class BaseHandler(RequestHandler):
             raise RuntimeError(f"{user_server_name} pending {pending}")
 
         # count active servers and pending spawns
-        # we could do careful bookkeeping to avoid
-        # but for 10k users this takes ~5ms
-        # and saves us from bookkeeping errors
+        # counts are maintained incrementally by Spawners,
+        # so this is O(1) rather than a scan of all users
         active_counts = self.users.count_active_users()
         spawn_pending_count = (
             active_counts['spawn_pending'] + active_counts['proxy_pending']
@@ -882,7 +907,20 @@ class BaseHandler(RequestHandler):
         concurrent_spawn_limit = self.concurrent_spawn_limit
         active_server_limit = self.active_server_limit
 
-        if concurrent_spawn_limit and spawn_pending_count >= concurrent_spawn_limit:
+        spawn_queue = self.spawn_queue
+        queued = False
+        if spawn_queue is not None and spawn_queue.enabled:
+            # queued spawns are marked as pending, but have not started yet
+            spawn_pending_count -= len(spawn_queue)
+            queued = spawn_queue.should_queue()
+            # only reject requests when the queue is full
+            throttled = queued and spawn_queue.full
+        else:
+            throttled = (
+                concurrent_spawn_limit and spawn_pending_count >= concurrent_spawn_limit
+            )
+
+        if throttled:
             SERVER_SPAWN_DURATION_SECONDS.labels(
                 status=ServerSpawnStatus.throttled
             ).observe(time.perf_counter() - spawn_start_time)
@@ -926,12 +964,15 @@ class BaseHandler(RequestHandler):
                 429, "Active user limit exceeded. Try again in a few minutes."
             )
 
+        queue_entry = None
+        if queued:
+            # wait for a free spawn slot instead of rejecting the request
+            queue_entry = spawn_queue.add(user, server_name)
+
         tic = IOLoop.current().time()
 
         self.log.debug("Initiating spawn for %s", user_server_name)
 
-        spawn_future = user.spawn(server_name, options, handler=self)
-
         self.log.debug(
             "%i%s concurrent spawns",
             spawn_pending_count,
@@ -947,6 +988,7 @@ class BaseHandler(RequestHandler):
         # set spawn_pending now, so there's no gap where _spawn_pending is False
         # while we are waiting for _proxy_pending to be set
         spawner._spawn_pending = True
+        spawner._spawn_queue_entry = queue_entry
 
         async def finish_user_spawn():
             """Finish the user spawn by registering listeners and notifying the proxy.
@@ -954,8 +996,16 @@ class BaseHandler(RequestHandler):
             If the spawner is slow to start, this is passed as an async callback,
             otherwise it is called immediately.
             """
+            nonlocal tic
+            if queue_entry is not None:
+                try:
+                    await spawn_queue.wait(queue_entry)
+                finally:
+                    spawner._spawn_queue_entry = None
+                # don't count time in the queue as time to start
+                tic = IOLoop.current().time()
             # wait for spawn Future
-            await spawn_future
+            await user.spawn(server_name, options, handler=self)
             toc = IOLoop.current().time()
             self.log.info(
                 "User %s took %.3f seconds to start", user_server_name, toc - tic
@@ -1004,6 +1054,9 @@ class BaseHandler(RequestHandler):
                 spawner._spawn_future = None
             # Now we're all done. clear _spawn_pending flag
             spawner._spawn_pending = False
+            if spawn_queue is not None:
+                # a spawn slot is free, admit the next queued spawn
+                spawn_queue.wake()
 
         finish_spawn_future.add_done_callback(_clear_spawn_future)
 
@@ -1015,6 +1068,12 @@ class BaseHandler(RequestHandler):
                 # spawn succeeded, reset failure count
                 self.settings['failure_count'] = 0
                 return
+            if queue_entry is not None and not queue_entry.admitted:
+                # never left the queue, this is not a failure to spawn
+                SERVER_SPAWN_DURATION_SECONDS.labels(
+                    status=ServerSpawnStatus.throttled
+                ).observe(time.perf_counter() - spawn_start_time)
+                return
             # spawn failed, increment count and abort if limit reached
             SERVER_SPAWN_DURATION_SECONDS.labels(
                 status=ServerSpawnStatus.failure
@@ -410,12 +410,17 @@ class SpawnPendingHandler(BaseHandler):
                 page = "stop_pending.html"
             else:
                 page = "spawn_pending.html"
+            queue_position = 0
+            queue_entry = spawner._spawn_queue_entry
+            if queue_entry is not None:
+                queue_position = queue_entry.queue.position(queue_entry)
             html = await self.render_template(
                 page,
                 user=user,
                 spawner=spawner,
                 progress_url=spawner._progress_url,
                 auth_state=auth_state,
+                queue_position=queue_position,
             )
             self.finish(html)
             return
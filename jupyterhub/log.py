@@ -177,6 +177,10 @@ def log_request(handler):
         location='',
     )
     msg = "{status} {method} {uri}{location} ({user}@{ip}) {request_time:.2f}ms"
+    query_counter = getattr(handler, 'db_query_counter', None)
+    if query_counter is not None and access_log.isEnabledFor(logging.DEBUG):
+        ns['queries'] = query_counter.count
+        msg += " {queries} db queries"
     if status >= 500 and status not in {502, 503}:
         log_method(json.dumps(headers, indent=2))
     elif status in {301, 302}:
@@ -21,6 +21,7 @@ them manually here.
 """
 from enum import Enum
 
+from prometheus_client import Counter
 from prometheus_client import Gauge
 from prometheus_client import Histogram
 
@@ -50,6 +51,12 @@ CHECK_ROUTES_DURATION_SECONDS = Histogram(
     'Time taken to validate all routes in proxy',
 )
 
+CHECK_ROUTES_TOTAL = Counter(
+    'jupyterhub_check_routes',
+    'number of proxy route checks, by whether all routes were checked',
+    ['mode'],
+)
+
 HUB_STARTUP_DURATION_SECONDS = Histogram(
     'jupyterhub_hub_startup_duration_seconds', 'Time taken for Hub to start'
 )
@@ -58,11 +65,126 @@ INIT_SPAWNERS_DURATION_SECONDS = Histogram(
     'jupyterhub_init_spawners_duration_seconds', 'Time taken for spawners to initialize'
 )
 
+INIT_SPAWNER_CHECK_DURATION_SECONDS = Histogram(
+    'jupyterhub_init_spawner_check_duration_seconds',
+    'time taken to check if a server is still running at hub startup',
+    ['status'],
+)
+
+INIT_SPAWNERS_PENDING = Gauge(
+    'jupyterhub_init_spawners_pending',
+    'number of servers left to check at hub startup',
+)
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    'jupyterhub_event_loop_lag_seconds',
+    'how late the event loop was to run a scheduled callback',
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, float("inf")],
+)
+
 PROXY_POLL_DURATION_SECONDS = Histogram(
     'jupyterhub_proxy_poll_duration_seconds',
     'duration for polling all routes from proxy',
 )
 
+ACTIVITY_SYNC_DURATION_SECONDS = Histogram(
+    'jupyterhub_activity_sync_duration_seconds',
+    'duration of each phase of syncing activity from proxy routes to the database',
+    ['phase'],
+)
+
+ACTIVITY_SYNC_ROWS_UPDATED = Counter(
+    'jupyterhub_activity_sync_rows_updated',
+    'number of rows with last_activity updated from proxy routes',
+    ['table'],
+)
+
+ACTIVITY_FLUSH_DURATION_SECONDS = Histogram(
+    'jupyterhub_activity_flush_duration_seconds',
+    'time taken to write buffered activity from single-user servers to the database',
+)
+
+ACTIVITY_FLUSH_SIZE = Histogram(
+    'jupyterhub_activity_flush_size',
+    'number of buffered last_activity timestamps written to the database per flush',
+    ['table'],
+    buckets=[0, 1, 10, 50, 100, 500, 1000, 5000, 10000, float("inf")],
+)
+
+
+class CheckRoutesMode(Enum):
+    """
+    Possible values for 'mode' label of CHECK_ROUTES_TOTAL
+    """
+
+    # routes matched the routes the Hub expects
+    delta = 'delta'
+    # routes differed from the routes the Hub expects, all routes checked
+    drift = 'drift'
+    # all routes checked
+    full = 'full'
+
+    def __str__(self):
+        return self.value
+
+
+for s in CheckRoutesMode:
+    CHECK_ROUTES_TOTAL.labels(mode=s)
+
+PROXY_LOCK_WAIT_SECONDS = Histogram(
+    'jupyterhub_proxy_lock_wait_seconds',
+    'time proxy operations waited for a lock',
+    ['lock'],
+    buckets=[0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, float("inf")],
+)
+
+PROXY_LOCK_WAITING = Gauge(
+    'jupyterhub_proxy_lock_waiting',
+    'number of proxy operations waiting for a lock',
+    ['lock'],
+)
+
+
+class ProxyLock(Enum):
+    """
+    Possible values for 'lock' label of PROXY_LOCK_WAIT_SECONDS
+    and PROXY_LOCK_WAITING
+    """
+
+    # a single route, held while adding or deleting it
+    route = 'route'
+    # checking all routes
+    check_routes = 'check_routes'
+
+    def __str__(self):
+        return self.value
+
+
+for s in ProxyLock:
+    PROXY_LOCK_WAIT_SECONDS.labels(lock=s)
+    PROXY_LOCK_WAITING.labels(lock=s)
+
+
+class ActivitySyncPhase(Enum):
+    """
+    Possible values for 'phase' label of ACTIVITY_SYNC_DURATION_SECONDS
+    """
+
+    collect = 'collect'
+    load = 'load'
+    update = 'update'
+
+    def __str__(self):
+        return self.value
+
+
+for s in ActivitySyncPhase:
+    ACTIVITY_SYNC_DURATION_SECONDS.labels(phase=s)
+
+for table in ('users', 'spawners'):
+    ACTIVITY_SYNC_ROWS_UPDATED.labels(table=table)
+    ACTIVITY_FLUSH_SIZE.labels(table=table)
+
 
 class ServerSpawnStatus(Enum):
     """
@@ -83,6 +205,40 @@ for s in ServerSpawnStatus:
     # Create empty metrics with the given status
     SERVER_SPAWN_DURATION_SECONDS.labels(status=s)
 
+SPAWN_QUEUE_LENGTH = Gauge(
+    'jupyterhub_spawn_queue_length',
+    'number of spawn requests waiting in the admission queue',
+)
+
+SPAWN_QUEUE_WAIT_DURATION_SECONDS = Histogram(
+    'jupyterhub_spawn_queue_wait_duration_seconds',
+    'time spawn requests spent waiting in the admission queue',
+    ['status'],
+    buckets=[0.5, 1, 2.5, 5, 10, 15, 30, 60, 120, 300, 600, float("inf")],
+)
+
+SPAWN_QUEUE_ADMITTED = Counter(
+    'jupyterhub_spawn_queue_admitted',
+    'number of queued spawn requests admitted to start',
+)
+
+
+class SpawnQueueStatus(Enum):
+    """
+    Possible values for 'status' label of SPAWN_QUEUE_WAIT_DURATION_SECONDS
+    """
+
+    admitted = 'admitted'
+    timeout = 'timeout'
+    cancelled = 'cancelled'
+
+    def __str__(self):
+        return self.value
+
+
+for s in SpawnQueueStatus:
+    SPAWN_QUEUE_WAIT_DURATION_SECONDS.labels(status=s)
+
 
 PROXY_ADD_DURATION_SECONDS = Histogram(
     'jupyterhub_proxy_add_duration_seconds',
@@ -132,6 +288,57 @@ class ServerPollStatus(Enum):
 
 for s in ServerPollStatus:
     SERVER_POLL_DURATION_SECONDS.labels(status=s)
+    INIT_SPAWNER_CHECK_DURATION_SECONDS.labels(status=s)
+
+SERVER_POLL_LAG_SECONDS = Histogram(
+    'jupyterhub_server_poll_lag_seconds',
+    'how late running servers were polled',
+    buckets=[0.01, 0.1, 0.5, 1, 5, 10, 30, 60, float("inf")],
+)
+
+SERVER_POLL_BATCH_DURATION_SECONDS = Histogram(
+    'jupyterhub_server_poll_batch_duration_seconds',
+    'time taken to poll a batch of running servers',
+)
+
+SERVER_POLL_BATCH_SIZE = Histogram(
+    'jupyterhub_server_poll_batch_size',
+    'number of running servers polled in one batch',
+    buckets=[1, 10, 50, 100, 500, 1000, 5000, float("inf")],
+)
+
+SERVER_POOL_IDLE = Gauge(
+    'jupyterhub_server_pool_idle',
+    'number of idle servers in the warm pool, ready to be assigned',
+)
+
+SERVER_POOL_REQUESTS = Counter(
+    'jupyterhub_server_pool_requests',
+    'number of requests for a server from the warm pool',
+    ['status'],
+)
+
+SERVER_POOL_ASSIGN_DURATION_SECONDS = Histogram(
+    'jupyterhub_server_pool_assign_duration_seconds',
+    'time taken to assign a server from the warm pool to a user',
+)
+
+
+class ServerPoolStatus(Enum):
+    """
+    Possible values for 'status' label of SERVER_POOL_REQUESTS
+    """
+
+    hit = 'hit'
+    miss = 'miss'
+    failure = 'failure'
+
+    def __str__(self):
+        return self.value
+
+
+for s in ServerPoolStatus:
+    SERVER_POOL_REQUESTS.labels(status=s)
 
 
 SERVER_STOP_DURATION_SECONDS = Histogram(
@@ -3,9 +3,11 @@
 # Distributed under the terms of the Modified BSD License.
 import enum
 import json
+import time
 import warnings
 from base64 import decodebytes
 from base64 import encodebytes
+from contextvars import ContextVar
 from datetime import datetime
 from datetime import timedelta
 
@@ -31,10 +33,10 @@ from sqlalchemy.orm import backref
 from sqlalchemy.orm import interfaces
 from sqlalchemy.orm import object_session
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm import selectinload
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
-from sqlalchemy.sql.expression import bindparam
 from sqlalchemy.types import LargeBinary
 from sqlalchemy.types import Text
 from sqlalchemy.types import TypeDecorator
@@ -48,6 +50,7 @@ from .utils import compare_token
 from .utils import hash_token
 from .utils import new_token
 from .utils import random_port
+from .utils import token_lookup_key
 
 # top-level variable for easier mocking in tests
 utcnow = datetime.utcnow
@@ -312,6 +315,32 @@ class User(Base):
         """
         return db.query(cls).filter(cls.name == name).first()
 
+    @classmethod
+    def eager_load(cls, db, ids):
+        """Load users by id with the relationships needed for their models
+
+        Roles, groups, spawners and servers are loaded
+        with a fixed number of queries, regardless of how many users there are,
+        instead of lazy-loading them one user at a time.
+
+        Returns {id: User}.
+
+        .. versionadded:: 2.3
+        """
+        ids = list(ids)
+        if not ids:
+            return {}
+        users = (
+            db.query(cls)
+            .filter(cls.id.in_(ids))
+            .options(
+                selectinload(cls.roles),
+                selectinload(cls.groups),
+                selectinload(cls._orm_spawners).joinedload(Spawner.server),
+            )
+        )
+        return {user.id: user for user in users}
+
 
 class Spawner(Base):
     """ "State about a Spawner"""
@@ -471,21 +500,89 @@ class Expiring:
             db.commit()
 
 
+class TokenCache:
+    """In-process cache of verified tokens
+
+    Maps the lookup key of a token that has been verified
+    to the id and stored hash of its database row,
+    so repeated authentication with the same token
+    doesn't need to query and hash again.
+
+    Entries expire after `ttl` seconds,
+    and are invalidated when their token is deleted.
+    """
+
+    def __init__(self, ttl=300, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        # lookup key: (id, hashed, cached_at)
+        self._entries = {}
+        # id: lookup key
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached (id, hashed) of a token for a lookup key, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        token_id, hashed, cached_at = entry
+        if time.monotonic() - cached_at > self.ttl:
+            self.invalidate(token_id)
+            return None
+        return token_id, hashed
+
+    def set(self, key, token_id, hashed):
+        """Cache a verified token's id and stored hash"""
+        if not self.ttl:
+            return
+        self.invalidate(token_id)
+        while len(self._entries) >= self.max_size:
+            # evict the oldest entry
+            oldest_key = next(iter(self._entries))
+            self.invalidate(self._entries[oldest_key][0])
+        self._entries[key] = (token_id, hashed, time.monotonic())
+        self._keys[token_id] = key
+
+    def invalidate(self, token_id):
+        """Remove a token from the cache by id"""
+        key = self._keys.pop(token_id, None)
+        if key is not None:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all cached tokens"""
+        self._entries.clear()
+        self._keys.clear()
+
+
 class Hashed(Expiring):
     """Mixin for tables with hashed tokens"""
 
     prefix_length = 4
-    algorithm = "sha512"
-    rounds = 16384
+    # PBKDF2-HMAC-SHA512 with the iteration count OWASP recommends (2023),
+    # which costs a few hundred milliseconds per check.
+    # Verified tokens are cached (see TokenCache),
+    # so this is paid about once per token per `api_token_cache_ttl`.
+    # Rounds are recorded in each hash, so this can be raised later:
+    # tokens are rehashed with the new count the next time they are used.
+    algorithm = "pbkdf2_sha512"
+    rounds = 210000
     salt_bytes = 8
     min_length = 8
 
     # values to use for internally generated tokens,
     # which have good entropy as UUIDs
     generated = True
+    generated_algorithm = "sha512"
     generated_salt_bytes = 8
     generated_rounds = 1
 
+    # TokenCache of verified tokens, if any
+    token_cache = None
+
     @property
     def token(self):
         raise AttributeError("token is write-only")
@@ -498,18 +595,62 @@ class Hashed(Expiring):
             # Generated tokens are UUIDs, which have sufficient entropy on their own
             # and don't need salt & hash rounds.
             # ref: https://security.stackexchange.com/a/151262/155114
+            algorithm = self.generated_algorithm
             rounds = self.generated_rounds
             salt_bytes = self.generated_salt_bytes
+            # only generated tokens can be found by their unsalted lookup key
+            self.lookup = token_lookup_key(token)
         else:
+            algorithm = self.algorithm
             rounds = self.rounds
             salt_bytes = self.salt_bytes
+            self.lookup = None
         self.hashed = hash_token(
-            token, rounds=rounds, salt=salt_bytes, algorithm=self.algorithm
+            token, rounds=rounds, salt=salt_bytes, algorithm=algorithm
         )
 
+    @property
+    def _is_generated(self):
+        """Whether the stored hash is for a generated token
+
+        `generated` isn't persisted, so check the hash scheme.
+        """
+        algorithm, rounds = self.hashed.split(':')[:2]
+        return algorithm == self.generated_algorithm and rounds == str(
+            self.generated_rounds
+        )
+
+    @property
+    def _needs_rehash(self):
+        """Whether the stored hash uses an outdated scheme"""
+        if self._is_generated:
+            return False
+        algorithm, rounds = self.hashed.split(':')[:2]
+        return algorithm != self.algorithm or rounds != str(self.rounds)
+
     def match(self, token):
-        """Is this my token?"""
-        return compare_token(self.hashed, token)
+        """Is this my token?
+
+        .. versionchanged:: 2.3
+
+            Tokens stored with an outdated hash scheme
+            are rehashed with the current scheme after a successful match.
+        """
+        if not compare_token(self.hashed, token):
+            return False
+        if self._needs_rehash:
+            app_log.info("Upgrading hash scheme for %s", self)
+            self.hashed = hash_token(
+                token,
+                rounds=self.rounds,
+                salt=self.salt_bytes,
+                algorithm=self.algorithm,
+            )
+            # committed with the rest of the caller's changes
+            db = object_session(self)
+            if db is not None:
+                db.flush()
+        return True
 
     @classmethod
     def check_token(cls, db, token):
@@ -523,6 +664,11 @@ class Hashed(Expiring):
         if found:
             raise ValueError("Collision on token: %s..." % token[: cls.prefix_length])
 
+    @classmethod
+    def _not_expired(cls):
+        """Query filter excluding expired tokens"""
+        return or_(cls.expires_at == None, cls.expires_at >= cls.now())
+
     @classmethod
     def find_prefix(cls, db, token):
         """Start the query for matching token.
@@ -532,31 +678,95 @@ class Hashed(Expiring):
         .. versionchanged:: 1.2
 
             Excludes expired matches.
+
+        .. versionchanged:: 2.3
+
+            Prefixes are compared for equality,
+            so the query can use the index on the prefix column.
         """
         prefix = token[: cls.prefix_length]
         # since we can't filter on hashed values, filter on prefix
         # so we aren't comparing with all tokens
-        prefix_match = db.query(cls).filter(
-            bindparam('prefix', prefix).startswith(cls.prefix)
-        )
-        prefix_match = prefix_match.filter(
-            or_(cls.expires_at == None, cls.expires_at >= cls.now())
-        )
+        prefix_match = db.query(cls).filter(cls.prefix == prefix)
+        prefix_match = prefix_match.filter(cls._not_expired())
         return prefix_match
 
+    @classmethod
+    def _find_cached(cls, db, lookup):
+        """Find a token in the verified token cache
+
+        Returns None on a cache miss, or if the cached token has expired.
+        """
+        if cls.token_cache is None:
+            return None
+        entry = cls.token_cache.get(lookup)
+        if entry is None:
+            return None
+        token_id, hashed = entry
+        # query by primary key instead of using the session's identity map,
+        # so tokens deleted in bulk or by a database cascade aren't found
+        orm_token = db.query(cls).populate_existing().filter(cls.id == token_id).first()
+        if (
+            orm_token is None
+            # ids of deleted tokens can be reused by new tokens
+            or orm_token.hashed != hashed
+            or (orm_token.expires_at is not None and orm_token.expires_at < cls.now())
+        ):
+            cls.token_cache.invalidate(token_id)
+            return None
+        return orm_token
+
+    @classmethod
+    def _find_uncached(cls, db, token, lookup):
+        """Find a token in the database
+
+        Generated tokens are found by their indexed lookup key.
+        Other tokens, and generated tokens stored before lookup keys were added,
+        fall back on matching hashes of all tokens with the same prefix.
+        """
+        orm_token = (
+            db.query(cls)
+            .filter(cls.lookup == lookup)
+            .filter(cls._not_expired())
+            .first()
+        )
+        if orm_token is not None and orm_token.match(token):
+            return orm_token
+
+        for orm_token in cls.find_prefix(db, token).filter(cls.lookup == None).all():
+            if orm_token.match(token):
+                if orm_token._is_generated:
+                    # backfill lookup key for tokens created before it existed,
+                    # committed with the rest of the caller's changes
+                    orm_token.lookup = lookup
+                    db.flush()
+                return orm_token
+
     @classmethod
     def find(cls, db, token):
         """Find a token object by value.
 
         Returns None if not found.
 
-        `kind='user'` only returns API tokens for users
-        `kind='service'` only returns API tokens for services
+        .. versionchanged:: 2.3
+
+            Generated tokens are found by an indexed lookup,
+            and verified tokens are cached in-process.
         """
-        prefix_match = cls.find_prefix(db, token)
-        for orm_token in prefix_match:
-            if orm_token.match(token):
-                return orm_token
+        lookup = token_lookup_key(token)
+        orm_token = cls._find_cached(db, lookup)
+        if orm_token is None:
+            orm_token = cls._find_uncached(db, token, lookup)
+            if orm_token is not None and cls.token_cache is not None:
+                cls.token_cache.set(lookup, orm_token.id, orm_token.hashed)
+        return orm_token
+
+
+@event.listens_for(Session, "persistent_to_deleted")
+def _invalidate_deleted_token(session, obj):
+    """Remove deleted tokens from the verified token cache"""
+    if isinstance(obj, Hashed) and obj.token_cache is not None:
+        obj.token_cache.invalidate(obj.id)
 
 
 # ------------------------------------
@@ -592,6 +802,10 @@ class APIToken(Hashed, Base):
     id = Column(Integer, primary_key=True)
     hashed = Column(Unicode(255), unique=True)
     prefix = Column(Unicode(16), index=True)
+    # added in 2.3: unsalted digest of generated tokens, for indexed lookup
+    lookup = Column(Unicode(64), index=True, nullable=True)
+
+    token_cache = TokenCache()
 
     @property
     def api_id(self):
@@ -653,24 +867,24 @@ class APIToken(Hashed, Base):
         `kind='user'` only returns API tokens for users
         `kind='service'` only returns API tokens for services
         """
-        prefix_match = cls.find_prefix(db, token)
-        if kind == 'user':
-            prefix_match = prefix_match.filter(cls.user_id != None)
-        elif kind == 'service':
-            prefix_match = prefix_match.filter(cls.service_id != None)
-        elif kind is not None:
+        if kind not in {'user', 'service', None}:
             raise ValueError("kind must be 'user', 'service', or None, not %r" % kind)
-        for orm_token in prefix_match:
-            if orm_token.match(token):
-                if not orm_token.client_id:
-                    app_log.warning(
-                        "Deleting stale oauth token for %s with no client",
-                        orm_token.user and orm_token.user.name,
-                    )
-                    db.delete(orm_token)
-                    db.commit()
-                    return
-                return orm_token
+        orm_token = super().find(db, token)
+        if orm_token is None:
+            return None
+        if kind == 'user' and orm_token.user_id is None:
+            return None
+        elif kind == 'service' and orm_token.service_id is None:
+            return None
+        if not orm_token.client_id:
+            app_log.warning(
+                "Deleting stale oauth token for %s with no client",
+                orm_token.user and orm_token.user.name,
+            )
+            db.delete(orm_token)
+            db.commit()
+            return
+        return orm_token
 
     @classmethod
     def new(
@@ -848,6 +1062,43 @@ def _notify_deleted_relationships(session, obj):
             _expire_relationship(obj, prop)
 
 
+_query_counter = ContextVar("jupyterhub_query_counter", default=None)
+
+
+class QueryCounter:
+    """Count database queries executed in a context (e.g. a request)
+
+    .. versionadded:: 2.3
+    """
+
+    def __init__(self):
+        self.count = 0
+
+
+def start_query_counter():
+    """Start counting queries executed in the current context
+
+    Returns the QueryCounter.
+    Only queries run in the current context are counted,
+    not those run in other threads.
+
+    .. versionadded:: 2.3
+    """
+    counter = QueryCounter()
+    _query_counter.set(counter)
+    return counter
+
+
+def register_query_counter(engine):
+    """Count queries for the active QueryCounter, if any"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter.count += 1
+
+
 def register_ping_connection(engine):
     """Check connections before using them.
 
@@ -1010,6 +1261,7 @@ def new_session_factory(
 
     # enable pessimistic disconnect handling
     register_ping_connection(engine)
+    register_query_counter(engine)
 
     if reset:
         Base.metadata.drop_all(engine)
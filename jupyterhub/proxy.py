@@ -20,12 +20,14 @@ import asyncio
 import json
 import os
 import signal
+import tempfile
 import time
 from functools import wraps
 from subprocess import Popen
 from urllib.parse import quote
 from weakref import WeakKeyDictionary
 
+from async_generator import asynccontextmanager
 from tornado.httpclient import AsyncHTTPClient
 from tornado.httpclient import HTTPError
 from tornado.httpclient import HTTPRequest
@@ -34,6 +36,7 @@ from traitlets import Any
 from traitlets import Bool
 from traitlets import default
 from traitlets import Dict
+from traitlets import Float
 from traitlets import Instance
 from traitlets import Integer
 from traitlets import observe
@@ -42,7 +45,12 @@ from traitlets.config import LoggingConfigurable
 
 from . import utils
 from .metrics import CHECK_ROUTES_DURATION_SECONDS
+from .metrics import CHECK_ROUTES_TOTAL
+from .metrics import CheckRoutesMode
+from .metrics import PROXY_LOCK_WAIT_SECONDS
+from .metrics import PROXY_LOCK_WAITING
 from .metrics import PROXY_POLL_DURATION_SECONDS
+from .metrics import ProxyLock
 from .objects import Server
 from .utils import AnyTimeoutError
 from .utils import exponential_backoff
@@ -50,6 +58,17 @@ from .utils import url_path_join
 from jupyterhub.traitlets import Command
 
 
+async def _acquire_lock(lock, name):
+    """Acquire an asyncio lock, recording the wait in metrics"""
+    PROXY_LOCK_WAITING.labels(lock=name).inc()
+    tic = time.perf_counter()
+    try:
+        await lock.acquire()
+    finally:
+        PROXY_LOCK_WAITING.labels(lock=name).dec()
+        PROXY_LOCK_WAIT_SECONDS.labels(lock=name).observe(time.perf_counter() - tic)
+
+
 def _one_at_a_time(method):
     """decorator to limit an async method to be called only once
 
@@ -67,8 +86,11 @@ def _one_at_a_time(method):
         lock = method._locks.get(loop, None)
         if lock is None:
             lock = method._locks[loop] = asyncio.Lock()
-        async with lock:
+        await _acquire_lock(lock, method.__name__)
+        try:
             return await method(*args, **kwargs)
+        finally:
+            lock.release()
 
     return locked_method
 
@@ -95,6 +117,11 @@ class Proxy(LoggingConfigurable):
       There is a default implementation that extracts data from :meth:`.get_all_routes`,
       but implementations may choose to provide a more efficient implementation
       of fetching a single route.
+    - :meth:`.add_routes` adds many routes at once.
+      There is a default implementation that calls :meth:`.add_route`
+      with bounded concurrency,
+      but implementations that can write many routes in one request
+      may choose to provide a more efficient implementation.
     """
 
     db_factory = Any()
@@ -141,6 +168,63 @@ class Proxy(LoggingConfigurable):
         """,
     )
 
+    check_routes_full_interval = Integer(
+        3600,
+        config=True,
+        help="""Interval (in seconds) for fully checking all routes.
+
+        Between full checks, the periodic route check only compares
+        the proxy's routes with the routes the Hub expects,
+        which are updated as servers start and stop.
+        If they differ, all routes are checked right away.
+
+        0 fully checks routes every time.
+
+        .. versionadded:: 2.3
+        """,
+    )
+
+    bulk_concurrency = Integer(
+        10,
+        config=True,
+        help="""The number of routes to add concurrently when adding many routes,
+        such as when restoring the routes of a new proxy.
+
+        Used by the default implementation of :meth:`.add_routes`.
+
+        .. versionadded:: 2.3
+        """,
+    )
+
+    routes_cache_ttl = Float(
+        0,
+        config=True,
+        help="""Time (in seconds) to reuse the routing table fetched from the proxy.
+
+        Routes added and deleted by the Hub are updated in the cached table.
+        Concurrent requests for the routing table always share one fetch.
+
+        0 fetches the routing table every time it is needed.
+
+        Only used by proxies that cache the routing table,
+        such as :class:`ConfigurableHTTPProxy`.
+
+        .. versionadded:: 2.3
+        """,
+    )
+
+    # routes the Hub expects in the proxy: {routespec: target}
+    _expected_routes = Dict()
+    _last_full_check = 0
+    # locks for operations on routes: {routespec: [lock, number of holders/waiters]}
+    _route_locks = Dict()
+    # cached routing table: (time fetched, routes)
+    _routes_cache = None
+    # in-flight fetch of the routing table: (routes version when started, future)
+    _routes_fetch = None
+    # incremented by each change to the cached routing table
+    _routes_version = 0
+
     def start(self):
         """Start the proxy.
 
@@ -254,53 +338,198 @@ class Proxy(LoggingConfigurable):
         routes = await self.get_all_routes()
         return routes.get(routespec)
 
+    async def add_routes(self, routes):
+        """Add many routes to the proxy.
+
+        Used when loading up a new proxy.
+
+        The default implementation calls :meth:`.add_route` for each route,
+        with at most :attr:`bulk_concurrency` routes being added at once.
+        Proxies that can add many routes in one request
+        may override this method.
+
+        .. versionadded:: 2.3
+
+        Args:
+            routes (list):
+                A list of dicts with keys `routespec`, `target` and `data`,
+                as passed to :meth:`.add_route`.
+        """
+        total = len(routes)
+        if not total:
+            return
+        start = last_progress = time.perf_counter()
+        added = 0
+        pending = iter(routes)
+
+        async def add_routes():
+            nonlocal added, last_progress
+            # workers share the iterator, so each route is added once
+            for route in pending:
+                await self.add_route(route['routespec'], route['target'], route['data'])
+                added += 1
+                now = time.perf_counter()
+                if now - last_progress >= 10 and added < total:
+                    last_progress = now
+                    self.log.info("Added %i/%i routes to the proxy", added, total)
+
+        workers = max(1, min(self.bulk_concurrency, total))
+        await asyncio.gather(*(add_routes() for i in range(workers)))
+        self.log.info(
+            "Added %i routes to the proxy in %.3f seconds",
+            total,
+            time.perf_counter() - start,
+        )
+
     # Most basic implementers must only implement above methods
 
-    async def add_service(self, service, client=None):
-        """Add a service's server to the proxy table."""
+    @asynccontextmanager
+    async def _route_lock(self, *routespecs):
+        """Hold the locks for one or more routes
+
+        Operations on the same route run one at a time,
+        operations on different routes run concurrently.
+        Locks for many routes are acquired in sorted order.
+        """
+
+        def forget(routespec, entry):
+            entry[1] -= 1
+            if not entry[1]:
+                del self._route_locks[routespec]
+
+        held = []
+        try:
+            for routespec in sorted(set(routespecs)):
+                entry = self._route_locks.get(routespec)
+                if entry is None:
+                    entry = self._route_locks[routespec] = [asyncio.Lock(), 0]
+                entry[1] += 1
+                try:
+                    await _acquire_lock(entry[0], ProxyLock.route)
+                except BaseException:
+                    forget(routespec, entry)
+                    raise
+                held.append((routespec, entry))
+            yield
+        finally:
+            for routespec, entry in reversed(held):
+                entry[0].release()
+                forget(routespec, entry)
+
+    async def _get_cached_routes(self, fetch):
+        """Return the routing table, fetching it with `fetch()` if needed
+
+        The table is reused for `routes_cache_ttl` seconds,
+        and concurrent callers share one fetch.
+        """
+        if self._routes_cache is not None:
+            fetched, routes = self._routes_cache
+            if time.monotonic() - fetched < self.routes_cache_ttl:
+                return dict(routes)
+        # don't join a fetch that started before routes were changed,
+        # its table may be missing the change
+        if self._routes_fetch is None or self._routes_fetch[0] != self._routes_version:
+            version = self._routes_version
+            future = asyncio.ensure_future(self._fetch_routes(fetch, version))
+            self._routes_fetch = (version, future)
+        routes = await asyncio.shield(self._routes_fetch[1])
+        return dict(routes)
+
+    async def _fetch_routes(self, fetch, version):
+        try:
+            routes = await fetch()
+        finally:
+            if self._routes_fetch is not None and self._routes_fetch[0] == version:
+                self._routes_fetch = None
+        # don't cache a table that may be missing changes made while fetching
+        if version == self._routes_version:
+            self._routes_cache = (time.monotonic(), routes)
+        return routes
+
+    def _cache_route(self, routespec, target, data):
+        """Update a route in the cached routing table"""
+        self._routes_version += 1
+        if self._routes_cache is not None:
+            self._routes_cache[1][routespec] = {
+                'routespec': routespec,
+                'target': target,
+                'data': data,
+            }
+
+    def _uncache_route(self, routespec):
+        """Remove a route from the cached routing table"""
+        self._routes_version += 1
+        if self._routes_cache is not None:
+            self._routes_cache[1].pop(routespec, None)
+
+    def _clear_routes_cache(self):
+        self._routes_version += 1
+        self._routes_cache = None
+
+    async def _add_route_locked(self, routespec, target, data):
+        async with self._route_lock(routespec):
+            await self.add_route(routespec, target, data)
+
+    async def _delete_route_locked(self, routespec):
+        async with self._route_lock(routespec):
+            await self.delete_route(routespec)
+
+    def _service_route(self, service):
+        """Return the route for a service, as passed to add_routes"""
         if not service.server:
             raise RuntimeError(
                 "Service %s does not have an http endpoint to add to the proxy.",
                 service.name,
             )
+        self._expected_routes[service.proxy_spec] = service.server.host
+        return {
+            'routespec': service.proxy_spec,
+            'target': service.server.host,
+            'data': {'service': service.name},
+        }
+
+    def _user_route(self, user, server_name=''):
+        """Return the route for a user's server, as passed to add_routes"""
+        spawner = user.spawners[server_name]
+        if spawner.pending and spawner.pending != 'spawn':
+            raise RuntimeError(
+                "%s is pending %s, shouldn't be added to the proxy yet!"
+                % (spawner._log_name, spawner.pending)
+            )
+        self._expected_routes[spawner.proxy_spec] = spawner.server.host
+        return {
+            'routespec': spawner.proxy_spec,
+            'target': spawner.server.host,
+            'data': {'user': user.name, 'server_name': server_name},
+        }
 
+    async def add_service(self, service, client=None):
+        """Add a service's server to the proxy table."""
+        route = self._service_route(service)
         self.log.info(
             "Adding service %s to proxy %s => %s",
             service.name,
-            service.proxy_spec,
-            service.server.host,
-        )
-
-        await self.add_route(
-            service.proxy_spec, service.server.host, {'service': service.name}
+            route['routespec'],
+            route['target'],
         )
+        await self._add_route_locked(route['routespec'], route['target'], route['data'])
 
     async def delete_service(self, service, client=None):
         """Remove a service's server from the proxy table."""
         self.log.info("Removing service %s from proxy", service.name)
-        await self.delete_route(service.proxy_spec)
+        self._expected_routes.pop(service.proxy_spec, None)
+        await self._delete_route_locked(service.proxy_spec)
 
     async def add_user(self, user, server_name='', client=None):
         """Add a user's server to the proxy table."""
-        spawner = user.spawners[server_name]
+        route = self._user_route(user, server_name)
         self.log.info(
             "Adding user %s to proxy %s => %s",
             user.name,
-            spawner.proxy_spec,
-            spawner.server.host,
-        )
-
-        if spawner.pending and spawner.pending != 'spawn':
-            raise RuntimeError(
-                "%s is pending %s, shouldn't be added to the proxy yet!"
-                % (spawner._log_name, spawner.pending)
-            )
-
-        await self.add_route(
-            spawner.proxy_spec,
-            spawner.server.host,
-            {'user': user.name, 'server_name': server_name},
+            route['routespec'],
+            route['target'],
         )
+        await self._add_route_locked(route['routespec'], route['target'], route['data'])
 
     async def delete_user(self, user, server_name=''):
         """Remove a user's server from the proxy table."""
@@ -308,69 +537,130 @@ class Proxy(LoggingConfigurable):
         if server_name:
             routespec = url_path_join(user.proxy_spec, server_name, '/')
         self.log.info("Removing user %s from proxy (%s)", user.name, routespec)
-        await self.delete_route(routespec)
+        self._expected_routes.pop(routespec, None)
+        await self._delete_route_locked(routespec)
 
     async def add_all_services(self, service_dict):
         """Update the proxy table from the database.
 
         Used when loading up a new proxy.
+
+        .. versionchanged:: 2.3
+            Routes are added with :meth:`.add_routes`.
         """
-        futures = []
-        for service in service_dict.values():
-            if service.server:
-                futures.append(self.add_service(service))
-        # wait after submitting them all
-        await asyncio.gather(*futures)
+        routes = [
+            self._service_route(service)
+            for service in service_dict.values()
+            if service.server
+        ]
+        self.log.info("Adding %i service routes to proxy", len(routes))
+        await self.add_routes(routes)
 
     async def add_all_users(self, user_dict):
         """Update the proxy table from the database.
 
         Used when loading up a new proxy.
+
+        .. versionchanged:: 2.3
+            Routes are added with :meth:`.add_routes`.
         """
-        futures = []
-        for user in user_dict.values():
-            for name, spawner in user.spawners.items():
-                if spawner.ready:
-                    futures.append(self.add_user(user, name))
-        # wait after submitting them all
-        await asyncio.gather(*futures)
+        routes = [
+            self._user_route(user, name)
+            for user in user_dict.values()
+            for name, spawner in user.spawners.items()
+            if spawner.ready
+        ]
+        self.log.info("Adding %i user routes to proxy", len(routes))
+        await self.add_routes(routes)
+
+    def _route_drift(self, routes):
+        """Return the routespecs where routes differ from the routes we expect"""
+        expected = dict(self._expected_routes)
+        expected.update(self.extra_routes)
+        drift = {
+            spec
+            for spec, target in expected.items()
+            if spec not in routes or routes[spec]['target'] != target
+        }
+        drift.update(spec for spec in routes if spec not in expected)
+        return drift
 
     @_one_at_a_time
-    async def check_routes(self, user_dict, service_dict, routes=None):
-        """Check that all users are properly routed on the proxy."""
+    async def check_routes(self, user_dict, service_dict, routes=None, delta=False):
+        """Check that all users are properly routed on the proxy.
+
+        .. versionchanged:: 2.3
+            Added `delta`. If True, routes are only compared with
+            the routes the Hub expects, updated as servers start and stop.
+            All routes are checked if they differ,
+            or every `check_routes_full_interval` seconds.
+
+        .. versionchanged:: 2.3
+            Changes are made holding the locks of the changed routes,
+            and skipped for routes added or deleted since they were checked.
+        """
         start = time.perf_counter()  # timer starts here when user is created
         if not routes:
             self.log.debug("Fetching routes to check")
             routes = await self.get_all_routes()
 
+        mode = CheckRoutesMode.full
+        if (
+            delta
+            and self.check_routes_full_interval
+            and time.monotonic() - self._last_full_check
+            < self.check_routes_full_interval
+        ):
+            drift = self._route_drift(routes)
+            if not drift:
+                CHECK_ROUTES_TOTAL.labels(mode=CheckRoutesMode.delta).inc()
+                CHECK_ROUTES_DURATION_SECONDS.observe(time.perf_counter() - start)
+                return
+            self.log.warning(
+                "%i proxy routes differ from expected routes, checking all routes",
+                len(drift),
+            )
+            mode = CheckRoutesMode.drift
+
         self.log.debug("Checking routes")
+        self._last_full_check = time.monotonic()
+        # rebuild the expected routes from scratch
+        expected = self._expected_routes = {}
 
         user_routes = {path for path, r in routes.items() if 'user' in r['data']}
-        futures = []
+        # missing and outdated routes, added together with add_routes
+        add_routes = []
 
         good_routes = {self.app.hub.routespec}
 
         hub = self.hub
+        expected[self.app.hub.routespec] = hub.host
+        hub_route = {
+            'routespec': self.app.hub.routespec,
+            'target': hub.host,
+            'data': {'hub': True},
+        }
         if self.app.hub.routespec not in routes:
-            futures.append(self.add_hub_route(hub))
+            add_routes.append(hub_route)
         else:
             route = routes[self.app.hub.routespec]
             if route['target'] != hub.host:
                 self.log.warning(
                     "Updating Hub route %s → %s", route['target'], hub.host
                 )
-                futures.append(self.add_hub_route(hub))
+                add_routes.append(hub_route)
 
         for user in user_dict.values():
             for name, spawner in user.spawners.items():
                 if spawner.ready:
                     spec = spawner.proxy_spec
                     good_routes.add(spec)
+                    expected[spec] = spawner.server.host
                     if spec not in user_routes:
                         self.log.warning(
                             "Adding missing route for %s (%s)", spec, spawner.server
                         )
-                        futures.append(self.add_user(user, name))
+                        add_routes.append(self._user_route(user, name))
                     else:
                         route = routes[spec]
                         if route['target'] != spawner.server.host:
@@ -380,12 +670,15 @@ class Proxy(LoggingConfigurable):
                                 route['target'],
                                 spawner.server,
                             )
-                            futures.append(self.add_user(user, name))
+                            add_routes.append(self._user_route(user, name))
                 elif spawner.pending:
                     # don't consider routes stale if the spawner is in any pending event
                     # wait until after the pending state clears before taking any actions
                     # they could be pending deletion from the proxy!
                     good_routes.add(spawner.proxy_spec)
+                    route = routes.get(spawner.proxy_spec)
+                    if route:
+                        expected[spawner.proxy_spec] = route['target']
 
         # check service routes
         service_routes = {
@@ -395,11 +688,12 @@ class Proxy(LoggingConfigurable):
             if service.server is None:
                 continue
             good_routes.add(service.proxy_spec)
+            expected[service.proxy_spec] = service.server.host
             if service.name not in service_routes:
                 self.log.warning(
                     "Adding missing route for %s (%s)", service.name, service.server
                 )
-                futures.append(self.add_service(service))
+                add_routes.append(self._service_route(service))
             else:
                 route = service_routes[service.name]
                 if route['target'] != service.server.host:
@@ -409,27 +703,47 @@ class Proxy(LoggingConfigurable):
                         route['target'],
                         service.server.host,
                     )
-                    futures.append(self.add_service(service))
+                    add_routes.append(self._service_route(service))
 
         # Add extra routes we've been configured for
         for routespec, url in self.extra_routes.items():
             good_routes.add(routespec)
-            futures.append(self.add_route(routespec, url, {'extra': True}))
+            add_routes.append(
+                {'routespec': routespec, 'target': url, 'data': {'extra': True}}
+            )
 
         # Now delete the routes that shouldn't be there
+        delete_routes = []
         for routespec in routes:
             if routespec not in good_routes:
                 self.log.warning("Deleting stale route %s", routespec)
-                futures.append(self.delete_route(routespec))
-
-        await asyncio.gather(*futures)
+                delete_routes.append(routespec)
+
+        changed = [route['routespec'] for route in add_routes] + delete_routes
+        async with self._route_lock(*changed):
+            # servers may have started or stopped since we checked,
+            # only make the changes that are still expected
+            expected = dict(self.extra_routes)
+            expected.update(self._expected_routes)
+            add_routes = [
+                route
+                for route in add_routes
+                if expected.get(route['routespec']) == route['target']
+            ]
+            delete_routes = [spec for spec in delete_routes if spec not in expected]
+            await asyncio.gather(
+                self.add_routes(add_routes),
+                *(self.delete_route(spec) for spec in delete_routes),
+            )
+        CHECK_ROUTES_TOTAL.labels(mode=mode).inc()
         stop = time.perf_counter()  # timer stops here when user is deleted
         CHECK_ROUTES_DURATION_SECONDS.observe(stop - start)  # histogram metric
 
     def add_hub_route(self, hub):
         """Add the default route for the Hub"""
         self.log.info("Adding route for Hub: %s => %s", hub.routespec, hub.host)
-        return self.add_route(hub.routespec, self.hub.host, {'hub': True})
+        self._expected_routes[hub.routespec] = self.hub.host
+        return self._add_route_locked(hub.routespec, self.hub.host, {'hub': True})
 
     async def restore_routes(self):
         self.log.info("Setting up routes on new proxy")
@@ -475,6 +789,11 @@ class ConfigurableHTTPProxy(Proxy):
     def _concurrency_changed(self, change):
         self.semaphore = asyncio.BoundedSemaphore(change.new)
 
+    @observe('api_url', 'auth_token')
+    def _api_changed(self, change):
+        # the routing table of another proxy
+        self._clear_routes_cache()
+
     debug = Bool(False, help="Add debug-level logging to the Proxy.", config=True)
     auth_token = Unicode(
         help="""The Proxy auth token
@@ -654,6 +973,7 @@ class ConfigurableHTTPProxy(Proxy):
 
     async def start(self):
         """Start the proxy process"""
+        self._clear_routes_cache()
         # check if there is a previous instance still around
         self._check_previous_process()
 
@@ -863,6 +1183,9 @@ class ConfigurableHTTPProxy(Proxy):
         body['jupyterhub'] = True
         path = self._routespec_to_chp_path(routespec)
         await self.api_request(path, method='POST', body=body)
+        cached_data = dict(body)
+        del cached_data['target'], cached_data['jupyterhub']
+        self._cache_route(self.validate_routespec(routespec), target, cached_data)
 
     async def delete_route(self, routespec):
         path = self._routespec_to_chp_path(routespec)
@@ -876,6 +1199,7 @@ class ConfigurableHTTPProxy(Proxy):
                 self.log.warning("Route %s already deleted", routespec)
             else:
                 raise
+        self._uncache_route(self.validate_routespec(routespec))
 
     def _reformat_routespec(self, routespec, chp_data):
         """Reformat CHP data format to JupyterHub's proxy API."""
@@ -884,7 +1208,17 @@ class ConfigurableHTTPProxy(Proxy):
         return {'routespec': routespec, 'target': target, 'data': chp_data}
 
     async def get_all_routes(self, client=None):
-        """Fetch the proxy's routes."""
+        """Fetch the proxy's routes.
+
+        .. versionchanged:: 2.3
+            The routing table is reused for `routes_cache_ttl` seconds,
+            and concurrent calls share one fetch.
+        """
+        return await self._get_cached_routes(
+            lambda: self._fetch_all_routes(client=client)
+        )
+
+    async def _fetch_all_routes(self, client=None):
         proxy_poll_start_time = time.perf_counter()
         resp = await self.api_request('', client=client)
         chp_routes = json.loads(resp.body.decode('utf8', 'replace'))
@@ -898,3 +1232,166 @@ class ConfigurableHTTPProxy(Proxy):
             all_routes[routespec] = self._reformat_routespec(routespec, chp_data)
         PROXY_POLL_DURATION_SECONDS.observe(time.perf_counter() - proxy_poll_start_time)
         return all_routes
+
+
+class FileProxy(Proxy):
+    """Proxy implementation writing the routing table to a file.
+
+    For reverse proxies that watch a file for their routes.
+    The proxy itself is managed externally.
+
+    Routes are kept in memory and written to :attr:`routes_file`,
+    which is replaced atomically, so the proxy never reads a partial file.
+    Changes within :attr:`write_delay` seconds are written together.
+    Routes are loaded from the file on startup.
+
+    The file is a JSON dict of the form::
+
+        {
+          "/user/name/": {
+            "target": "http://127.0.0.1:12345",
+            "data": {"user": "name", "server_name": ""}
+          }
+        }
+
+    Subclasses may override :meth:`format_routes` and :meth:`parse_routes`
+    to write the routes in another format.
+
+    .. versionadded:: 2.3
+    """
+
+    @default('should_start')
+    def _should_start_default(self):
+        return False
+
+    routes_file = Unicode(
+        "jupyterhub-routes.json",
+        config=True,
+        help="""File to which the routing table is written""",
+    )
+
+    write_delay = Float(
+        0.1,
+        config=True,
+        help="""Time (in seconds) to wait before writing the routes file.
+
+        All route changes during this time are written at once.
+        """,
+    )
+
+    _routes = Dict()
+    _pending_write = None
+    _write_lock = Any()
+
+    @default('_routes')
+    def _load_routes(self):
+        if not os.path.exists(self.routes_file):
+            return {}
+        with open(self.routes_file) as f:
+            routes = self.parse_routes(f.read())
+        self.log.info("Loaded %i routes from %s", len(routes), self.routes_file)
+        return routes
+
+    @default('_write_lock')
+    def _default_write_lock(self):
+        return asyncio.Lock()
+
+    def format_routes(self, routes):
+        """Return the contents of the routes file for the routing table
+
+        Args:
+            routes (dict): routes, as returned by :meth:`.get_all_routes`
+        Returns:
+            contents (str): contents of the routes file
+        """
+        return json.dumps(
+            {
+                routespec: {'target': route['target'], 'data': route['data']}
+                for routespec, route in routes.items()
+            },
+            indent=1,
+            sort_keys=True,
+        )
+
+    def parse_routes(self, contents):
+        """Return the routing table from the contents of the routes file
+
+        The inverse of :meth:`format_routes`.
+        """
+        return {
+            routespec: {
+                'routespec': routespec,
+                'target': route['target'],
+                'data': route['data'],
+            }
+            for routespec, route in json.loads(contents).items()
+        }
+
+    def _write_routes_file(self, contents):
+        """Atomically replace the routes file"""
+        path = os.path.abspath(self.routes_file)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix='.' + os.path.basename(path)
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(contents)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    async def _write_routes_later(self):
+        await asyncio.sleep(self.write_delay)
+        # changes from here on need another write
+        self._pending_write = None
+        async with self._write_lock:
+            # format after waiting for the lock,
+            # so the newest routes are written last
+            contents = self.format_routes(self._routes)
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write_routes_file, contents
+            )
+        self.log.debug("Wrote %i routes to %s", len(self._routes), self.routes_file)
+
+    async def write_routes(self):
+        """Write the routes file
+
+        Waits until the current routes have been written,
+        together with any other changes made within :attr:`write_delay`.
+        """
+        if self._pending_write is None:
+            self._pending_write = asyncio.ensure_future(self._write_routes_later())
+        await asyncio.shield(self._pending_write)
+
+    async def add_route(self, routespec, target, data):
+        routespec = self.validate_routespec(routespec)
+        self._routes[routespec] = {
+            'routespec': routespec,
+            'target': target,
+            'data': data,
+        }
+        await self.write_routes()
+
+    async def add_routes(self, routes):
+        """Add many routes with one write of the routes file"""
+        for route in routes:
+            routespec = self.validate_routespec(route['routespec'])
+            self._routes[routespec] = dict(route, routespec=routespec)
+        await self.write_routes()
+
+    async def delete_route(self, routespec):
+        routespec = self.validate_routespec(routespec)
+        if self._routes.pop(routespec, None) is None:
+            self.log.warning("Route %s already deleted", routespec)
+            return
+        await self.write_routes()
+
+    async def get_all_routes(self):
+        return {
+            routespec: dict(route, data=dict(route['data']))
+            for routespec, route in self._routes.items()
+        }
@@ -389,10 +389,13 @@ def strip_role(db, entity, role):
         )
 
 
-def _token_allowed_role(db, token, role):
+def _token_allowed_role(db, token, role, user_groups=None):
     """Checks if requested role for token does not grant the token
     higher permissions than the token's owner has
 
+    `user_groups` may be a dict of resolved group membership
+    to share across checks (see `scopes._get_user_groups`).
+
     Returns:
       True if requested permissions are within the owner's permissions, False otherwise
     """
@@ -414,7 +417,7 @@ def _token_allowed_role(db, token, role):
     # find the owner's scopes
     expanded_owner_scopes = expand_roles_to_scopes(owner)
     allowed_scopes = scopes._intersect_expanded_scopes(
-        explicit_scopes, expanded_owner_scopes, db
+        explicit_scopes, expanded_owner_scopes, db, user_groups=user_groups
     )
     disallowed_scopes = explicit_scopes.difference(allowed_scopes)
 
@@ -470,6 +473,9 @@ def update_roles(db, entity, roles):
 
     Otherwise, it just calls `grant_role` for each role.
     """
+    # group membership resolved while checking token roles,
+    # shared across all requested roles
+    user_groups = {}
     for rolename in roles:
         if isinstance(entity, orm.APIToken):
             role = orm.Role.find(db, rolename)
@@ -477,7 +483,7 @@ def update_roles(db, entity, roles):
                 app_log.debug(
                     'Checking token permissions against requested role %s', rolename
                 )
-                if _token_allowed_role(db, entity, role):
+                if _token_allowed_role(db, entity, role, user_groups):
                     role.tokens.append(entity)
                     app_log.info('Adding role %s to token: %s', role.name, entity)
                 else:
@@ -13,11 +13,12 @@ import functools
 import inspect
 import re
 import warnings
+from collections import OrderedDict
 from enum import Enum
-from functools import lru_cache
 from textwrap import indent
 
 import sqlalchemy as sa
+from sqlalchemy.orm import Session
 from tornado import web
 from tornado.log import app_log
 
@@ -93,6 +94,9 @@ scope_definitions = {
         'subscopes': ['read:tokens'],
     },
     'read:tokens': {'description': 'Read user tokens.'},
+    'read:tokens:owners': {
+        'description': 'Identify the owners of many tokens at once (services only).',
+    },
     'admin:groups': {
         'description': 'Read and write group information, create and delete groups.',
         'subscopes': ['groups', 'read:roles:groups', 'delete:groups'],
@@ -143,12 +147,46 @@ class Scope(Enum):
     ALL = True
 
 
-def _intersect_expanded_scopes(scopes_a, scopes_b, db=None):
+def _get_user_groups(db, usernames, user_groups=None):
+    """Resolve group membership for many users at once
+
+    Arguments:
+      db: db connection
+      usernames: iterable of usernames to resolve
+      user_groups (optional): dict of already-resolved {username: group names},
+        which is updated in-place and can be reused for further lookups.
+
+    Returns:
+      user_groups (dict): {username: frozenset(group names)} for at least `usernames`.
+      Users that don't exist are in no groups.
+    """
+    if user_groups is None:
+        user_groups = {}
+    missing = sorted(set(usernames).difference(user_groups))
+    # chunk lookups to stay below database limits on bound parameters
+    chunk_size = 500
+    for i in range(0, len(missing), chunk_size):
+        chunk = missing[i : i + chunk_size]
+        found = {username: set() for username in chunk}
+        for username, group_name in (
+            db.query(orm.User.name, orm.Group.name)
+            .join(orm.User.groups)
+            .filter(orm.User.name.in_(chunk))
+        ):
+            found[username].add(group_name)
+        for username, groups in found.items():
+            user_groups[username] = frozenset(groups)
+    return user_groups
+
+
+def _intersect_expanded_scopes(scopes_a, scopes_b, db=None, user_groups=None):
     """Intersect two sets of scopes by comparing their permissions
 
     Arguments:
       scopes_a, scopes_b: sets of expanded scopes
       db (optional): db connection for resolving group membership
+      user_groups (optional): dict of resolved group membership
+        to use and update (see `_get_user_groups`)
 
     Returns:
       intersection: set of expanded scopes as intersection of the arguments
@@ -156,20 +194,17 @@ def _intersect_expanded_scopes(scopes_a, scopes_b, db=None):
     If db is given, group membership will be accounted for in intersections,
     Otherwise, it can result in lower than intended permissions,
           (i.e. users!group=x & users!user=y will be empty, even if user y is in group x.)
+
+    Group membership of all users that may need it is resolved
+    with a single query up front, rather than one query per user.
     """
-    empty_set = frozenset()
+    if user_groups is None:
+        user_groups = {}
 
-    # cached lookups for group membership of users and servers
-    @lru_cache()
     def groups_for_user(username):
         """Get set of group names for a given username"""
-        user = db.query(orm.User).filter_by(name=username).first()
-        if user is None:
-            return empty_set
-        else:
-            return {group.name for group in user.groups}
+        return user_groups[username]
 
-    @lru_cache()
     def groups_for_server(server):
         """Get set of group names for a given server"""
         username, _, servername = server.partition("/")
@@ -180,6 +215,25 @@ def _intersect_expanded_scopes(scopes_a, scopes_b, db=None):
 
     common_bases = parsed_scopes_a.keys() & parsed_scopes_b.keys()
 
+    if db is not None:
+        # collect users whose groups may be needed to resolve user/server filters
+        # against group filters, and resolve them all at once
+        usernames = set()
+        for base in common_bases:
+            filters_a = parsed_scopes_a[base]
+            filters_b = parsed_scopes_b[base]
+            if filters_a == Scope.ALL or filters_b == Scope.ALL:
+                continue
+            for a, b in [(filters_a, filters_b), (filters_b, filters_a)]:
+                if 'group' not in b:
+                    continue
+                usernames.update(a.get('user', ()))
+                usernames.update(
+                    server.partition("/")[0] for server in a.get('server', ())
+                )
+        if usernames:
+            _get_user_groups(db, usernames, user_groups)
+
     common_filters = {}
     warned = False
     for base in common_bases:
@@ -350,6 +404,144 @@ def get_scopes_for(orm_object):
     return expanded_scopes
 
 
+class _ScopeCache:
+    """Cache of resolved scopes for users, services and tokens
+
+    Entries are keyed by orm class and id,
+    and are valid only for the scope version they were resolved at.
+    The scope version is bumped whenever roles, role assignments
+    or group membership change (see `_check_scope_changes`),
+    which invalidates every entry at once.
+    Changes to a token's own roles or deletion of a token only invalidate that token.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.version = 0
+        # (class name, id): (version, expanded scopes, parsed scopes)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(orm_object):
+        return (type(orm_object).__name__, orm_object.id)
+
+    def bump_version(self):
+        """Invalidate all cached scopes"""
+        self.version += 1
+        self._entries.clear()
+
+    def invalidate(self, orm_object):
+        """Invalidate cached scopes for a single orm object"""
+        self._entries.pop(self._key(orm_object), None)
+
+    def get(self, orm_object):
+        """Return cached (expanded_scopes, parsed_scopes) or None"""
+        key = self._key(orm_object)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, expanded_scopes, parsed_scopes = entry
+        if version != self.version:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return expanded_scopes, parsed_scopes
+
+    def set(self, orm_object, expanded_scopes, parsed_scopes):
+        """Store resolved scopes for an orm object"""
+        self._entries[self._key(orm_object)] = (
+            self.version,
+            expanded_scopes,
+            parsed_scopes,
+        )
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+_scope_cache = _ScopeCache()
+
+
+def get_cached_scopes_for(orm_object):
+    """Find expanded and parsed scopes for a user, service or token, with caching
+
+    Like `get_scopes_for`, but results are cached until
+    roles, role assignments or group membership change.
+
+    Arguments:
+      orm_object: orm object or User wrapper
+
+    Returns:
+      expanded_scopes (set): a new set of expanded scopes, safe to modify
+      parsed_scopes (dict): parsed scopes, shared by all users of the cache
+        and must not be modified
+    """
+    if orm_object is None:
+        return set(), {}
+    if not isinstance(orm_object, orm.Base):
+        from .user import User
+
+        if isinstance(orm_object, User):
+            orm_object = orm_object.orm_user
+
+    if getattr(orm_object, 'id', None) is None:
+        # not in the database yet, don't cache
+        expanded_scopes = get_scopes_for(orm_object)
+        return expanded_scopes, parse_scopes(expanded_scopes)
+
+    cached = _scope_cache.get(orm_object)
+    if cached is None:
+        expanded_scopes = frozenset(get_scopes_for(orm_object))
+        parsed_scopes = parse_scopes(expanded_scopes)
+        _scope_cache.set(orm_object, expanded_scopes, parsed_scopes)
+    else:
+        expanded_scopes, parsed_scopes = cached
+    return set(expanded_scopes), parsed_scopes
+
+
+# attributes of orm classes (by name) which affect
+# the scopes resolved for any user, service or token.
+# Changes to these invalidate all cached scopes.
+_scope_attributes = {
+    'User': ('name', 'roles', 'groups'),
+    'Service': ('name', 'roles'),
+    'Group': ('name', 'roles', 'users'),
+    # Role.tokens is left out, token roles are handled separately,
+    # so issuing tokens doesn't invalidate everything
+    'Role': ('scopes', 'users', 'services', 'groups'),
+}
+
+
+@sa.event.listens_for(Session, "after_flush")
+def _check_scope_changes(session, flush_context):
+    """Invalidate cached scopes when flushing changes that may affect them"""
+    for obj in session.deleted:
+        if isinstance(obj, orm.APIToken):
+            _scope_cache.invalidate(obj)
+        elif type(obj).__name__ in _scope_attributes:
+            _scope_cache.bump_version()
+            return
+
+    for obj in session.new:
+        if isinstance(obj, (orm.Role, orm.Group)):
+            _scope_cache.bump_version()
+            return
+
+    for obj in session.dirty:
+        if isinstance(obj, orm.APIToken):
+            if sa.inspect(obj).attrs.roles.history.has_changes():
+                _scope_cache.invalidate(obj)
+            continue
+        attributes = _scope_attributes.get(type(obj).__name__)
+        if attributes:
+            state = sa.inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in attributes):
+                _scope_cache.bump_version()
+                return
+
+
 def _needs_scope_expansion(filter_, filter_value, sub_scope):
     """
     Check if there is a requirements to expand the `group` scope to individual `user` scopes.
@@ -748,3 +940,5 @@ def define_custom_scopes(scopes):
         # deferred evaluation for debug-logging
         app_log.debug("Defining custom scope %s=%s", scope, scope_definition)
         scope_definitions[scope] = scope_definition
+    # scope expansion may have changed
+    _scope_cache.bump_version()
@@ -23,6 +23,7 @@ If you are using OAuth, you will also need to register an oauth callback handler
 A tornado implementation is provided in :class:`HubOAuthCallbackHandler`.
 
 """
+import asyncio
 import base64
 import hashlib
 import json
@@ -31,27 +32,35 @@ import random
 import re
 import socket
 import string
+import threading
 import time
 import uuid
 import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 from urllib.parse import urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
 from tornado.httputil import url_concat
+from tornado.ioloop import PeriodicCallback
 from tornado.log import app_log
 from tornado.web import HTTPError
 from tornado.web import RequestHandler
 from traitlets import default
 from traitlets import Dict
+from traitlets import Float
 from traitlets import Instance
 from traitlets import Integer
+from traitlets import List
 from traitlets import observe
 from traitlets import Set
 from traitlets import Unicode
 from traitlets import validate
 from traitlets.config import SingletonConfigurable
 
+from .. import crypto
 from ..scopes import _intersect_expanded_scopes
 from ..utils import get_browser_protocol
 from ..utils import url_path_join
@@ -92,6 +101,9 @@ def check_scopes(required_scopes, scopes):
     return set(required_scopes) & intersection
 
 
+_cache_miss = object()
+
+
 class _ExpiringDict(dict):
     """Dict-like cache for Hub API requests
 
@@ -100,19 +112,45 @@ class _ExpiringDict(dict):
     A monotonic timer is used (time.monotonic).
 
     A max_age of 0 means cache forever.
+
+    If max_size is set, the least recently used values
+    are evicted when the cache is full.
+    Expired values are removed when they are accessed,
+    or all at once by `sweep()`.
+
+    .. versionchanged:: 2.3
+        Added max_size, per-item max_age, `sweep()`, and `stats`.
     """
 
     max_age = 0
+    max_size = 0
 
-    def __init__(self, max_age=0):
+    def __init__(self, max_age=0, max_size=0):
         self.max_age = max_age
+        self.max_size = max_size
         self.timestamps = {}
-        self.values = {}
+        self.max_ages = {}
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def __setitem__(self, key, value):
         """Store key and record timestamp"""
+        self.set(key, value)
+
+    def set(self, key, value, max_age=None):
+        """Store key, optionally with a max_age other than the default"""
         self.timestamps[key] = time.monotonic()
+        if max_age is None:
+            self.max_ages.pop(key, None)
+        else:
+            self.max_ages[key] = max_age
         self.values[key] = value
+        self.values.move_to_end(key)
+        if self.max_size > 0:
+            while len(self.values) > self.max_size:
+                self._evict(next(iter(self.values)))
 
     def __repr__(self):
         """include values and timestamps in repr"""
@@ -126,16 +164,38 @@ class _ExpiringDict(dict):
             }
         )
 
+    def __len__(self):
+        return len(self.values)
+
+    def _evict(self, key):
+        """Remove a key from the cache"""
+        self.values.pop(key)
+        self.timestamps.pop(key)
+        self.max_ages.pop(key, None)
+        self.evictions += 1
+
+    def _is_expired(self, key, now):
+        max_age = self.max_ages.get(key, self.max_age)
+        return max_age > 0 and self.timestamps[key] + max_age < now
+
     def _check_age(self, key):
         """Check timestamp for a key"""
         if key not in self.values:
             # not registered, nothing to do
             return
+        if self._is_expired(key, time.monotonic()):
+            self._evict(key)
+
+    def sweep(self):
+        """Remove all expired values
+
+        Returns the number of values removed.
+        """
         now = time.monotonic()
-        timestamp = self.timestamps[key]
-        if self.max_age > 0 and timestamp + self.max_age < now:
-            self.values.pop(key)
-            self.timestamps.pop(key)
+        expired = [key for key in self.values if self._is_expired(key, now)]
+        for key in expired:
+            self._evict(key)
+        return len(expired)
 
     def __contains__(self, key):
         """dict check for `key in dict`"""
@@ -145,7 +205,14 @@ class _ExpiringDict(dict):
     def __getitem__(self, key):
         """Check age before returning value"""
         self._check_age(key)
-        return self.values[key]
+        try:
+            value = self.values[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        self.values.move_to_end(key)
+        return value
 
     def get(self, key, default=None):
         """dict-like get:"""
@@ -154,10 +221,21 @@ class _ExpiringDict(dict):
         except KeyError:
             return default
 
+    @property
+    def stats(self):
+        """Cache counters: hits, misses, evictions, and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.values),
+        }
+
     def clear(self):
         """Clear the cache"""
         self.values.clear()
         self.timestamps.clear()
+        self.max_ages.clear()
 
 
 class HubAuth(SingletonConfigurable):
@@ -336,11 +414,189 @@ class HubAuth(SingletonConfigurable):
         Default: 300 (five minutes)
         """,
     ).tag(config=True)
+
+    cache_max_size = Integer(
+        10000,
+        help="""The maximum number of responses to cache.
+
+        When the cache is full, the least recently used responses are evicted.
+        0 means no limit.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    negative_cache_max_age = Integer(
+        30,
+        help="""The maximum time (in seconds) to cache failed authentication.
+
+        Responses where the Hub identifies no user (e.g. an invalid token)
+        are cached for this long, instead of `cache_max_age`,
+        so that newly issued tokens are recognized quickly.
+        0 means failures are not cached.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    cache_sweep_interval = Integer(
+        60,
+        help="""Interval (in seconds) for removing expired responses from the cache.
+
+        Expired responses are removed in the background,
+        while the service is making async requests to the Hub.
+        0 disables background removal.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
     cache = Instance(_ExpiringDict, allow_none=False)
 
     @default('cache')
     def _default_cache(self):
-        return _ExpiringDict(self.cache_max_age)
+        return _ExpiringDict(self.cache_max_age, max_size=self.cache_max_size)
+
+    token_batch_window = Float(
+        0,
+        help="""Time (in seconds) to collect tokens to identify together.
+
+        When set, tokens that aren't cached are identified
+        in one request to the Hub for each batch,
+        instead of one request per token.
+        This reduces the number of requests to the Hub for services
+        authenticating many users at once,
+        at the cost of this much extra latency.
+        0 disables batching.
+
+        Only applies to async requests, e.g. `user_for_token_async`.
+        Requires JupyterHub 2.3,
+        and the `read:tokens:owners` scope for the service's token.
+        Otherwise, tokens are identified one at a time.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    token_batch_max_size = Integer(
+        100,
+        help="""The maximum number of tokens to identify in one request.
+
+        A batch is sent immediately when it reaches this size.
+        The Hub accepts at most 100 tokens in one request.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    _cache_sweeper = None
+    _inflight = Dict()
+    _coalesced = 0
+
+    @property
+    def cache_stats(self):
+        """Counters for the response cache
+
+        hits, misses, evictions, and current size of the cache,
+        and the number of requests coalesced with an in-flight request
+        for the same token.
+
+        .. versionadded:: 2.3
+        """
+        stats = self.cache.stats
+        stats["coalesced"] = self._coalesced
+        return stats
+
+    def _start_cache_sweeper(self):
+        """Start removing expired responses in the background"""
+        if self._cache_sweeper is not None or self.cache_sweep_interval <= 0:
+            return
+        self._cache_sweeper = PeriodicCallback(
+            self.cache.sweep, 1e3 * self.cache_sweep_interval
+        )
+        self._cache_sweeper.start()
+
+    api_request_concurrency = Integer(
+        20,
+        help="""The maximum number of concurrent requests to the Hub API.
+
+        Async requests (e.g. `user_for_token_async`) run on a pool of this many threads,
+        each keeping its own connection to the Hub alive.
+        Requests beyond this limit wait for a free thread,
+        without blocking the event loop.
+
+        .. versionadded:: 2.3
+        """,
+    ).tag(config=True)
+
+    _api_local = None
+    _api_sessions = None
+    _api_executor = None
+    _api_lock = threading.Lock()
+
+    @property
+    def api_session(self):
+        """The requests.Session used for Hub API requests in the current thread
+
+        requests.Session is not thread-safe,
+        so each thread making requests has its own session.
+        Connections to the Hub are kept alive and reused across requests.
+
+        .. versionadded:: 2.3
+        """
+        with self._api_lock:
+            if self._api_local is None:
+                self._api_local = threading.local()
+                self._api_sessions = []
+            local = self._api_local
+            sessions = self._api_sessions
+        session = getattr(local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            local.session = session
+            with self._api_lock:
+                sessions.append(session)
+        return session
+
+    def _close_api_sessions(self):
+        """Close the Hub API sessions of all threads"""
+        with self._api_lock:
+            sessions = self._api_sessions or []
+            self._api_local = None
+            self._api_sessions = None
+        for session in sessions:
+            session.close()
+
+    @property
+    def _executor(self):
+        """Thread pool running async Hub API requests"""
+        if self._api_executor is None:
+            self._api_executor = ThreadPoolExecutor(
+                self.api_request_concurrency, thread_name_prefix="hub-auth"
+            )
+        return self._api_executor
+
+    def close(self):
+        """Release the resources used for Hub API requests
+
+        Stops the response cache sweeper, the thread pool for async requests,
+        and closes connections to the Hub.
+
+        .. versionadded:: 2.3
+        """
+        if self._cache_sweeper is not None:
+            self._cache_sweeper.stop()
+            self._cache_sweeper = None
+        if self._api_executor is not None:
+            self._api_executor.shutdown(wait=False)
+            self._api_executor = None
+        self._close_api_sessions()
+
+    def __del__(self):
+        self.close()
 
     oauth_scopes = Set(
         Unicode(),
@@ -375,13 +631,9 @@ class HubAuth(SingletonConfigurable):
         Raises an HTTPError if the request failed for a reason other than no such user.
         """
         if use_cache:
-            if cache_key is None:
-                raise ValueError("cache_key is required when using cache")
-            # check for a cached reply, so we don't check with the Hub if we don't have to
-            try:
-                return self.cache[cache_key]
-            except KeyError:
-                app_log.debug("HubAuth cache miss: %s", cache_key)
+            cached = self._cached_authorization(cache_key)
+            if cached is not _cache_miss:
+                return cached
 
         data = self._api_request(
             'GET',
@@ -389,26 +641,90 @@ class HubAuth(SingletonConfigurable):
             headers={"Authorization": "token " + api_token},
             allow_403=True,
         )
+        return self._cache_authorization(data, cache_key, use_cache)
+
+    async def _check_hub_authorization_async(
+        self, url, api_token, cache_key=None, use_cache=True, batch=False
+    ):
+        """Identify a user with the Hub, without blocking
+
+        Async version of :meth:`_check_hub_authorization`.
+
+        If `batch` is True, the token may be identified together with others
+        via the Hub's bulk token API (see `token_batch_window`).
+
+        .. versionadded:: 2.3
+        """
+
+        def request():
+            if batch and self.token_batch_window > 0 and self._token_batch_supported:
+                return self._identify_token_batched(api_token)
+            return self._api_request_async(
+                'GET',
+                url,
+                headers={"Authorization": "token " + api_token},
+                allow_403=True,
+            )
+
+        if not use_cache:
+            data = await request()
+            return self._cache_authorization(data, cache_key, use_cache)
+
+        self._start_cache_sweeper()
+        cached = self._cached_authorization(cache_key)
+        if cached is _cache_miss and cache_key in self._inflight:
+            # only one request to the Hub at a time for a given cache key
+            self._coalesced += 1
+            cached = await asyncio.shield(self._inflight[cache_key])
+        if cached is not _cache_miss:
+            return cached
+
+        async def check():
+            data = await request()
+            return self._cache_authorization(data, cache_key, use_cache)
+
+        f = self._inflight[cache_key] = asyncio.ensure_future(check())
+        f.add_done_callback(lambda f: self._inflight.pop(cache_key, None))
+        return await asyncio.shield(f)
+
+    def _cached_authorization(self, cache_key):
+        """Check for a cached reply, so we don't check with the Hub if we don't have to"""
+        if cache_key is None:
+            raise ValueError("cache_key is required when using cache")
+        try:
+            return self.cache[cache_key]
+        except KeyError:
+            app_log.debug("HubAuth cache miss: %s", cache_key)
+            return _cache_miss
+
+    def _cache_authorization(self, data, cache_key, use_cache):
+        """Log and cache the reply to an authorization request"""
         if data is None:
             app_log.warning("No Hub user identified for request")
         else:
             app_log.debug("Received request from Hub user %s", data)
         if use_cache:
-            # cache result
-            self.cache[cache_key] = data
+            # cache result, failures for a shorter time
+            if data is not None:
+                self.cache[cache_key] = data
+            elif self.negative_cache_max_age > 0:
+                self.cache.set(cache_key, data, max_age=self.negative_cache_max_age)
         return data
 
-    def _api_request(self, method, url, **kwargs):
-        """Make an API request"""
-        allow_403 = kwargs.pop('allow_403', False)
+    def _prepare_api_request(self, kwargs):
+        """Add default auth and ssl options to the arguments for an API request"""
         headers = kwargs.setdefault('headers', {})
         headers.setdefault('Authorization', 'token %s' % self.api_token)
         if "cert" not in kwargs and self.certfile and self.keyfile:
             kwargs["cert"] = (self.certfile, self.keyfile)
             if self.client_ca:
                 kwargs["verify"] = self.client_ca
+        return kwargs
+
+    def _send_api_request(self, method, url, kwargs):
+        """Send an API request, returning the response"""
         try:
-            r = requests.request(method, url, **kwargs)
+            return self.api_session.request(method, url, **kwargs)
         except requests.ConnectionError as e:
             app_log.error("Error connecting to %s: %s", self.api_url, e)
             msg = "Failed to connect to Hub API at %r." % self.api_url
@@ -423,6 +739,34 @@ class HubAuth(SingletonConfigurable):
                 )
             raise HTTPError(500, msg)
 
+    def _api_request(self, method, url, **kwargs):
+        """Make an API request"""
+        allow_403 = kwargs.pop('allow_403', False)
+        kwargs = self._prepare_api_request(kwargs)
+        r = self._send_api_request(method, url, kwargs)
+        return self._api_response(r, allow_403)
+
+    async def _api_request_async(self, method, url, **kwargs):
+        """Make an API request without blocking the event loop
+
+        Requests run on a pool of `api_request_concurrency` threads,
+        sharing keep-alive connections to the Hub.
+
+        .. versionadded:: 2.3
+        """
+        allow_403 = kwargs.pop('allow_403', False)
+        kwargs = self._prepare_api_request(kwargs)
+        r = await asyncio.wrap_future(
+            self._executor.submit(self._send_api_request, method, url, kwargs)
+        )
+        return self._api_response(r, allow_403)
+
+    def _api_response(self, r, allow_403=False):
+        """Handle the response to an API request
+
+        Returns the JSON reply,
+        or None if the request was denied and `allow_403` is True.
+        """
         data = None
         if r.status_code == 403 and allow_403:
             pass
@@ -473,6 +817,12 @@ class HubAuth(SingletonConfigurable):
             "Identifying users by shared cookie is removed in JupyterHub 2.0. Use OAuth tokens."
         )
 
+    def _token_cache_key(self, token, session_id=''):
+        return 'token:{}:{}'.format(
+            session_id,
+            hashlib.sha256(token.encode("utf8", "replace")).hexdigest(),
+        )
+
     def user_for_token(self, token, use_cache=True, session_id=''):
         """Ask the Hub to identify the user for a given token.
 
@@ -491,13 +841,101 @@ class HubAuth(SingletonConfigurable):
                 "user",
             ),
             api_token=token,
-            cache_key='token:{}:{}'.format(
-                session_id,
-                hashlib.sha256(token.encode("utf8", "replace")).hexdigest(),
+            cache_key=self._token_cache_key(token, session_id),
+            use_cache=use_cache,
+        )
+
+    async def user_for_token_async(self, token, use_cache=True, session_id=''):
+        """Ask the Hub to identify the user for a given token, without blocking.
+
+        Async version of :meth:`user_for_token`.
+
+        .. versionadded:: 2.3
+        """
+        return await self._check_hub_authorization_async(
+            url=url_path_join(
+                self.api_url,
+                "user",
             ),
+            api_token=token,
+            cache_key=self._token_cache_key(token, session_id),
             use_cache=use_cache,
+            batch=True,
         )
 
+    _token_batch = List()
+    _token_batch_handle = None
+    _token_batch_supported = True
+
+    async def _identify_token_batched(self, token):
+        """Identify a token's owner together with other tokens
+
+        Tokens are collected for up to `token_batch_window` seconds,
+        then identified in one request to the Hub.
+        """
+        f = asyncio.get_running_loop().create_future()
+        self._token_batch.append((token, f))
+        if len(self._token_batch) >= self.token_batch_max_size:
+            self._flush_token_batch()
+        elif self._token_batch_handle is None:
+            self._token_batch_handle = asyncio.get_running_loop().call_later(
+                self.token_batch_window, self._flush_token_batch
+            )
+        return await f
+
+    def _flush_token_batch(self):
+        """Send the current batch of tokens to the Hub"""
+        if self._token_batch_handle is not None:
+            self._token_batch_handle.cancel()
+            self._token_batch_handle = None
+        batch, self._token_batch = self._token_batch, []
+        if batch:
+            asyncio.ensure_future(self._identify_token_batch(batch))
+
+    async def _identify_token_batch(self, batch):
+        """Identify a batch of tokens, resolving their futures"""
+        tokens = [token for token, f in batch]
+        try:
+            kwargs = self._prepare_api_request({'json': {'tokens': tokens}})
+            r = await asyncio.wrap_future(
+                self._executor.submit(
+                    self._send_api_request,
+                    'POST',
+                    url_path_join(self.api_url, 'authorizations/tokens'),
+                    kwargs,
+                )
+            )
+            if r.status_code in {403, 404}:
+                # Hub doesn't have the bulk API (JupyterHub < 2.3),
+                # or we don't have the read:tokens:owners scope
+                app_log.warning(
+                    "Cannot identify tokens in bulk (status %i),"
+                    " identifying tokens one at a time.",
+                    r.status_code,
+                )
+                self._token_batch_supported = False
+                owners = await asyncio.gather(
+                    *(
+                        self._api_request_async(
+                            'GET',
+                            url_path_join(self.api_url, "user"),
+                            headers={"Authorization": "token " + token},
+                            allow_403=True,
+                        )
+                        for token in tokens
+                    )
+                )
+            else:
+                owners = self._api_response(r)['owners']
+        except Exception as e:
+            for token, f in batch:
+                if not f.done():
+                    f.set_exception(e)
+        else:
+            for (token, f), owner in zip(batch, owners):
+                if not f.done():
+                    f.set_result(owner)
+
     auth_header_name = 'Authorization'
     auth_header_pat = re.compile(r'(?:token|bearer)\s+(.+)', re.IGNORECASE)
 
@@ -535,6 +973,10 @@ class HubAuth(SingletonConfigurable):
         # overridden in HubOAuth to store the access token after oauth
         return None
 
+    async def _get_user_cookie_async(self, handler):
+        """Get the user model from a cookie, without blocking"""
+        return None
+
     def get_session_id(self, handler):
         """Get the jupyterhub session id
 
@@ -578,7 +1020,34 @@ class HubAuth(SingletonConfigurable):
         if user_model is None:
             user_model = self._get_user_cookie(handler)
 
-        # cache result
+        return self._cache_handler_user(handler, user_model)
+
+    async def get_user_async(self, handler):
+        """Get the Hub user for a given tornado handler, without blocking.
+
+        Async version of :meth:`get_user`.
+
+        .. versionadded:: 2.3
+        """
+        if hasattr(handler, '_cached_hub_user'):
+            return handler._cached_hub_user
+
+        user_model = None
+        session_id = self.get_session_id(handler)
+
+        token = self.get_token(handler, in_cookie=False)
+        if token:
+            user_model = await self.user_for_token_async(token, session_id=session_id)
+            if user_model:
+                handler._token_authenticated = True
+
+        if user_model is None:
+            user_model = await self._get_user_cookie_async(handler)
+
+        return self._cache_handler_user(handler, user_model)
+
+    def _cache_handler_user(self, handler, user_model):
+        """Store the user identified for a handler"""
         handler._cached_hub_user = user_model
         if not user_model:
             app_log.debug("No user identified")
@@ -640,12 +1109,143 @@ class HubOAuth(HubAuth):
         token = self._get_token_cookie(handler)
         session_id = self.get_session_id(handler)
         if token:
+            assertion = handler.get_cookie(self.identity_cookie_name)
+            if assertion:
+                user_model = self.user_for_identity_assertion(
+                    assertion, token, session_id=session_id
+                )
+                if user_model is not None:
+                    return user_model
+                self.clear_identity_cookie(handler)
             user_model = self.user_for_token(token, session_id=session_id)
             if user_model is None:
                 app_log.warning("Token stored in cookie may have expired")
                 handler.clear_cookie(self.cookie_name)
             return user_model
 
+    async def _get_user_cookie_async(self, handler):
+        token = self._get_token_cookie(handler)
+        session_id = self.get_session_id(handler)
+        if token:
+            assertion = handler.get_cookie(self.identity_cookie_name)
+            if assertion:
+                user_model = await self.user_for_identity_assertion_async(
+                    assertion, token, session_id=session_id
+                )
+                if user_model is not None:
+                    return user_model
+                self.clear_identity_cookie(handler)
+            user_model = await self.user_for_token_async(token, session_id=session_id)
+            if user_model is None:
+                app_log.warning("Token stored in cookie may have expired")
+                handler.clear_cookie(self.cookie_name)
+            return user_model
+
+    # signed identity assertions
+
+    identity_keys = Dict(
+        help="""The Hub's public keys for verifying identity assertions, by key id.
+
+        Fetched from the Hub when an assertion signed with an unknown key is seen.
+
+        .. versionadded:: 2.3
+        """
+    )
+    _identity_keys_fetched = 0
+    # minimum time (in seconds) between fetching keys from the Hub
+    _identity_keys_min_interval = 10
+
+    @property
+    def identity_cookie_name(self):
+        """The cookie name for storing the signed identity assertion
+
+        .. versionadded:: 2.3
+        """
+        return self.cookie_name + '-identity'
+
+    def _should_fetch_identity_keys(self):
+        now = time.monotonic()
+        if now - self._identity_keys_fetched < self._identity_keys_min_interval:
+            return False
+        self._identity_keys_fetched = now
+        return True
+
+    def _identity_keys_url(self):
+        return url_path_join(self.api_url, 'authorizations/keys')
+
+    def _check_identity_assertion(self, assertion, token, session_id=''):
+        """Verify an identity assertion for a token
+
+        Returns the user model, or None if the assertion is not valid
+        for this token and session.
+        Raises UnknownAssertionKey if the key should be fetched from the Hub.
+        """
+        try:
+            claims = crypto.verify_identity_assertion(
+                assertion, self.identity_keys, audience=self.oauth_client_id
+            )
+        except crypto.UnknownAssertionKey:
+            raise
+        except (crypto.InvalidAssertion, crypto.CryptographyUnavailable) as e:
+            app_log.debug("Not using identity assertion: %s", e)
+            return None
+        token_hash = hashlib.sha256(token.encode("utf8", "replace")).hexdigest()
+        if claims.get('token_sha256') != token_hash:
+            app_log.warning("Identity assertion does not match token")
+            return None
+        user_model = claims['identity']
+        if user_model.get('session_id') and user_model['session_id'] != session_id:
+            # the Hub session has changed or ended, e.g. logout.
+            # Let the caller ask the Hub instead.
+            return None
+        return user_model
+
+    def user_for_identity_assertion(self, assertion, token, session_id=''):
+        """Identify the user for a token with a signed identity assertion
+
+        Assertions are issued by the Hub with OAuth tokens,
+        if `JupyterHub.identity_assertion_max_age` is set.
+        They are verified locally with the Hub's public key,
+        without a request to the Hub API,
+        except to fetch the key.
+
+        Returns:
+            user_model (dict): The user model, if the assertion is valid,
+                None otherwise.
+
+        .. versionadded:: 2.3
+        """
+        try:
+            return self._check_identity_assertion(assertion, token, session_id)
+        except crypto.UnknownAssertionKey:
+            if not self._should_fetch_identity_keys():
+                return None
+        reply = self._api_request('GET', self._identity_keys_url())
+        self.identity_keys = reply['keys']
+        try:
+            return self._check_identity_assertion(assertion, token, session_id)
+        except crypto.UnknownAssertionKey:
+            return None
+
+    async def user_for_identity_assertion_async(self, assertion, token, session_id=''):
+        """Identify the user for a token with a signed identity assertion, without blocking
+
+        Async version of :meth:`user_for_identity_assertion`.
+
+        .. versionadded:: 2.3
+        """
+        try:
+            return self._check_identity_assertion(assertion, token, session_id)
+        except crypto.UnknownAssertionKey:
+            if not self._should_fetch_identity_keys():
+                return None
+        reply = await self._api_request_async('GET', self._identity_keys_url())
+        self.identity_keys = reply['keys']
+        try:
+            return self._check_identity_assertion(assertion, token, session_id)
+        except crypto.UnknownAssertionKey:
+            return None
+
     # HubOAuth API
 
     oauth_client_id = Unicode(
@@ -695,6 +1295,23 @@ class HubOAuth(HubAuth):
     def _token_url(self):
         return url_path_join(self.api_url, 'oauth2/token')
 
+    def _token_for_code_args(self, code):
+        """Arguments for the request for an OAuth token"""
+        # GitHub specifies a POST request yet requires URL parameters
+        params = dict(
+            client_id=self.oauth_client_id,
+            client_secret=self.api_token,
+            grant_type='authorization_code',
+            code=code,
+            redirect_uri=self.oauth_redirect_uri,
+        )
+        return dict(
+            method='POST',
+            url=self.oauth_token_url,
+            data=urlencode(params).encode('utf8'),
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        )
+
     def token_for_code(self, code):
         """Get token for OAuth temporary code
 
@@ -706,24 +1323,29 @@ class HubOAuth(HubAuth):
         Returns:
             token (str): JupyterHub API Token
         """
-        # GitHub specifies a POST request yet requires URL parameters
-        params = dict(
-            client_id=self.oauth_client_id,
-            client_secret=self.api_token,
-            grant_type='authorization_code',
-            code=code,
-            redirect_uri=self.oauth_redirect_uri,
-        )
+        token_reply = self._api_request(**self._token_for_code_args(code))
+        return token_reply['access_token']
 
-        token_reply = self._api_request(
-            'POST',
-            self.oauth_token_url,
-            data=urlencode(params).encode('utf8'),
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-        )
+    async def token_for_code_async(self, code):
+        """Get token for OAuth temporary code, without blocking
+
+        Async version of :meth:`token_for_code`.
 
+        .. versionadded:: 2.3
+        """
+        token_reply = await self.token_reply_for_code_async(code)
         return token_reply['access_token']
 
+    async def token_reply_for_code_async(self, code):
+        """Get the full OAuth token reply for a temporary code, without blocking
+
+        In addition to `access_token`, the reply may include
+        a signed `identity_assertion`, if the Hub issues them.
+
+        .. versionadded:: 2.3
+        """
+        return await self._api_request_async(**self._token_for_code_args(code))
+
     def _encode_state(self, state):
         """Encode a state dict as url-safe base64"""
         # trim trailing `=` because = is itself not url-safe!
@@ -846,9 +1468,29 @@ class HubOAuth(HubAuth):
         )
         handler.set_secure_cookie(self.cookie_name, access_token, **kwargs)
 
+    def set_identity_cookie(self, handler, assertion):
+        """Set a cookie storing a signed identity assertion
+
+        .. versionadded:: 2.3
+        """
+        kwargs = {'path': self.base_url, 'httponly': True}
+        if get_browser_protocol(handler.request) == 'https':
+            kwargs['secure'] = True
+        # load user cookie overrides
+        kwargs.update(self.cookie_options)
+        handler.set_cookie(self.identity_cookie_name, assertion, **kwargs)
+
+    def clear_identity_cookie(self, handler):
+        """Clear the identity assertion cookie
+
+        .. versionadded:: 2.3
+        """
+        handler.clear_cookie(self.identity_cookie_name, path=self.base_url)
+
     def clear_cookie(self, handler):
         """Clear the OAuth cookie"""
         handler.clear_cookie(self.cookie_name, path=self.base_url)
+        self.clear_identity_cookie(handler)
 
 
 class UserNotAllowed(Exception):
@@ -902,6 +1544,14 @@ class HubAuthenticated:
             def get(self):
                 ...
 
+    `get_current_user` identifies users with blocking requests to the Hub.
+    To identify them without blocking the event loop,
+    await `get_current_user_async` in `prepare`::
+
+        class MyHandler(HubAuthenticated, web.RequestHandler):
+            async def prepare(self):
+                await self.get_current_user_async()
+
     """
 
     # deprecated, pre-2.0 allow sets
@@ -1044,6 +1694,25 @@ class HubAuthenticated:
         if hasattr(self, '_hub_auth_user_cache'):
             return self._hub_auth_user_cache
         user_model = self.hub_auth.get_user(self)
+        return self._check_current_user(user_model)
+
+    async def get_current_user_async(self):
+        """Identify the current user, without blocking
+
+        Async version of :meth:`get_current_user`.
+        Tornado's get_current_user cannot be async,
+        so await this in `prepare`,
+        and get_current_user returns its result.
+
+        .. versionadded:: 2.3
+        """
+        if hasattr(self, '_hub_auth_user_cache'):
+            return self._hub_auth_user_cache
+        user_model = await self.hub_auth.get_user_async(self)
+        return self._check_current_user(user_model)
+
+    def _check_current_user(self, user_model):
+        """Check and cache the user model identified by the Hub"""
         if not user_model:
             self._hub_auth_user_cache = None
             return
@@ -1123,12 +1792,25 @@ class HubOAuthCallbackHandler(HubOAuthenticated, RequestHandler):
             app_log.warning("oauth state %r != %r", arg_state, cookie_state)
             raise HTTPError(403, "oauth state does not match. Try logging in again.")
         next_url = self.hub_auth.get_next_url(cookie_state)
-        # TODO: make async (in a Thread?)
-        token = self.hub_auth.token_for_code(code)
+        token_reply = await self.hub_auth.token_reply_for_code_async(code)
+        token = token_reply['access_token']
         session_id = self.hub_auth.get_session_id(self)
-        user_model = self.hub_auth.user_for_token(token, session_id=session_id)
+        assertion = token_reply.get('identity_assertion')
+        user_model = None
+        if assertion:
+            user_model = await self.hub_auth.user_for_identity_assertion_async(
+                assertion, token, session_id=session_id
+            )
+            if user_model is None:
+                assertion = None
+        if user_model is None:
+            user_model = await self.hub_auth.user_for_token_async(
+                token, session_id=session_id
+            )
         if user_model is None:
             raise HTTPError(500, "oauth callback failed to identify a user")
         app_log.info("Logged-in user %s", user_model)
         self.hub_auth.set_cookie(self, token)
+        if assertion:
+            self.hub_auth.set_identity_cookie(self, assertion)
         self.redirect(next_url or self.hub_auth.base_url)
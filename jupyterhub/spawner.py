@@ -4,21 +4,28 @@ Contains base Spawner class & default implementation
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 import ast
+import asyncio
+import heapq
 import json
 import os
 import pipes
 import shutil
 import signal
 import sys
+import time
 import warnings
+from collections import deque
+from functools import partial
 from inspect import signature
+from subprocess import PIPE
 from subprocess import Popen
 from tempfile import mkdtemp
 from urllib.parse import urlparse
+from weakref import WeakKeyDictionary
 
 from async_generator import aclosing
 from sqlalchemy import inspect
-from tornado.ioloop import PeriodicCallback
+from tornado.log import app_log
 from traitlets import Any
 from traitlets import Bool
 from traitlets import default
@@ -33,6 +40,13 @@ from traitlets import Union
 from traitlets import validate
 from traitlets.config import LoggingConfigurable
 
+from .metrics import SERVER_POLL_BATCH_DURATION_SECONDS
+from .metrics import SERVER_POLL_BATCH_SIZE
+from .metrics import SERVER_POLL_LAG_SECONDS
+from .metrics import SERVER_POOL_ASSIGN_DURATION_SECONDS
+from .metrics import SERVER_POOL_IDLE
+from .metrics import SERVER_POOL_REQUESTS
+from .metrics import ServerPoolStatus
 from .objects import Server
 from .traitlets import ByteSpecification
 from .traitlets import Callable
@@ -65,6 +79,298 @@ def _quote_safe(s):
         return repr(s)
 
 
+class _CountedFlag:
+    """A private Spawner status flag
+
+    Setting the flag updates the server counts of the UserDict
+    the Spawner belongs to, so that counting pending/active/ready servers
+    doesn't need to scan every Spawner.
+    """
+
+    def __set_name__(self, owner, name):
+        self.attr = '_flag' + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return obj.__dict__.get(self.attr, False)
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.attr] = value
+        obj._update_server_counts()
+
+
+class _PollEntry:
+    """A spawner scheduled for polling by a SpawnerPoller"""
+
+    def __init__(self, poller, spawner, due):
+        self.poller = poller
+        self.spawner = spawner
+        self.due = due
+        self.stopped = False
+
+    def __lt__(self, other):
+        return self.due < other.due
+
+    def stop(self):
+        if not self.stopped:
+            self.stopped = True
+            self.poller._stopped()
+
+
+class SpawnerPoller:
+    """Poll the servers of all spawners from one scheduler
+
+    Polls are spread evenly across each spawner's `poll_interval`,
+    instead of every spawner polling on its own timer.
+    Spawners of the same class that are due at the same time
+    are polled together with :meth:`Spawner.poll_many`,
+    unless the class overrides :meth:`Spawner.poll_and_notify`,
+    in which case each spawner is polled with its `poll_and_notify`.
+
+    There is one poller per event loop, returned by :meth:`instance`.
+
+    .. versionadded:: 2.3
+    """
+
+    # use weak dict so that the poller is always running in the current asyncio loop,
+    # like proxy._one_at_a_time
+    _instances = WeakKeyDictionary()
+
+    @classmethod
+    def instance(cls):
+        """Return the poller for the current event loop"""
+        loop = asyncio.get_event_loop()
+        poller = cls._instances.get(loop)
+        if poller is None:
+            poller = cls._instances[loop] = cls()
+        return poller
+
+    def __init__(self):
+        self._heap = []
+        self._added = 0
+        self._active = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # hold references to running tasks, so they aren't garbage-collected
+        self._tasks = set()
+
+    def add(self, spawner):
+        """Start polling a spawner
+
+        Returns an object whose `stop()` method stops polling the spawner.
+        """
+        # offsets from the golden ratio sequence spread
+        # spawners added at the same time evenly across the interval
+        self._added += 1
+        self._active += 1
+        offset = (self._added * 0.6180339887498949) % 1
+        due = time.monotonic() + offset * spawner.poll_interval
+        entry = _PollEntry(self, spawner, due)
+        self._schedule(entry)
+        return entry
+
+    def _stopped(self):
+        self._active -= 1
+        if not self._active:
+            # nothing left to poll, stop waiting for stopped entries
+            self._heap.clear()
+            self._wakeup.set()
+
+    def _run_task(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _schedule(self, entry):
+        heapq.heappush(self._heap, entry)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        elif self._heap[0] is entry:
+            # wake up earlier than planned
+            self._wakeup.set()
+
+    async def _run(self):
+        while self._heap:
+            if self._heap[0].stopped:
+                heapq.heappop(self._heap)
+                continue
+            now = time.monotonic()
+            delay = self._heap[0].due - now
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batches = {}
+            while self._heap and self._heap[0].due <= now:
+                entry = heapq.heappop(self._heap)
+                if entry.stopped:
+                    continue
+                SERVER_POLL_LAG_SECONDS.observe(now - entry.due)
+                batches.setdefault(type(entry.spawner), []).append(entry)
+            for spawner_class, entries in batches.items():
+                self._run_task(self._poll_batch(spawner_class, entries))
+
+    async def _poll_batch(self, spawner_class, entries):
+        spawners = [entry.spawner for entry in entries]
+        SERVER_POLL_BATCH_SIZE.observe(len(spawners))
+        # subclasses overriding poll_and_notify still have it called
+        # and notify stopped servers themselves
+        notify = spawner_class.poll_and_notify is Spawner.poll_and_notify
+        tic = time.perf_counter()
+        try:
+            if notify:
+                statuses = await spawner_class.poll_many(spawners)
+            else:
+                statuses = await asyncio.gather(
+                    *(spawner.poll_and_notify() for spawner in spawners),
+                    return_exceptions=True,
+                )
+        except Exception as e:
+            statuses = [e] * len(spawners)
+        SERVER_POLL_BATCH_DURATION_SECONDS.observe(time.perf_counter() - tic)
+
+        now = time.monotonic()
+        for entry, status in zip(entries, statuses):
+            spawner = entry.spawner
+            if entry.stopped:
+                continue
+            if isinstance(status, Exception):
+                spawner.log.error(
+                    "Error polling %s", spawner._log_name, exc_info=status
+                )
+            elif status is not None:
+                entry.stop()
+                if notify:
+                    self._run_task(spawner._notify_stopped(status))
+                continue
+            entry.due += spawner.poll_interval
+            if entry.due < now:
+                # too far behind, don't catch up with missed polls
+                entry.due = now + spawner.poll_interval
+            self._schedule(entry)
+
+
+class SpawnerPool:
+    """A warm pool of servers, started before anyone asks for them
+
+    A `spawner_class` Spawner not associated with any user (the template),
+    created with `spawner_kwargs` when the pool is first filled,
+    fills the pool with :meth:`Spawner.start_pooled`.
+    A Spawner of the same class takes a server from the pool
+    with :meth:`assign` in its `start`,
+    making it its user's server,
+    and the pool is refilled in the background.
+
+    .. versionadded:: 2.3
+    """
+
+    # seconds to wait before trying again after failing to start a pooled server
+    retry_delay = 10
+
+    def __init__(self, spawner_class, size, **spawner_kwargs):
+        self.spawner_class = spawner_class
+        self.size = size
+        self.spawner_kwargs = spawner_kwargs
+        self.template = None
+        self._idle = deque()
+        self._fill_task = None
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._idle)
+
+    @property
+    def log(self):
+        if self.template is None:
+            return app_log
+        return self.template.log
+
+    def fill(self):
+        """Start pooled servers in the background until the pool is full"""
+        if self._stopped:
+            return
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.ensure_future(self._fill())
+
+    async def _fill(self):
+        while not self._stopped and len(self._idle) < self.size:
+            try:
+                if self.template is None:
+                    self.template = self.spawner_class(**self.spawner_kwargs)
+                handle = await self.template.start_pooled()
+            except NotImplementedError as e:
+                self.log.error("Not filling the server pool: %s", e)
+                self._stopped = True
+                return
+            except Exception:
+                self.log.exception("Failed to start a pooled server")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            if self._stopped:
+                await self._discard(handle)
+                return
+            self._idle.append(handle)
+            SERVER_POOL_IDLE.set(len(self._idle))
+
+    async def _discard(self, handle):
+        try:
+            await self.template.stop_pooled(handle)
+        except Exception:
+            self.log.exception("Failed to stop pooled server %s", handle)
+
+    async def assign(self, spawner, assign):
+        """Assign a server from the pool to spawner
+
+        `assign(handle)` turns the pooled server identified by handle
+        into the spawner's server, e.g. by giving it the user's
+        API token, URL prefix and environment.
+        Its result is returned.
+
+        Returns None if the pool has no server for this spawner,
+        in which case the spawner should start one itself.
+        """
+        if type(spawner) is not self.spawner_class:
+            return None
+        tic = time.perf_counter()
+        while self._idle:
+            handle = self._idle.popleft()
+            SERVER_POOL_IDLE.set(len(self._idle))
+            self.fill()
+            try:
+                result = await assign(handle)
+            except Exception as e:
+                self.log.warning(
+                    "Failed to assign pooled server to %s: %s", spawner._log_name, e
+                )
+                SERVER_POOL_REQUESTS.labels(status=ServerPoolStatus.failure).inc()
+                asyncio.ensure_future(self._discard(handle))
+                continue
+            SERVER_POOL_REQUESTS.labels(status=ServerPoolStatus.hit).inc()
+            SERVER_POOL_ASSIGN_DURATION_SECONDS.observe(time.perf_counter() - tic)
+            return result
+        SERVER_POOL_REQUESTS.labels(status=ServerPoolStatus.miss).inc()
+        self.fill()
+        return None
+
+    async def stop(self):
+        """Stop filling the pool and stop all idle servers"""
+        self._stopped = True
+        if self._fill_task is not None:
+            # let a server being started finish, so it can be stopped
+            await self._fill_task
+        handles = list(self._idle)
+        self._idle.clear()
+        SERVER_POOL_IDLE.set(0)
+        if handles:
+            self.log.info("Stopping %i pooled servers", len(handles))
+            await asyncio.gather(*(self._discard(handle) for handle in handles))
+
+
 class Spawner(LoggingConfigurable):
     """Base class for spawning single-user notebook servers.
 
@@ -82,14 +388,60 @@ class Spawner(LoggingConfigurable):
     """
 
     # private attributes for tracking status
-    _spawn_pending = False
+    _spawn_pending = _CountedFlag()
     _start_pending = False
-    _stop_pending = False
-    _proxy_pending = False
-    _check_pending = False
+    _stop_pending = _CountedFlag()
+    _proxy_pending = _CountedFlag()
+    _check_pending = _CountedFlag()
     _waiting_for_response = False
     _jupyterhub_version = None
     _spawn_future = None
+    # SpawnQueue entry while a spawn is waiting for admission
+    _spawn_queue_entry = None
+
+    # server counts shared by all Spawners in a UserDict (see UserDict.count_active_users)
+    # and the keys this Spawner currently contributes to them
+    _server_counts = None
+    _counted_keys = ()
+
+    def _server_count_keys(self):
+        """Return the server count keys matching this Spawner's current state"""
+        keys = []
+        pending = self.pending
+        if pending:
+            keys.append('pending')
+            keys.append(pending + '_pending')
+        if self.active:
+            keys.append('active')
+        if self.ready:
+            keys.append('ready')
+        return tuple(keys)
+
+    def _update_server_counts(self):
+        """Update the shared server counts after a change of state"""
+        counts = self._server_counts
+        if counts is None:
+            return
+        keys = self._server_count_keys()
+        if keys == self._counted_keys:
+            return
+        for key in self._counted_keys:
+            counts[key] -= 1
+        for key in keys:
+            counts[key] += 1
+        self._counted_keys = keys
+
+    def _track_server_counts(self, counts):
+        """Start contributing to shared server counts
+
+        counts=None removes this Spawner's contribution from the counts it was tracked in.
+        """
+        if self._server_counts is not None:
+            for key in self._counted_keys:
+                self._server_counts[key] -= 1
+        self._counted_keys = ()
+        self._server_counts = counts
+        self._update_server_counts()
 
     @property
     def _log_name(self):
@@ -152,6 +504,8 @@ class Spawner(LoggingConfigurable):
     orm_spawner = Any()
     db = Any()
     cookie_options = Dict()
+    # SpawnerPool to take servers from, if any
+    server_pool = Any()
 
     @observe('orm_spawner')
     def _orm_spawner_changed(self, change):
@@ -159,6 +513,7 @@ class Spawner(LoggingConfigurable):
             self._server = Server(orm_server=change.new.server)
         else:
             self._server = None
+        self._update_server_counts()
 
     user = Any()
 
@@ -214,7 +569,9 @@ class Spawner(LoggingConfigurable):
         self._server = server
         if self.orm_spawner is not None:
             if server is not None and server.orm_server == self.orm_spawner.server:
-                # no change
+                # no change to the orm server,
+                # but _server may have been None
+                self._update_server_counts()
                 return
             if self.orm_spawner.server is not None:
                 # delete the old value
@@ -230,6 +587,7 @@ class Spawner(LoggingConfigurable):
             self.log.warning(
                 "Setting Spawner.server for {self._log_name} with no underlying orm_spawner"
             )
+        self._update_server_counts()
 
     @property
     def name(self):
@@ -360,6 +718,11 @@ class Spawner(LoggingConfigurable):
         At every poll interval, each spawner's `.poll` method is called, which checks
         if the single-user server is still running. If it isn't running, then JupyterHub modifies
         its own state accordingly and removes appropriate routes from the configurable proxy.
+
+        .. versionchanged:: 2.3
+            Polls of all spawners are spread across the interval,
+            and due spawners of the same class are polled together
+            with :meth:`poll_many`.
         """,
     ).tag(config=True)
 
@@ -1141,6 +1504,12 @@ class Spawner(LoggingConfigurable):
 
         yield {"progress": 0, "message": "Server requested"}
 
+        queue_entry = self._spawn_queue_entry
+        if queue_entry is not None:
+            async with aclosing(queue_entry.queue.progress(queue_entry)) as queued:
+                async for event in queued:
+                    yield event
+
         async with aclosing(self.progress()) as progress:
             async for event in progress:
                 yield event
@@ -1218,6 +1587,60 @@ class Spawner(LoggingConfigurable):
         """
         raise NotImplementedError("Override in subclass. Must be a coroutine.")
 
+    @classmethod
+    async def poll_many(cls, spawners):
+        """Check if many single-user servers are running
+
+        Called periodically with the running spawners of this class
+        that are due to be polled.
+        Spawners that can check many servers at once,
+        e.g. with one request to a cluster API, may override this.
+        The default implementation calls :meth:`poll` of each spawner concurrently.
+
+        .. versionadded:: 2.3
+
+        Args:
+            spawners (list): Spawner instances of this class
+        Returns:
+            statuses (list):
+                For each spawner, the result of :meth:`poll`,
+                or the exception raised while polling it.
+        """
+        return await asyncio.gather(
+            *(spawner.poll() for spawner in spawners), return_exceptions=True
+        )
+
+    async def start_pooled(self):
+        """Start a server for the warm pool, not yet assigned to any user
+
+        Called on a Spawner that is not associated with a user
+        when `JupyterHub.server_pool_size` is set.
+        Spawners that support a warm pool should override this,
+        and take servers from :attr:`server_pool` in :meth:`start`
+        with :meth:`SpawnerPool.assign`.
+
+        .. versionadded:: 2.3
+
+        Returns:
+            handle: an object identifying the pooled server,
+            passed to :meth:`stop_pooled` or to the Spawner it is assigned to.
+        """
+        raise NotImplementedError(
+            "%s does not support a server pool" % self.__class__.__name__
+        )
+
+    async def stop_pooled(self, handle):
+        """Stop a pooled server that was not assigned to any user
+
+        .. versionadded:: 2.3
+
+        Args:
+            handle: the result of :meth:`start_pooled`
+        """
+        raise NotImplementedError(
+            "%s does not support a server pool" % self.__class__.__name__
+        )
+
     def delete_forever(self):
         """Called when a user or server is deleted.
 
@@ -1257,18 +1680,24 @@ class Spawner(LoggingConfigurable):
 
         self.stop_polling()
 
-        self._poll_callback = PeriodicCallback(
-            self.poll_and_notify, 1e3 * self.poll_interval
-        )
-        self._poll_callback.start()
+        self._poll_callback = SpawnerPoller.instance().add(self)
 
     async def poll_and_notify(self):
-        """Used as a callback to periodically poll the process and notify any watchers"""
+        """Used as a callback to periodically poll the process and notify any watchers
+
+        .. versionchanged:: 2.3
+            Periodic polling checks spawners with :meth:`poll_many`
+            and notifies watchers without calling this method,
+            unless a subclass overrides it.
+        """
         status = await self.poll()
         if status is None:
             # still running, nothing to do here
             return
+        return await self._notify_stopped(status)
 
+    async def _notify_stopped(self, status):
+        """Stop polling and fire the poll callbacks of a stopped server"""
         self.stop_polling()
 
         # clear callbacks list
@@ -1445,6 +1874,9 @@ class LocalProcessSpawner(Spawner):
         """,
     )
 
+    # (pid, future resolving when the process exits)
+    _exit_watch = None
+
     def make_preexec_fn(self, name):
         """
         Return a function that can be used to set the user id of the spawned process to user with name `name`
@@ -1558,6 +1990,21 @@ class LocalProcessSpawner(Spawner):
             # add our cmd list as the last (single) argument:
             cmd = self.shell_cmd + [' '.join(pipes.quote(s) for s in cmd)]
 
+        module = self._pooled_module(env)
+        if module and self.server_pool is not None:
+            proc = await self.server_pool.assign(
+                self, partial(self._assign_pooled, module, cmd, env)
+            )
+            if proc is not None:
+                self.log.info(
+                    "Spawning %s in pooled process %i",
+                    ' '.join(pipes.quote(s) for s in cmd),
+                    proc.pid,
+                )
+                self.proc = proc
+                self.pid = proc.pid
+                return (self.ip or '127.0.0.1', self.port)
+
         self.log.info("Spawning %s", ' '.join(pipes.quote(s) for s in cmd))
 
         popen_kwargs = dict(
@@ -1583,6 +2030,105 @@ class LocalProcessSpawner(Spawner):
 
         return (self.ip or '127.0.0.1', self.port)
 
+    def _pooled_env(self):
+        """The environment pooled processes are started with"""
+        return {key: os.environ[key] for key in self.env_keep if key in os.environ}
+
+    def _pooled_module(self, env):
+        """Return the module a pooled process should run for this server
+
+        Pooled processes run the single-user server with the Hub's Python,
+        so only servers launched as a Python module with the default
+        way of starting processes can use them,
+        when the command found on the server's $PATH is installed with the Hub's Python,
+        and the server's environment doesn't configure Python differently.
+        Returns None if a pooled process can't be used.
+        """
+        if (
+            self.shell_cmd
+            or self.popen_kwargs
+            or type(self).make_preexec_fn is not LocalProcessSpawner.make_preexec_fn
+        ):
+            return None
+        cmd = list(self.cmd)
+        if not cmd:
+            return None
+        path = shutil.which(cmd[0], path=env.get('PATH'))
+        if path is None:
+            return None
+        path = os.path.abspath(path)
+        prefix = os.path.abspath(sys.prefix)
+        if os.path.commonpath([path, prefix]) != prefix:
+            # not the Hub's installation
+            return None
+        # Python reads these when it starts,
+        # and pooled processes have already started
+        pooled_env = self._pooled_env()
+        for key in set(env).union(pooled_env):
+            if key.startswith('PYTHON') and env.get(key) != pooled_env.get(key):
+                return None
+        if cmd == ['jupyterhub-singleuser']:
+            return 'jupyterhub.singleuser'
+        if len(cmd) == 3 and cmd[1] == '-m' and os.path.samefile(path, sys.executable):
+            return cmd[2]
+        return None
+
+    async def _assign_pooled(self, module, cmd, env, proc):
+        """Start the server in a pooled process
+
+        Sends the process what it would otherwise have been launched with.
+        """
+        if proc.poll() is not None:
+            raise RuntimeError(
+                "pooled process %i exited with status %s" % (proc.pid, proc.returncode)
+            )
+        assignment = {
+            'username': self.user.name,
+            'module': module,
+            'argv': cmd,
+            'env': env,
+        }
+        proc.stdin.write(json.dumps(assignment).encode('utf8') + b'\n')
+        proc.stdin.close()
+        return proc
+
+    async def start_pooled(self):
+        """Start a Python process that has imported the single-user server
+
+        The process waits for :meth:`start` to assign it to a user,
+        skipping the time it takes to start Python and import the server.
+
+        Pooled processes run as the Hub's user until they are assigned,
+        with only the environment variables in `env_keep`.
+        Once assigned, they switch to the user,
+        their environment and per-user site-packages,
+        but keep the modules already imported from the Hub's Python installation.
+
+        .. versionadded:: 2.3
+        """
+        cmd = [sys.executable, '-m', 'jupyterhub._pooled_server']
+        return Popen(cmd, env=self._pooled_env(), stdin=PIPE, start_new_session=True)
+
+    async def stop_pooled(self, proc):
+        """Stop a pooled process that was not assigned to any user
+
+        .. versionadded:: 2.3
+        """
+        # closing stdin tells the process it won't be assigned
+        proc.stdin.close()
+        for stop, timeout in (
+            (proc.terminate, self.term_timeout),
+            (proc.kill, self.kill_timeout),
+        ):
+            if proc.poll() is not None:
+                return
+            stop()
+            deadline = time.monotonic() + timeout
+            while proc.poll() is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+        if proc.poll() is None:
+            self.log.warning("Pooled process %i did not exit", proc.pid)
+
     async def poll(self):
         """Poll the spawned process to see if it is still running.
 
@@ -1618,6 +2164,31 @@ class LocalProcessSpawner(Spawner):
         else:
             return None
 
+    @classmethod
+    async def poll_many(cls, spawners):
+        """Poll many local processes in one pass
+
+        Checking a local process doesn't wait for anything,
+        so processes are checked one after another
+        instead of polling each spawner in its own task.
+        Subclasses that override how processes are checked
+        are polled concurrently instead.
+
+        .. versionadded:: 2.3
+        """
+        if (
+            cls.poll is not LocalProcessSpawner.poll
+            or cls._signal is not LocalProcessSpawner._signal
+        ):
+            return await super().poll_many(spawners)
+        statuses = []
+        for spawner in spawners:
+            try:
+                statuses.append(await spawner.poll())
+            except Exception as e:
+                statuses.append(e)
+        return statuses
+
     async def _signal(self, sig):
         """Send given signal to a single-user server's process.
 
@@ -1633,6 +2204,78 @@ class LocalProcessSpawner(Spawner):
             raise  # Can be EPERM or EINVAL
         return True  # process exists
 
+    def _watch_exit(self):
+        """Return a future resolving when the process exits, without polling
+
+        Uses a pidfd (Linux >= 5.3, Python >= 3.9),
+        which becomes readable when the process exits.
+        Returns None if the process can't be watched.
+        """
+        pid = self.pid
+        if not pid or not hasattr(os, 'pidfd_open'):
+            return None
+        if self._exit_watch is not None and self._exit_watch[0] == pid:
+            return self._exit_watch[1]
+        try:
+            pidfd = os.pidfd_open(pid)
+        except OSError as e:
+            # process is gone, or the kernel doesn't support pidfds
+            self.log.debug("Not watching process %i for exit: %s", pid, e)
+            return None
+
+        loop = asyncio.get_event_loop()
+        exited = loop.create_future()
+
+        def on_exit():
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+            if not exited.done():
+                exited.set_result(None)
+
+        try:
+            loop.add_reader(pidfd, on_exit)
+        except NotImplementedError:
+            # event loop without add_reader
+            os.close(pidfd)
+            return None
+        self._exit_watch = (pid, exited)
+        return exited
+
+    def _process_exited(self, future):
+        # poll right away if we are still polling
+        if self._poll_callback is not None:
+            asyncio.ensure_future(self.poll_and_notify())
+
+    def start_polling(self):
+        """Start polling for the process's running state
+
+        .. versionchanged:: 2.3
+            Where the process can be watched (Linux, with pidfds),
+            poll callbacks fire as soon as the process exits.
+            Periodic polling remains as a fallback.
+        """
+        super().start_polling()
+        exited = self._watch_exit()
+        if exited is not None:
+            exited.add_done_callback(self._process_exited)
+
+    async def wait_for_death(self, timeout=10):
+        """Wait for the process to die, up to timeout seconds
+
+        .. versionchanged:: 2.3
+            Waits for the process to exit without polling,
+            where the process can be watched.
+        """
+        exited = self._watch_exit()
+        if exited is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(exited), timeout)
+            except asyncio.TimeoutError:
+                return False
+        # poll to collect the process,
+        # or until it dies if it can't be watched
+        return await super().wait_for_death(timeout)
+
     async def stop(self, now=False):
         """Stop the single-user server process for the current user.
 
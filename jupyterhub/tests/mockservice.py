@@ -77,6 +77,9 @@ class OWhoAmIHandler(HubOAuthenticated, web.RequestHandler):
     Uses OAuth login flow
     """
 
+    async def prepare(self):
+        await self.get_current_user_async()
+
     def get_login_url(self):
         login_url = super().get_login_url()
         scopes = self.get_argument("request-scope", None)
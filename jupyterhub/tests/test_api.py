@@ -11,12 +11,22 @@ from urllib.parse import quote
 from urllib.parse import urlparse
 from urllib.parse import urlunparse
 
+import pytest
+import requests
 from pytest import fixture
 from pytest import mark
 from tornado.httputil import url_concat
 
 import jupyterhub
+from .. import crypto
+from .. import dbutil
 from .. import orm
+from ..apihandlers.base import APIHandler
+from ..apihandlers.base import decode_cursor
+from ..apihandlers.base import encode_cursor
+from ..apihandlers.base import iter_json
+from ..apihandlers.base import JSONStream
+from ..apihandlers.base import paginate_query
 from ..apihandlers.base import PAGINATION_MEDIA_TYPE
 from ..objects import Server
 from ..utils import url_path_join as ujoin
@@ -28,6 +38,7 @@ from .utils import add_user
 from .utils import api_request
 from .utils import async_requests
 from .utils import auth_header
+from .utils import count_queries
 from .utils import find_user
 
 
@@ -66,6 +77,100 @@ async def test_auth_api(app):
     assert r.status_code == 403
 
 
+async def test_token_owners_api(
+    app, create_user_with_scopes, create_service_with_scopes
+):
+    user = create_user_with_scopes("read:users:activity!user")
+    user_token = user.new_api_token()
+    service = create_service_with_scopes("read:users:name")
+    service_token = service.new_api_token()
+    requester = create_service_with_scopes("read:tokens:owners")
+    requester_token = requester.new_api_token()
+    app.db.commit()
+
+    # each token gets the same model as from /api/user
+    r = await api_request(app, 'user', headers={'Authorization': f'token {user_token}'})
+    r.raise_for_status()
+    expected_user_model = r.json()
+    orm_token = orm.APIToken.find(app.db, user_token)
+    last_activity = orm_token.last_activity
+    user_last_activity = user.last_activity
+
+    tokens = [user_token, "no-such-token", service_token]
+    r = await api_request(
+        app,
+        'authorizations/tokens',
+        method='post',
+        data=json.dumps({'tokens': tokens}),
+        headers={'Authorization': f'token {requester_token}'},
+    )
+    assert r.status_code == 200
+    owners = r.json()['owners']
+    assert len(owners) == len(tokens)
+    user_model, missing, service_model = owners
+    assert user_model == expected_user_model
+    assert 'last_activity' in user_model
+    assert missing is None
+    assert service_model['kind'] == 'service'
+    assert service_model['name'] == service.name
+    assert 'read:users:name' in service_model['scopes']
+
+    # looking up tokens isn't activity
+    app.db.expire_all()
+    assert orm_token.last_activity == last_activity
+    assert user.last_activity == user_last_activity
+
+    # requires the read:tokens:owners scope, for services only
+    r = await api_request(
+        app,
+        'authorizations/tokens',
+        method='post',
+        data=json.dumps({'tokens': tokens}),
+        headers={'Authorization': f'token {service_token}'},
+    )
+    assert r.status_code == 403
+    scoped_user = create_user_with_scopes("read:tokens:owners")
+    r = await api_request(
+        app,
+        'authorizations/tokens',
+        method='post',
+        data=json.dumps({'tokens': tokens}),
+        headers=auth_header(app.db, scoped_user.name),
+    )
+    assert r.status_code == 403
+    # not even for admins
+    r = await api_request(
+        app,
+        'authorizations/tokens',
+        method='post',
+        data=json.dumps({'tokens': tokens}),
+    )
+    assert r.status_code == 403
+
+    # invalid requests
+    for tokens in ['abc', ['x'] * 101]:
+        r = await api_request(
+            app,
+            'authorizations/tokens',
+            method='post',
+            data=json.dumps({'tokens': tokens}),
+            headers={'Authorization': f'token {requester_token}'},
+        )
+        assert r.status_code == 400
+
+
+async def test_identity_keys_api(app):
+    signer = crypto.IdentitySigner()
+    with mock.patch.dict(app.tornado_settings, {'identity_signer': None}):
+        r = await api_request(app, 'authorizations/keys', noauth=True)
+        assert r.status_code == 200
+        assert r.json() == {'keys': {}}
+    with mock.patch.dict(app.tornado_settings, {'identity_signer': signer}):
+        r = await api_request(app, 'authorizations/keys', noauth=True)
+        assert r.status_code == 200
+        assert r.json() == {'keys': signer.public_keys}
+
+
 @mark.parametrize(
     "content_type, status",
     [
@@ -403,6 +508,173 @@ async def test_get_users_pagination(
     assert got_usernames == expected_usernames
 
 
+def test_pagination_cursor():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    for bad in ("", "notacursor", encode_cursor("str")):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_paginate_query(db):
+    for i in range(5):
+        db.add(orm.Group(name=f"paginate-{i}"))
+    db.commit()
+    query = db.query(orm.Group).filter(orm.Group.name.like("paginate-%"))
+
+    # offset pagination has an exact total and a cursor for the next page
+    groups, total, next_cursor = paginate_query(db, query, orm.Group.id, 0, 2)
+    assert [g.name for g in groups] == ["paginate-0", "paginate-1"]
+    assert total == 5
+
+    # follow cursors to the end
+    names = [g.name for g in groups]
+    while next_cursor:
+        groups, total, next_cursor = paginate_query(
+            db, query, orm.Group.id, 0, 2, after=decode_cursor(next_cursor)
+        )
+        assert total is None
+        names.extend(g.name for g in groups)
+    assert names == [f"paginate-{i}" for i in range(5)]
+
+    # total is optional, and cached
+    groups, total, next_cursor = paginate_query(
+        db, query, orm.Group.id, 0, 2, after=0, include_total=True, total_cache_ttl=60
+    )
+    assert total == 5
+    db.add(orm.Group(name="paginate-5"))
+    db.commit()
+    groups, total, next_cursor = paginate_query(
+        db, query, orm.Group.id, 0, 2, after=0, include_total=True, total_cache_ttl=60
+    )
+    assert total == 5
+    groups, total, next_cursor = paginate_query(
+        db, query, orm.Group.id, 0, 2, after=0, include_total=True
+    )
+    assert total == 6
+
+    for group in query:
+        db.delete(group)
+    db.commit()
+
+
+@mark.parametrize(
+    "data",
+    [
+        [],
+        {},
+        [{"name": "a", "roles": ["user"]}, {"name": "b", "server": None}],
+        {"/": {"data": {"hub": True}}, "/user/a/": {"data": {"user": "a"}}},
+        {"items": [{"name": "ü"}], "_pagination": {"total": 1, "next": None}},
+        "string",
+        None,
+    ],
+)
+def test_iter_json(data):
+    expected = json.dumps(data)
+    assert "".join(iter_json(data)) == expected
+    # streamed collections produce the same output
+    if isinstance(data, dict):
+
+        def stream():
+            return JSONStream(iter(data.items()), is_dict=True)
+
+    elif isinstance(data, list):
+
+        def stream():
+            return JSONStream(iter(data))
+
+    else:
+        return
+    assert "".join(iter_json(stream())) == expected
+    assert "".join(iter_json({"items": stream()})) == json.dumps({"items": data})
+
+
+@mark.user
+async def test_get_users_query_count(app):
+    db = app.db
+    group = orm.Group(name="query-count")
+    db.add(group)
+    for i in range(20):
+        user = add_user(db, app, name=f"query-count-{i}")
+        user.groups.append(group)
+        await user.spawn()
+    db.commit()
+    headers = auth_header(db, 'admin')
+
+    async def list_users(limit):
+        # start with nothing loaded,
+        # and ignore writes, such as recording token activity
+        db.expire_all()
+        with count_queries(
+            db, lambda statement: statement.lstrip().upper().startswith("SELECT")
+        ) as queries:
+            r = await api_request(app, f"users?limit={limit}", headers=headers)
+        assert r.status_code == 200
+        assert len(r.json()) == limit
+        return len(queries)
+
+    # the first request caches the token
+    await list_users(1)
+    # query count doesn't depend on the number of users
+    assert await list_users(5) == await list_users(20)
+
+
+@mark.user
+async def test_get_users_error_while_streaming(app):
+    db = app.db
+    for i in range(3):
+        add_user(db, app, name=f"stream-error-{i}")
+    user_model = APIHandler.user_model
+    calls = 0
+
+    def fail_after_first(self, user):
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise RuntimeError("error after the response started")
+        return user_model(self, user)
+
+    with mock.patch.object(APIHandler, "json_chunk_size", 1), mock.patch.object(
+        APIHandler, "user_model", fail_after_first
+    ):
+        # the connection is closed instead of finishing a truncated response
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            await api_request(app, "users", bypass_proxy=True)
+
+
+@mark.user
+async def test_get_users_cursor_pagination(app):
+    db = app.db
+    for i in range(5):
+        add_user(db, app, name=new_username("cursor"))
+    usernames = [u.name for u in db.query(orm.User).order_by(orm.User.id.asc())]
+
+    headers = auth_header(db, 'admin')
+    headers['Accept'] = PAGINATION_MEDIA_TYPE
+    r = await api_request(app, url_concat('users', {'limit': 2}), headers=headers)
+    assert r.status_code == 200
+    pagination = r.json()["_pagination"]
+    assert pagination["total"] == len(usernames)
+    got_usernames = [u['name'] for u in r.json()["items"]]
+
+    while pagination["next"]:
+        after = pagination["next"]["after"]
+        r = await api_request(
+            app, url_concat('users', {'limit': 2, 'after': after}), headers=headers
+        )
+        assert r.status_code == 200
+        pagination = r.json()["_pagination"]
+        assert pagination["after"] == after
+        assert pagination["total"] is None
+        got_usernames.extend(u['name'] for u in r.json()["items"])
+    assert got_usernames == usernames
+
+    r = await api_request(
+        app, url_concat('users', {'after': 'notacursor'}), headers=headers
+    )
+    assert r.status_code == 400
+
+
 @mark.user
 @mark.parametrize(
     "state",
@@ -1317,6 +1589,50 @@ async def test_spawn_limit(app, no_patience, slow_spawn, request):
         await asyncio.sleep(0.1)
 
 
+async def test_spawn_queue(app, no_patience, slow_spawn, request):
+    db = app.db
+    p = mock.patch.dict(
+        app.tornado_settings, {'concurrent_spawn_limit': 1, 'spawn_queue_size': 1}
+    )
+    p.start()
+    request.addfinalizer(p.stop)
+    spawn_queue = app.tornado_settings['spawn_queue']
+
+    names = ['ykka', 'hjarka', 'essun']
+    users = [add_user(db, app=app, name=name) for name in names]
+    for user in users:
+        user.spawner._start_future = asyncio.Future()
+
+    # ykka starts spawning, hjarka waits in the queue
+    for name in names[:2]:
+        r = await api_request(app, 'users', name, 'server', method='post')
+        assert r.status_code == 202
+    assert len(spawn_queue) == 1
+    assert users[1].spawner.pending == 'spawn'
+    assert users[1].spawner._spawn_queue_entry is not None
+
+    # the queue is full, essun is rejected
+    r = await api_request(app, 'users', names[2], 'server', method='post')
+    assert r.status_code == 429
+
+    # allow ykka to start, admitting hjarka
+    users[0].spawner._start_future.set_result(None)
+    while users[1].spawner._spawn_queue_entry is not None:
+        await asyncio.sleep(0.1)
+    assert len(spawn_queue) == 0
+    assert users[0].running
+    users[1].spawner._start_future.set_result(None)
+    while not users[1].running:
+        await asyncio.sleep(0.1)
+
+    for u in users[:2]:
+        u.spawner.delay = 0
+        r = await api_request(app, 'users', u.name, 'server', method='delete')
+        r.raise_for_status()
+    while any(u.spawner.active for u in users):
+        await asyncio.sleep(0.1)
+
+
 @mark.slow
 async def test_active_server_limit(app, request):
     db = app.db
@@ -2068,6 +2384,39 @@ async def test_update_server_activity(app, user, server_name, fresh):
     assert user.spawners[server_name].orm_spawner.last_activity == expected
 
 
+async def test_update_activity_buffered(app, user):
+    token = user.new_api_token()
+    now = utcnow().replace(tzinfo=None)
+    spawner = user.spawners[''].orm_spawner
+    user.last_activity = spawner.last_activity = now
+    app.db.commit()
+    activity = now + timedelta(minutes=1)
+
+    buffer = dbutil.ActivityBuffer()
+    with mock.patch.dict(app.tornado_settings, {'activity_buffer': buffer}):
+        r = await api_request(
+            app,
+            f"users/{user.name}/activity",
+            headers={"Authorization": f"token {token}"},
+            data=json.dumps(
+                {
+                    "last_activity": activity.isoformat() + 'Z',
+                    "servers": {"": {"last_activity": activity.isoformat() + 'Z'}},
+                }
+            ),
+            method="post",
+        )
+        r.raise_for_status()
+
+    # activity is buffered until flushed
+    assert buffer.users == {user.id: activity}
+    assert buffer.spawners == {spawner.id: activity}
+    assert user.last_activity == now
+    assert buffer.flush(app.db) == (1, 1)
+    assert user.last_activity == activity
+    assert spawner.last_activity == activity
+
+
 # -----------------
 # General API tests
 # -----------------
@@ -1,4 +1,5 @@
 """Test the JupyterHub entry point"""
+import asyncio
 import binascii
 import json
 import logging
@@ -6,6 +7,7 @@ import os
 import re
 import sys
 import time
+from datetime import datetime
 from subprocess import check_output
 from subprocess import PIPE
 from subprocess import Popen
@@ -22,6 +24,7 @@ from ..app import COOKIE_SECRET_BYTES
 from ..app import JupyterHub
 from .mocking import MockHub
 from .test_api import add_user
+from .utils import count_queries
 
 
 def test_help_all():
@@ -235,6 +238,29 @@ def test_cookie_secret_string_():
     assert app.cookie_secret == binascii.a2b_hex('abc123')
 
 
+def test_identity_signing_key_file(tmpdir):
+    key_path = str(tmpdir.join('identity_key'))
+    hub = MockHub(identity_signing_key_file=key_path)
+    signer = hub._load_identity_signer()
+    assert os.path.exists(key_path)
+    assert not os.stat(key_path).st_mode & 0o177
+
+    # the same key is used after a restart
+    hub = MockHub(identity_signing_key_file=key_path)
+    assert hub._load_identity_signer().public_keys == signer.public_keys
+
+    # raise with public key file
+    os.chmod(key_path, 0o664)
+    with pytest.raises(SystemExit):
+        hub._load_identity_signer()
+
+    # raise if the key can't be stored with safe permissions
+    os.remove(key_path)
+    with patch.object(os, 'fchmod', side_effect=PermissionError("no")):
+        with pytest.raises(SystemExit):
+            hub._load_identity_signer()
+
+
 async def test_load_groups(tmpdir, request):
     to_load = {
         'blue': ['cyclops', 'rogue', 'wolverine'],
@@ -322,6 +348,53 @@ async def test_resume_spawners(tmpdir, request):
     assert list(db.query(orm.Server)) == []
 
 
+async def test_init_spawners_order(tmpdir, request):
+    from datetime import timedelta
+
+    from .. import metrics
+    from .mocking import MockSpawner
+
+    checked = []
+    active = 0
+    max_active = 0
+
+    class CheckOrderSpawner(MockSpawner):
+        async def poll(self):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(active, max_active)
+            checked.append(self.user.name)
+            await asyncio.sleep(0.01)
+            active -= 1
+            # stopped while the Hub was down
+            return 0
+
+    app = MockHub(init_spawners_concurrency=2)
+    app.config.ConfigurableHTTPProxy.should_start = False
+    app.config.ConfigurableHTTPProxy.auth_token = 'unused'
+    await app.initialize([])
+    app.tornado_settings['spawner_class'] = CheckOrderSpawner
+    db = app.db
+    now = datetime.utcnow()
+    names = ['check-%i' % i for i in range(5)]
+    for i, name in enumerate(names):
+        user = add_user(db, app, name=name)
+        orm_spawner = user.spawner.orm_spawner
+        orm_spawner.server = orm.Server()
+        orm_spawner.last_activity = now - timedelta(minutes=i)
+    db.commit()
+    app.users.clear()
+    try:
+        assert await app.init_spawners() == len(names)
+        assert checked == names
+        assert max_active == 2
+        assert metrics.INIT_SPAWNERS_PENDING._value.get() == 0
+        for name in names:
+            assert not app.users[name].running
+    finally:
+        app.stop()
+
+
 @pytest.mark.parametrize(
     'hub_config, expected',
     [
@@ -392,3 +465,57 @@ def test_hub_routespec(
         assert "may not receive" in caplog.text
     else:
         assert "may not receive" not in caplog.text
+
+
+async def test_sync_route_activity(db):
+    app = JupyterHub(log=logging.getLogger())
+    app.db = db
+    before = datetime(2021, 1, 1)
+    after = datetime(2021, 1, 2)
+
+    user = orm.User(name="activity-sync", last_activity=after)
+    db.add(user)
+    db.commit()
+    spawner = orm.Spawner(user=user, name="", last_activity=before)
+    named = orm.Spawner(user=user, name="named")
+    db.add_all([spawner, named])
+    db.commit()
+
+    def route(username, server_name, last_activity=None):
+        data = {"user": username, "server_name": server_name}
+        if last_activity:
+            data["last_activity"] = last_activity.isoformat() + "Z"
+        return {"data": data}
+
+    routes = {
+        "/user/activity-sync/": route("activity-sync", "", after),
+        "/user/activity-sync/named/": route("activity-sync", "named", before),
+        "/user/nosuchuser/": route("nosuchuser", "", after),
+        "/user/activity-sync/nosuchserver/": route(
+            "activity-sync", "nosuchserver", after
+        ),
+        "/user/activity-sync/noactivity/": route("activity-sync", "noactivity"),
+        "/services/svc/": {"data": {"service": "svc"}},
+    }
+
+    # ignore connection pool pings
+    with count_queries(db, lambda statement: "SELECT 1" not in statement) as queries:
+        users_count, active_users_count = await app._sync_route_activity(routes)
+
+    assert users_count == 5
+    # one select, and one update for spawners (user activity did not move forward)
+    assert len([q for q in queries if q.startswith("SELECT")]) == 1
+    assert len([q for q in queries if q.startswith("UPDATE")]) == 1
+
+    # loaded objects are updated without being marked dirty
+    assert user.last_activity == after
+    assert spawner.last_activity == after
+    assert named.last_activity == before
+    assert not db.dirty
+    db.expire_all()
+    assert user.last_activity == after
+    assert spawner.last_activity == after
+    assert named.last_activity == before
+
+    db.delete(user)
+    db.commit()
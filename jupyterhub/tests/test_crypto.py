@@ -1,4 +1,6 @@
+import json
 import os
+import time
 from binascii import b2a_base64
 from binascii import b2a_hex
 from unittest.mock import patch
@@ -84,3 +86,52 @@ async def test_missing_keys(crypt_keeper):
 
     with pytest.raises(crypto.NoEncryptionKeys):
         await decrypt(b'whatever')
+
+
+def test_identity_assertion():
+    signer = crypto.IdentitySigner()
+    other_signer = crypto.IdentitySigner()
+    now = time.time()
+    claims = {"aud": "service-a", "exp": now + 60, "identity": {"name": "alice"}}
+    assertion = signer.sign(claims)
+    assert crypto.verify_identity_assertion(assertion, signer.public_keys) == claims
+    assert (
+        crypto.verify_identity_assertion(
+            assertion, signer.public_keys, audience="service-a"
+        )
+        == claims
+    )
+    # wrong audience
+    with pytest.raises(crypto.InvalidAssertion):
+        crypto.verify_identity_assertion(
+            assertion, signer.public_keys, audience="service-b"
+        )
+    # unknown key
+    with pytest.raises(crypto.UnknownAssertionKey):
+        crypto.verify_identity_assertion(assertion, other_signer.public_keys)
+    # signed with a different key
+    with pytest.raises(crypto.InvalidAssertion):
+        crypto.verify_identity_assertion(
+            assertion, {signer.kid: other_signer.public_key}
+        )
+    # tampered claims
+    header, _, signature = assertion.split('.')
+    forged = signer.sign(dict(claims, identity={"name": "mallory"})).split('.')[1]
+    with pytest.raises(crypto.InvalidAssertion):
+        crypto.verify_identity_assertion(
+            f"{header}.{forged}.{signature}", signer.public_keys
+        )
+    # expired
+    expired = signer.sign(dict(claims, exp=now - 1))
+    with pytest.raises(crypto.InvalidAssertion):
+        crypto.verify_identity_assertion(expired, signer.public_keys)
+    # malformed
+    with pytest.raises(crypto.InvalidAssertion):
+        crypto.verify_identity_assertion("not-an-assertion", signer.public_keys)
+    _, claims_part, signature = assertion.split('.')
+    for bad_header in (["kid"], {"alg": "EdDSA", "kid": ["unhashable"]}):
+        b64_header = crypto._b64encode(json.dumps(bad_header).encode('utf8'))
+        with pytest.raises(crypto.InvalidAssertion):
+            crypto.verify_identity_assertion(
+                f"{b64_header}.{claims_part}.{signature}", signer.public_keys
+            )
@@ -1,6 +1,9 @@
 import os
 import sys
 import tempfile
+import threading
+from datetime import datetime
+from datetime import timedelta
 from glob import glob
 from subprocess import check_call
 
@@ -8,6 +11,8 @@ import pytest
 from pytest import raises
 from traitlets.config import Config
 
+from .. import dbutil
+from .. import orm
 from ..app import JupyterHub
 from ..app import NewToken
 from ..app import UpgradeDB
@@ -75,3 +80,60 @@ async def test_upgrade(tmpdir, hub_version):
 
     # run tokenapp again, it should work
     tokenapp.start()
+
+
+async def test_read_pool(tmpdir):
+    db_url = 'sqlite:///' + str(tmpdir.join('jupyterhub.sqlite'))
+    session_factory = orm.new_session_factory(db_url)
+    db = session_factory()
+    db.add(orm.User(name='pooled'))
+    db.commit()
+
+    def find_user(db, name):
+        user = orm.User.find(db, name)
+        return user.id, threading.get_ident()
+
+    pool = dbutil.ReadPool(session_factory, 2)
+    try:
+        user_id, thread_id = await dbutil.run_read(pool, db, find_user, 'pooled')
+        assert thread_id != threading.get_ident()
+        assert user_id == orm.User.find(db, 'pooled').id
+    finally:
+        pool.shutdown()
+
+    # no pool runs inline with the given session
+    user_id, thread_id = await dbutil.run_read(None, db, find_user, 'pooled')
+    assert thread_id == threading.get_ident()
+    db.close()
+
+
+def test_activity_buffer(db):
+    user = orm.User(name='buffered')
+    db.add(user)
+    db.commit()
+    spawner = orm.Spawner(user_id=user.id, name='')
+    db.add(spawner)
+    db.commit()
+    now = datetime.utcnow()
+    spawner.last_activity = now
+    db.commit()
+
+    buffer = dbutil.ActivityBuffer()
+    buffer.record_user(user.id, now - timedelta(minutes=2))
+    buffer.record_user(user.id, now - timedelta(minutes=1))
+    buffer.record_user(user.id, now - timedelta(minutes=3))
+    # older than the current value, not written
+    buffer.record_spawner(spawner.id, now - timedelta(minutes=1))
+    assert len(buffer) == 2
+
+    assert buffer.flush(db) == (1, 1)
+    assert len(buffer) == 0
+    assert user.last_activity == now - timedelta(minutes=1)
+    assert spawner.last_activity == now
+    db.expire_all()
+    assert user.last_activity == now - timedelta(minutes=1)
+    assert spawner.last_activity == now
+    assert not db.dirty
+
+    # flush again with nothing to write
+    assert buffer.flush(db) == (0, 0)
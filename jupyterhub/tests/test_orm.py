@@ -16,7 +16,11 @@ from .. import orm
 from .. import roles
 from ..emptyclass import EmptyClass
 from ..user import User
+from ..utils import hash_token
+from ..utils import new_token
+from ..utils import token_lookup_key
 from .mocking import MockSpawner
+from .utils import count_queries
 
 
 def assert_not_found(db, ORMType, id):
@@ -98,7 +102,7 @@ def test_tokens(db):
     assert found.user is user
     assert found.service is None
     algo, rounds, salt, checksum = found.hashed.split(':')
-    assert algo == orm.APIToken.algorithm
+    assert algo == orm.APIToken.generated_algorithm
     assert rounds == '1'
     assert len(salt) == orm.APIToken.generated_salt_bytes * 2
 
@@ -217,6 +221,118 @@ def test_token_find(db):
     assert found is None
 
 
+def test_token_lookup(db):
+    user = orm.User(name='zoe')
+    db.add(user)
+    db.commit()
+    token = user.new_api_token()
+    found = orm.APIToken.find(db, token=token)
+    assert found.lookup == token_lookup_key(token)
+
+    secret = 'super-secret-preload-token-zoe'
+    user.new_api_token(secret, generated=False)
+    found = orm.APIToken.find(db, token=secret)
+    assert found.match(secret)
+    # user-provided tokens don't store unsalted digests
+    assert found.lookup is None
+
+    # tokens created without a lookup key are backfilled on first use
+    orm.APIToken.token_cache.clear()
+    found = orm.APIToken.find(db, token=token)
+    found.lookup = None
+    db.commit()
+    orm.APIToken.token_cache.clear()
+    found = orm.APIToken.find(db, token=token)
+    assert found.lookup == token_lookup_key(token)
+
+
+def test_token_rehash(db):
+    user = orm.User(name='simon')
+    db.add(user)
+    db.commit()
+    secret = 'super-secret-preload-token-simon'
+    user.new_api_token(secret, generated=False)
+    orm_token = orm.APIToken.find(db, token=secret)
+    assert orm_token.hashed.startswith('pbkdf2_sha512:')
+    # store with the scheme used before pbkdf2
+    legacy_hash = hash_token(secret, salt=8, rounds=16384, algorithm='sha512')
+    orm_token.hashed = legacy_hash
+    db.commit()
+    orm.APIToken.token_cache.clear()
+
+    found = orm.APIToken.find(db, token=secret)
+    assert found is orm_token
+    algo, rounds, salt, _ = found.hashed.split(':')
+    assert algo == orm.APIToken.algorithm
+    assert rounds == str(orm.APIToken.rounds)
+    assert not db.dirty
+    assert found.match(secret)
+    assert not found.match(secret + 'x')
+
+    # generated tokens are not rehashed
+    token = user.new_api_token()
+    orm.APIToken.token_cache.clear()
+    found = orm.APIToken.find(db, token=token)
+    assert found.hashed.startswith('sha512:1:')
+
+
+def test_token_cache(db):
+    user = orm.User(name='jayne')
+    db.add(user)
+    db.commit()
+    token = user.new_api_token()
+    cache = orm.APIToken.token_cache
+    cache.clear()
+    found = orm.APIToken.find(db, token=token)
+    assert cache.get(token_lookup_key(token)) == (found.id, found.hashed)
+
+    # cache hits don't query for hashes
+    with mock.patch.object(
+        orm.APIToken, '_find_uncached', side_effect=AssertionError("cache miss")
+    ):
+        assert orm.APIToken.find(db, token=token) is found
+
+    # deleting the token invalidates the cache
+    db.delete(found)
+    db.commit()
+    assert cache.get(token_lookup_key(token)) is None
+    assert orm.APIToken.find(db, token=token) is None
+
+    # tokens deleted without the session noticing aren't found either
+    token = user.new_api_token()
+    found = orm.APIToken.find(db, token=token)
+    db.query(orm.APIToken).filter(orm.APIToken.id == found.id).delete(
+        synchronize_session=False
+    )
+    db.commit()
+    assert orm.APIToken.find(db, token=token) is None
+    assert cache.get(token_lookup_key(token)) is None
+
+    # deleted tokens whose id is reused by a new token aren't found
+    token = user.new_api_token()
+    found = orm.APIToken.find(db, token=token)
+    token_id = found.id
+    db.query(orm.APIToken).filter(orm.APIToken.id == token_id).delete(
+        synchronize_session=False
+    )
+    db.commit()
+    other_user = orm.User(name='mallory')
+    db.add(other_user)
+    db.commit()
+    other_token = orm.APIToken(id=token_id, user=other_user)
+    other_token.token = new_token()
+    db.add(other_token)
+    db.commit()
+    assert orm.APIToken.find(db, token=token) is None
+    assert cache.get(token_lookup_key(token)) is None
+
+    # expired entries are ignored
+    token = user.new_api_token()
+    found = orm.APIToken.find(db, token=token)
+    with mock.patch.object(cache, 'ttl', -1):
+        assert cache.get(token_lookup_key(token)) is None
+
+
 async def test_spawn_fails(db):
     orm_user = orm.User(name='aeofel')
     db.add(orm_user)
@@ -565,3 +681,42 @@ def test_expiring_oauth_code(app, user):
         assert orm_code in db.query(orm.OAuthCode)
         orm.OAuthCode.purge_expired(db)
         assert orm_code not in db.query(orm.OAuthCode)
+
+
+def test_user_eager_load(db):
+    group = orm.Group(name='eager-load')
+    db.add(group)
+    users = []
+    for i in range(20):
+        user = orm.User(name=f'eager-load-{i}')
+        db.add(user)
+        user.groups.append(group)
+        spawner = orm.Spawner(user=user, name='')
+        spawner.server = orm.Server()
+        users.append(user)
+    db.commit()
+    for user in users:
+        roles.grant_role(db, user, rolename='user')
+
+    user_ids = [user.id for user in users]
+
+    def load_users(n):
+        # start from a fresh transaction, with nothing loaded
+        db.commit()
+        db.expire_all()
+        with count_queries(db) as queries:
+            loaded = orm.User.eager_load(db, user_ids[:n])
+            assert len(loaded) == n
+            for user in loaded.values():
+                [role.name for role in user.roles]
+                [group.name for group in user.groups]
+                [spawner.server for spawner in user._orm_spawners]
+        return len(queries)
+
+    # query count doesn't depend on the number of users
+    assert load_users(5) == load_users(20)
+
+    for user in users:
+        db.delete(user)
+    db.delete(group)
+    db.commit()
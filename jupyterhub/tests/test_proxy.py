@@ -1,14 +1,24 @@
 """Test a proxy being started before the Hub"""
+import asyncio
 import json
 import os
 from contextlib import contextmanager
 from subprocess import Popen
+from types import SimpleNamespace
 from urllib.parse import quote
 from urllib.parse import urlparse
 
 import pytest
+from prometheus_client import REGISTRY
+from tornado.httpserver import HTTPServer
+from tornado.web import Application
+from tornado.web import RequestHandler
 from traitlets.config import Config
 
+from ..proxy import ConfigurableHTTPProxy
+from ..proxy import FileProxy
+from ..proxy import Proxy
+from ..utils import random_port
 from ..utils import url_path_join as ujoin
 from ..utils import wait_for_http_server
 from .mocking import MockHub
@@ -27,6 +37,347 @@ def disable_check_routes(app):
         app.last_activity_callback.start()
 
 
+class DictProxy(Proxy):
+    """Proxy storing routes in a dict, counting requests"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.routes = {}
+        self.changes = 0
+
+    async def add_route(self, routespec, target, data):
+        self.changes += 1
+        self.routes[routespec] = {
+            'routespec': routespec,
+            'target': target,
+            'data': data,
+        }
+
+    async def delete_route(self, routespec):
+        self.changes += 1
+        self.routes.pop(routespec, None)
+
+    async def get_all_routes(self):
+        return dict(self.routes)
+
+
+async def test_check_routes_delta():
+    hub = SimpleNamespace(routespec='/hub/', host='http://127.0.0.1:8081')
+    proxy = DictProxy(hub=hub, app=SimpleNamespace(hub=hub))
+    spawner = SimpleNamespace(
+        ready=True,
+        pending=None,
+        proxy_spec='/user/alice/',
+        server=SimpleNamespace(host='http://127.0.0.1:9000'),
+    )
+    user = SimpleNamespace(name='alice', spawners={'': spawner})
+    users = {1: user}
+
+    def checks(mode):
+        return REGISTRY.get_sample_value(
+            'jupyterhub_check_routes_total', {'mode': mode}
+        )
+
+    await proxy.check_routes(users, {})
+    assert sorted(proxy.routes) == ['/hub/', '/user/alice/']
+    changes = proxy.changes
+
+    # nothing changed, nothing checked
+    delta_checks = checks('delta')
+    await proxy.check_routes(users, {}, delta=True)
+    assert checks('delta') == delta_checks + 1
+    assert proxy.changes == changes
+
+    # a new server updates expected routes
+    spawner2 = SimpleNamespace(
+        ready=True,
+        pending=None,
+        proxy_spec='/user/alice/two/',
+        server=SimpleNamespace(host='http://127.0.0.1:9001'),
+    )
+    user.spawners['two'] = spawner2
+    await proxy.add_user(user, 'two')
+    changes = proxy.changes
+    await proxy.check_routes(users, {}, delta=True)
+    assert checks('delta') == delta_checks + 2
+    assert proxy.changes == changes
+
+    # the proxy lost a route, detected as drift
+    drift_checks = checks('drift')
+    del proxy.routes['/user/alice/two/']
+    await proxy.check_routes(users, {}, delta=True)
+    assert checks('drift') == drift_checks + 1
+    assert '/user/alice/two/' in proxy.routes
+
+    # full check is due
+    proxy._last_full_check = 0
+    full_checks = checks('full')
+    await proxy.check_routes(users, {}, delta=True)
+    assert checks('full') == full_checks + 1
+
+
+async def test_add_routes_benchmark():
+    """Restoring routes with add_routes bounds the number of concurrent requests"""
+    n = 200
+    chp_routes = {}
+    peak_tasks = 0
+
+    class RoutesHandler(RequestHandler):
+        """Stand-in for the configurable-http-proxy routes API"""
+
+        def get(self, path):
+            self.write(chp_routes)
+
+        async def post(self, path):
+            nonlocal peak_tasks
+            peak_tasks = max(peak_tasks, len(asyncio.all_tasks()))
+            await asyncio.sleep(0.001)
+            chp_routes[path or '/'] = json.loads(self.request.body)
+
+    port = random_port()
+    server = HTTPServer(Application([(r"/api/routes(/.*)?", RoutesHandler)]))
+    server.listen(port, '127.0.0.1')
+
+    hub = SimpleNamespace(routespec='/hub/', host='http://127.0.0.1:8081')
+    users = {}
+    for i in range(n):
+        spawner = SimpleNamespace(
+            ready=True,
+            pending=None,
+            proxy_spec=f'/user/user-{i}/',
+            server=SimpleNamespace(host=f'http://127.0.0.1:{9000 + i}'),
+        )
+        users[i] = SimpleNamespace(name=f'user-{i}', spawners={'': spawner})
+    app = SimpleNamespace(hub=hub, users=users, _service_map={})
+    proxy = ConfigurableHTTPProxy(
+        app=app,
+        hub=hub,
+        api_url=f'http://127.0.0.1:{port}',
+        auth_token='secret',
+        should_start=False,
+        bulk_concurrency=5,
+    )
+    try:
+        await proxy.add_hub_route(hub)
+        await asyncio.gather(*(proxy.add_user(user) for user in users.values()))
+        gather_tasks = peak_tasks
+        assert len(await proxy.get_all_routes()) == n + 1
+
+        chp_routes.clear()
+        peak_tasks = 0
+        await proxy.restore_routes()
+        bulk_tasks = peak_tasks
+        routes = await proxy.get_all_routes()
+    finally:
+        server.stop()
+        await server.close_all_connections()
+
+    assert len(routes) == n + 1
+    assert routes['/user/user-0/']['data'] == {'user': 'user-0', 'server_name': ''}
+    assert gather_tasks >= n
+    assert bulk_tasks < n // 2
+
+
+async def test_chp_routes_cache():
+    chp_routes = {'/proxy-only': {'target': 'http://127.0.0.1:1'}}
+    fetches = 0
+    fetch_delay = 0.01
+
+    class RoutesHandler(RequestHandler):
+        """Stand-in for the configurable-http-proxy routes API"""
+
+        async def get(self, path):
+            nonlocal fetches
+            fetches += 1
+            await asyncio.sleep(fetch_delay)
+            self.write(chp_routes)
+
+        def post(self, path):
+            chp_routes[path] = json.loads(self.request.body)
+
+        def delete(self, path):
+            chp_routes.pop(path)
+
+    port = random_port()
+    server = HTTPServer(Application([(r"/api/routes(/.*)?", RoutesHandler)]))
+    server.listen(port, '127.0.0.1')
+    proxy = ConfigurableHTTPProxy(
+        api_url=f'http://127.0.0.1:{port}',
+        auth_token='secret',
+        should_start=False,
+        routes_cache_ttl=60,
+    )
+    try:
+        # concurrent calls share one fetch
+        results = await asyncio.gather(*(proxy.get_all_routes() for i in range(5)))
+        assert fetches == 1
+        assert results == [{}] * 5
+        # routes are cached, with changes written through
+        await proxy.add_route(
+            '/user/alice/', 'http://127.0.0.1:9000', {'user': 'alice'}
+        )
+        await proxy.add_route('/user/bob/', 'http://127.0.0.1:9001', {'user': 'bob'})
+        await proxy.delete_route('/user/bob/')
+        routes = await proxy.get_all_routes()
+        assert fetches == 1
+        assert routes == {
+            '/user/alice/': {
+                'routespec': '/user/alice/',
+                'target': 'http://127.0.0.1:9000',
+                'data': {'user': 'alice'},
+            }
+        }
+        # callers get their own copy of the table
+        routes.clear()
+        assert await proxy.get_route('/user/alice/')
+        # the cache is cleared when the proxy changes
+        proxy.auth_token = 'new-secret'
+        assert await proxy.get_all_routes() == await proxy.get_all_routes()
+        assert fetches == 2
+
+        # without a ttl, only concurrent calls share a fetch
+        proxy.routes_cache_ttl = 0
+        await asyncio.gather(proxy.get_all_routes(), proxy.get_all_routes())
+        assert fetches == 3
+        await proxy.get_all_routes()
+        assert fetches == 4
+
+        # callers don't join a fetch started before a route changed
+        fetch_delay = 0.5
+        first = asyncio.ensure_future(proxy.get_all_routes())
+        await asyncio.sleep(0)
+        await proxy.delete_route('/user/alice/')
+        assert not first.done()
+        await asyncio.gather(first, proxy.get_all_routes())
+        assert fetches == 6
+    finally:
+        server.stop()
+        await server.close_all_connections()
+
+
+async def test_file_proxy(tmp_path):
+    routes_file = tmp_path / "routes.json"
+    proxy = FileProxy(routes_file=str(routes_file), write_delay=0.05)
+    assert not proxy.should_start
+    writes = []
+    write_routes_file = proxy._write_routes_file
+
+    def count_writes(contents):
+        writes.append(contents)
+        write_routes_file(contents)
+
+    proxy._write_routes_file = count_writes
+
+    # a burst of changes is written once
+    await asyncio.gather(
+        *(
+            proxy.add_route(f'/user/user-{i}', f'http://127.0.0.1:{9000 + i}', {})
+            for i in range(10)
+        ),
+        proxy.add_route('/hub/', 'http://127.0.0.1:8081', {'hub': True}),
+    )
+    assert len(writes) == 1
+    with open(routes_file) as f:
+        written = json.load(f)
+    assert len(written) == 11
+    assert written['/user/user-0/'] == {'target': 'http://127.0.0.1:9000', 'data': {}}
+    assert written['/hub/'] == {
+        'target': 'http://127.0.0.1:8081',
+        'data': {'hub': True},
+    }
+    # no temporary files are left behind
+    assert os.listdir(tmp_path) == ['routes.json']
+
+    await proxy.delete_route('/user/user-0/')
+    assert len(writes) == 2
+    # deleting a missing route doesn't write
+    await proxy.delete_route('/user/user-0/')
+    assert len(writes) == 2
+
+    routes = await proxy.get_all_routes()
+    assert '/user/user-0/' not in routes
+    assert routes['/hub/'] == {
+        'routespec': '/hub/',
+        'target': 'http://127.0.0.1:8081',
+        'data': {'hub': True},
+    }
+
+    # routes are restored from the file
+    restored = FileProxy(routes_file=str(routes_file))
+    assert await restored.get_all_routes() == routes
+
+
+async def test_route_locks():
+    hub = SimpleNamespace(routespec='/hub/', host='http://127.0.0.1:8081')
+    proxy = DictProxy(hub=hub, app=SimpleNamespace(hub=hub))
+    ops = []
+    gate = asyncio.Event()
+    add_route = proxy.add_route
+    delete_route = proxy.delete_route
+
+    async def slow_add_route(routespec, target, data):
+        ops.append(('add', routespec))
+        if routespec == '/user/alice/':
+            await gate.wait()
+        await add_route(routespec, target, data)
+
+    async def slow_delete_route(routespec):
+        ops.append(('delete', routespec))
+        await delete_route(routespec)
+
+    proxy.add_route = slow_add_route
+    proxy.delete_route = slow_delete_route
+    users = {}
+    for name in ('alice', 'bob'):
+        spawner = SimpleNamespace(
+            ready=True,
+            pending=None,
+            proxy_spec=f'/user/{name}/',
+            server=SimpleNamespace(host='http://127.0.0.1:9000'),
+        )
+        users[name] = SimpleNamespace(
+            name=name, proxy_spec=f'/user/{name}/', spawners={'': spawner}
+        )
+
+    def lock_waits():
+        return REGISTRY.get_sample_value(
+            'jupyterhub_proxy_lock_wait_seconds_count', {'lock': 'route'}
+        )
+
+    def lock_waiting():
+        return REGISTRY.get_sample_value(
+            'jupyterhub_proxy_lock_waiting', {'lock': 'route'}
+        )
+
+    await proxy.add_hub_route(hub)
+    waits = lock_waits()
+    add_alice = asyncio.ensure_future(proxy.add_user(users['alice']))
+    await asyncio.sleep(0)
+    # other routes are not blocked
+    await asyncio.wait_for(proxy.add_user(users['bob']), timeout=1)
+    assert '/user/bob/' in proxy.routes
+
+    # checking routes waits for the route being added,
+    # and skips the route deleted while it waited
+    check = asyncio.ensure_future(
+        proxy.check_routes(users, {}, routes=dict(proxy.routes))
+    )
+    await asyncio.sleep(0)
+    users['alice'].spawners[''].ready = False
+    delete_alice = asyncio.ensure_future(proxy.delete_user(users['alice']))
+    await asyncio.sleep(0)
+    assert lock_waiting()
+    assert not check.done()
+    gate.set()
+    await asyncio.gather(add_alice, check, delete_alice)
+    alice_ops = [op for op in ops if op[1] == '/user/alice/']
+    assert alice_ops == [('add', '/user/alice/'), ('delete', '/user/alice/')]
+    assert sorted(proxy.routes) == ['/hub/', '/user/bob/']
+    assert lock_waits() > waits
+    assert lock_waiting() == 0
+    assert proxy._route_locks == {}
+
+
 @skip_if_ssl
 async def test_external_proxy(request):
     auth_token = 'secret!'
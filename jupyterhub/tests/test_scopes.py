@@ -20,6 +20,7 @@ from ..scopes import Scope
 from .utils import add_user
 from .utils import api_request
 from .utils import auth_header
+from .utils import count_queries
 
 
 def get_handler_with_scopes(scopes):
@@ -936,6 +937,53 @@ def test_intersect_groups(request, db, left, right, expected, groups):
         assert intersection == set(expected)
 
 
+def test_intersect_groups_query_count(request, db):
+    """Group membership for large user filters is resolved in one query"""
+    n = 200
+    group = orm.Group(name="gbatch")
+    db.add(group)
+    users = []
+    for i in range(n):
+        user = orm.User(name=f"batch-{i}")
+        db.add(user)
+        users.append(user)
+        # put every other user in the group
+        if i % 2 == 0:
+            user.groups.append(group)
+    db.commit()
+
+    def _cleanup():
+        for obj in users + [group]:
+            db.delete(obj)
+        db.commit()
+
+    request.addfinalizer(_cleanup)
+
+    left = {f"read:users!user=batch-{i}" for i in range(n)}
+    left |= {f"read:servers!server=batch-{i}/srv" for i in range(n)}
+    right = {"read:users!group=gbatch", "read:servers!group=gbatch"}
+    expected = {f"read:users!user=batch-{i}" for i in range(0, n, 2)}
+    expected |= {f"read:servers!server=batch-{i}/srv" for i in range(0, n, 2)}
+
+    with count_queries(db, lambda statement: "FROM users" in statement) as queries:
+        for a, b in [(left, right), (right, left)]:
+            queries.clear()
+            intersection = _intersect_expanded_scopes(a, b, db)
+            assert intersection == expected
+            assert len(queries) == 1
+
+        # resolved membership can be reused
+        user_groups = {}
+        _intersect_expanded_scopes(left, right, db, user_groups=user_groups)
+        assert len(user_groups) == n
+        queries.clear()
+        intersection = _intersect_expanded_scopes(
+            left, right, db, user_groups=user_groups
+        )
+        assert intersection == expected
+        assert queries == []
+
+
 @mark.user
 @mark.parametrize(
     "scopes, expected",
@@ -1127,3 +1175,61 @@ def test_custom_scopes_bad(preserve_scopes, custom_scopes):
     with pytest.raises(ValueError):
         scopes.define_custom_scopes(custom_scopes)
     assert scopes.scope_definitions == preserve_scopes
+
+
+def test_scope_cache(db):
+    user = orm.User(name='cached-scopes')
+    db.add(user)
+    db.commit()
+    roles.grant_role(db, user, rolename='user')
+    token = user.new_api_token()
+    orm_token = orm.APIToken.find(db, token)
+    cache = scopes._scope_cache
+
+    expanded, parsed = scopes.get_cached_scopes_for(orm_token)
+    assert expanded == get_scopes_for(orm_token)
+    assert parsed == parse_scopes(expanded)
+    assert cache.get(orm_token) is not None
+    scopes.get_cached_scopes_for(user)
+    # returned scopes are a copy
+    expanded.add('admin:users')
+    with mock.patch.object(
+        scopes, 'get_scopes_for', side_effect=AssertionError("cache miss")
+    ):
+        assert 'admin:users' not in scopes.get_cached_scopes_for(orm_token)[0]
+        scopes.get_cached_scopes_for(user)
+
+    # granting a role invalidates everything
+    roles.grant_role(db, user, rolename='admin')
+    assert cache.get(orm_token) is None
+    assert cache.get(user) is None
+    expanded, parsed = scopes.get_cached_scopes_for(user)
+    assert 'admin:users' in expanded
+
+    # group membership changes invalidate everything
+    group = orm.Group(name='cached-scopes-group')
+    db.add(group)
+    db.commit()
+    scopes.get_cached_scopes_for(user)
+    user.groups.append(group)
+    db.commit()
+    assert cache.get(user) is None
+
+    # unrelated changes don't
+    scopes.get_cached_scopes_for(user)
+    user.last_activity = orm.utcnow()
+    db.commit()
+    assert cache.get(user) is not None
+
+    # issuing and deleting tokens only invalidates the token
+    scopes.get_cached_scopes_for(orm_token)
+    user.new_api_token()
+    assert cache.get(user) is not None
+    db.delete(orm_token)
+    db.commit()
+    assert cache.get(orm_token) is None
+    assert cache.get(user) is not None
+
+    db.delete(group)
+    db.delete(user)
+    db.commit()
@@ -1,7 +1,11 @@
 """Tests for service authentication"""
+import asyncio
 import copy
+import hashlib
+import json
 import os
 import sys
+import time
 from binascii import hexlify
 from unittest import mock
 from urllib.parse import parse_qs
@@ -11,12 +15,19 @@ from urllib.parse import urlparse
 import pytest
 from bs4 import BeautifulSoup
 from pytest import raises
+from tornado.httpserver import HTTPServer
 from tornado.httputil import url_concat
+from tornado.web import Application
+from tornado.web import RequestHandler
 
 from .. import orm
 from .. import roles
 from .. import scopes
+from ..crypto import IdentitySigner
 from ..services.auth import _ExpiringDict
+from ..services.auth import HubAuth
+from ..services.auth import HubOAuth
+from ..utils import random_port
 from ..utils import url_path_join
 from .mocking import public_url
 from .utils import async_requests
@@ -63,6 +74,278 @@ def test_expiring_dict():
         assert cache.get('key', 'default') == 'cached value'
 
 
+def test_expiring_dict_lru():
+    cache = _ExpiringDict(max_age=30, max_size=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    # access 'a', so 'b' is least recently used
+    assert cache['a'] == 1
+    cache['c'] = 3
+    assert 'b' not in cache
+    assert 'a' in cache
+    assert 'c' in cache
+    assert len(cache) == 2
+
+    cache.set('short', None, max_age=1)
+    cache['c'] = 3
+    later = time.monotonic() + 10
+    with mock.patch('time.monotonic', lambda: later):
+        assert cache.sweep() == 1
+    assert 'short' not in cache
+    assert 'c' in cache
+    with monotonic_future:
+        assert cache.sweep() == 1
+    assert len(cache) == 0
+
+    with raises(KeyError):
+        cache['a']
+    stats = cache.stats
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['evictions'] == 4
+    assert stats['size'] == 0
+
+
+async def test_hubauth_async():
+    """Test the async HubAuth client against a minimal Hub API"""
+    requests_seen = []
+    active = 0
+    max_active = 0
+
+    class UserHandler(RequestHandler):
+        async def get(self):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(active, max_active)
+            try:
+                await asyncio.sleep(0.05)
+            finally:
+                active -= 1
+            token = self.request.headers['Authorization'].split()[1]
+            requests_seen.append(token)
+            if token.startswith('good'):
+                self.write({'kind': 'user', 'name': token})
+            else:
+                self.set_status(403)
+
+    port = random_port()
+    server = HTTPServer(Application([(r"/hub/api/user", UserHandler)]))
+    server.listen(port, '127.0.0.1')
+    hub_auth = HubAuth(
+        api_url=f'http://127.0.0.1:{port}/hub/api',
+        api_token='service-token',
+        api_request_concurrency=2,
+    )
+    try:
+        tokens = [f'good-{i}' for i in range(6)]
+        models = await asyncio.gather(
+            *(hub_auth.user_for_token_async(token) for token in tokens)
+        )
+        assert [model['name'] for model in models] == tokens
+        assert max_active <= 2
+        # replies are cached
+        assert await hub_auth.user_for_token_async('good-0') == models[0]
+        assert len(requests_seen) == len(tokens)
+        # denied tokens identify no user
+        assert await hub_auth.user_for_token_async('bad') is None
+        # sync and async share the same cache
+        assert hub_auth.user_for_token('bad') is None
+        assert requests_seen.count('bad') == 1
+
+        # concurrent checks for one token make one request
+        models = await asyncio.gather(
+            *(hub_auth.user_for_token_async('good-new') for i in range(5))
+        )
+        assert requests_seen.count('good-new') == 1
+        assert all(model == models[0] for model in models)
+        stats = hub_auth.cache_stats
+        assert stats['coalesced'] == 4
+        assert stats['size'] == len(tokens) + 2
+
+        # requests.Session isn't thread-safe, each thread has its own
+        session = hub_auth.api_session
+        thread_session = await asyncio.get_running_loop().run_in_executor(
+            hub_auth._executor, lambda: hub_auth.api_session
+        )
+        assert thread_session is not session
+        assert hub_auth.api_session is session
+    finally:
+        hub_auth.close()
+        server.stop()
+        await server.close_all_connections()
+
+
+async def test_hubauth_close():
+    hub_auth = HubAuth(api_url='http://127.0.0.1:1/hub/api', api_token='token')
+    hub_auth._start_cache_sweeper()
+    sweeper = hub_auth._cache_sweeper
+    executor = hub_auth._executor
+    thread_session = await asyncio.get_running_loop().run_in_executor(
+        executor, lambda: hub_auth.api_session
+    )
+    with mock.patch.object(thread_session, 'close') as close_session:
+        hub_auth.close()
+    close_session.assert_called_once()
+    assert not sweeper.is_running()
+    assert hub_auth._api_executor is None
+    with raises(RuntimeError):
+        executor.submit(print)
+
+
+@pytest.mark.parametrize("bulk_api", [True, False])
+async def test_hubauth_token_batch(bulk_api):
+    """Test identifying tokens in batches with HubAuth"""
+    batches = []
+    single = []
+
+    class UserHandler(RequestHandler):
+        def get(self):
+            token = self.request.headers['Authorization'].split()[1]
+            single.append(token)
+            self.write({'kind': 'user', 'name': token})
+
+    class TokensHandler(RequestHandler):
+        def post(self):
+            tokens = json.loads(self.request.body)['tokens']
+            batches.append(tokens)
+            owners = [
+                {'kind': 'user', 'name': token} if token.startswith('good') else None
+                for token in tokens
+            ]
+            self.write({'owners': owners})
+
+    handlers = [(r"/hub/api/user", UserHandler)]
+    if bulk_api:
+        handlers.append((r"/hub/api/authorizations/tokens", TokensHandler))
+    port = random_port()
+    server = HTTPServer(Application(handlers))
+    server.listen(port, '127.0.0.1')
+    hub_auth = HubAuth(
+        api_url=f'http://127.0.0.1:{port}/hub/api',
+        api_token='service-token',
+        token_batch_window=0.1,
+        token_batch_max_size=4,
+    )
+    try:
+        tokens = [f'good-{i}' for i in range(5)] + ['bad']
+        models = await asyncio.gather(
+            *(hub_auth.user_for_token_async(token) for token in tokens)
+        )
+        if bulk_api:
+            # one full batch, and one after the window
+            assert batches == [tokens[:4], tokens[4:]]
+            assert single == []
+            assert models[-1] is None
+        else:
+            # fall back on a request per token
+            assert sorted(single) == sorted(tokens)
+            assert hub_auth._token_batch_supported is False
+        assert [model['name'] for model in models[:5]] == tokens[:5]
+    finally:
+        hub_auth.close()
+        server.stop()
+        await server.close_all_connections()
+
+
+async def test_hubauth_identity_assertion():
+    """Test identifying users with signed identity assertions"""
+    signer = IdentitySigner()
+    key_requests = []
+    user_requests = []
+
+    class KeysHandler(RequestHandler):
+        def get(self):
+            key_requests.append(self.request.path)
+            self.write({'keys': signer.public_keys})
+
+    class UserHandler(RequestHandler):
+        def get(self):
+            user_requests.append(self.request.path)
+            self.write(model)
+
+    port = random_port()
+    server = HTTPServer(
+        Application(
+            [
+                (r"/hub/api/authorizations/keys", KeysHandler),
+                (r"/hub/api/user", UserHandler),
+            ]
+        )
+    )
+    server.listen(port, '127.0.0.1')
+    hub_auth = HubOAuth(
+        api_url=f'http://127.0.0.1:{port}/hub/api',
+        api_token='service-token',
+        oauth_client_id='service-a',
+    )
+    token = 'abc123'
+    model = {'kind': 'user', 'name': 'alice', 'session_id': 'sid', 'scopes': []}
+    claims = {
+        'aud': 'service-a',
+        'exp': time.time() + 60,
+        'token_sha256': hashlib.sha256(token.encode()).hexdigest(),
+        'identity': model,
+    }
+    assertion = signer.sign(claims)
+    try:
+        # fetches the key, once
+        assert (
+            await hub_auth.user_for_identity_assertion_async(
+                assertion, token, session_id='sid'
+            )
+            == model
+        )
+        assert (
+            hub_auth.user_for_identity_assertion(assertion, token, session_id='sid')
+            == model
+        )
+        assert len(key_requests) == 1
+        # assertion for a different token
+        assert (
+            hub_auth.user_for_identity_assertion(assertion, 'other', session_id='sid')
+            is None
+        )
+        # no session, e.g. after logging out of the Hub
+        assert hub_auth.user_for_identity_assertion(assertion, token) is None
+        # different session
+        assert (
+            hub_auth.user_for_identity_assertion(assertion, token, session_id='new')
+            is None
+        )
+        # different client
+        other = signer.sign(dict(claims, aud='service-b'))
+        assert hub_auth.user_for_identity_assertion(other, token) is None
+        # unknown key, not fetched again right away
+        other = IdentitySigner().sign(claims)
+        assert hub_auth.user_for_identity_assertion(other, token) is None
+        assert len(key_requests) == 1
+
+        # identifying a request with cookies
+        cookies = {
+            hub_auth.identity_cookie_name: assertion,
+            'jupyterhub-session-id': 'sid',
+        }
+        handler = mock.Mock()
+        handler.get_secure_cookie.return_value = token.encode()
+        handler.get_cookie.side_effect = lambda name, default=None: cookies.get(
+            name, default
+        )
+        assert await hub_auth._get_user_cookie_async(handler) == model
+        assert user_requests == []
+        # after logging out, the session cookie is gone
+        # and the user is identified by the Hub instead
+        cookies.pop('jupyterhub-session-id')
+        assert await hub_auth._get_user_cookie_async(handler) == model
+        assert len(user_requests) == 1
+        handler.clear_cookie.assert_called_with(
+            hub_auth.identity_cookie_name, path=hub_auth.base_url
+        )
+    finally:
+        hub_auth.close()
+        server.stop()
+        await server.close_all_connections()
+
+
 async def test_hubauth_token(app, mockservice_url, create_user_with_scopes):
     """Test HubAuthenticated service with user API tokens"""
     u = create_user_with_scopes("access:services")
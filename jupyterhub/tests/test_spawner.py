@@ -14,12 +14,15 @@ from urllib.parse import urlparse
 
 import pytest
 
+from .. import metrics
 from .. import orm
 from .. import spawner as spawnermod
 from ..objects import Hub
 from ..objects import Server
 from ..spawner import LocalProcessSpawner
 from ..spawner import Spawner
+from ..spawner import SpawnerPool
+from ..spawner import SpawnerPoller
 from ..user import User
 from ..utils import AnyTimeoutError
 from ..utils import new_token
@@ -81,6 +84,95 @@ async def test_spawner(db, request):
     assert isinstance(status, int)
 
 
+class BatchPollSpawner(Spawner):
+    """Spawner recording batches of polls"""
+
+    batches = []
+    status = None
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def poll(self):
+        return self.status
+
+    @classmethod
+    async def poll_many(cls, spawners):
+        cls.batches.append(spawners)
+        return [spawner.status for spawner in spawners]
+
+
+async def test_spawner_poller():
+    n = 20
+    spawners = [BatchPollSpawner(poll_interval=1) for i in range(n)]
+    BatchPollSpawner.batches = batches = []
+    stopped = []
+    spawners[0].add_poll_callback(stopped.append, 'stopped')
+    spawners[0].status = 1
+
+    def polls(spawner):
+        return sum(batch.count(spawner) for batch in batches)
+
+    start = time.monotonic()
+    for spawner in spawners:
+        spawner.start_polling()
+    # polls are spread evenly over the interval
+    offsets = sorted(spawner._poll_callback.due - start for spawner in spawners)
+    gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+    assert max(gaps + [offsets[0], 1 - offsets[-1]]) < 2 / n
+
+    await asyncio.sleep(1.1)
+    assert len(batches) > 1
+    assert all(polls(spawner) for spawner in spawners)
+    # stopped servers notify and aren't polled again
+    assert stopped == ['stopped']
+    assert spawners[0]._poll_callback is None
+    spawners[1].stop_polling()
+    stopped_polls = polls(spawners[1])
+
+    await asyncio.sleep(1)
+    assert polls(spawners[0]) == 1
+    assert polls(spawners[1]) == stopped_polls
+    assert polls(spawners[2]) >= 2
+    for spawner in spawners:
+        spawner.stop_polling()
+    await asyncio.sleep(0)
+    assert not SpawnerPoller.instance()._heap
+
+
+class NotifyingSpawner(BatchPollSpawner):
+    polled = []
+
+    async def poll_and_notify(self):
+        self.polled.append(self)
+        return await super().poll_and_notify()
+
+
+async def test_spawner_poller_poll_and_notify():
+    spawners = [NotifyingSpawner(poll_interval=1) for i in range(3)]
+    NotifyingSpawner.batches = batches = []
+    NotifyingSpawner.polled = polled = []
+    stopped = []
+    spawners[0].add_poll_callback(stopped.append, 'stopped')
+    spawners[0].status = 1
+    for spawner in spawners:
+        spawner.start_polling()
+
+    await asyncio.sleep(1.1)
+    # overridden poll_and_notify is called instead of poll_many
+    assert set(polled) == set(spawners)
+    assert batches == []
+    assert stopped == ['stopped']
+    assert spawners[0]._poll_callback is None
+    for spawner in spawners:
+        spawner.stop_polling()
+    await asyncio.sleep(0)
+    assert not SpawnerPoller.instance()._heap
+
+
 def test_spawner_from_db(app, user):
     spawner = user.spawners['name']
     user_options = {"test": "value"}
@@ -181,6 +273,10 @@ async def test_spawner_poll(db):
     await asyncio.sleep(1)
     status = await spawner.poll()
     assert status is None
+    assert await LocalProcessSpawner.poll_many([spawner, first_spawner]) == [
+        None,
+        None,
+    ]
 
     # kill the process
     proc.terminate()
@@ -196,6 +292,112 @@ async def test_spawner_poll(db):
     assert status is not None
 
 
+@pytest.mark.skipif(not hasattr(os, 'pidfd_open'), reason="needs pidfds")
+async def test_spawner_exit_watch(db):
+    spawner = new_spawner(db, poll_interval=3600)
+    await spawner.start()
+    stopped = asyncio.Event()
+    spawner.add_poll_callback(stopped.set)
+    spawner.start_polling()
+    # exit is noticed long before the next poll
+    spawner.proc.terminate()
+    await asyncio.wait_for(stopped.wait(), timeout=5)
+    assert spawner._poll_callback is None
+    assert spawner.pid == 0
+
+    # waiting for death doesn't poll
+    await spawner.start()
+    spawner.death_interval = 3600
+    spawner.proc.terminate()
+    assert await spawner.wait_for_death(timeout=5)
+    assert spawner.pid == 0
+
+
+async def test_spawner_pool(db):
+    pool = SpawnerPool(LocalProcessSpawner, 1, term_timeout=1, kill_timeout=1)
+    try:
+        pool.fill()
+        await pool._fill_task
+        assert len(pool) == 1
+        pooled_pid = pool._idle[0].pid
+        hits = metrics.SERVER_POOL_REQUESTS.labels(status='hit')._value.get()
+
+        spawner = new_spawner(
+            db,
+            cmd=[sys.executable, '-m', 'jupyterhub.tests.mocksu'],
+            server_pool=pool,
+        )
+        server = orm.Server()
+        db.add(server)
+        db.commit()
+        spawner.server = Server.from_orm(server)
+        spawner.api_token = new_token()
+        ip, port = await spawner.start()
+        # the pooled process became the user's server
+        assert spawner.pid == pooled_pid
+        spawner.server.ip = ip
+        spawner.server.port = port
+        await wait_for_spawner(spawner)
+        r = await async_requests.get('http://%s:%i/env' % (ip, port))
+        r.raise_for_status()
+        env = r.json()
+        assert env['JUPYTERHUB_API_TOKEN'] == spawner.api_token
+        assert env['JUPYTERHUB_USER'] == spawner.user.name
+        assert metrics.SERVER_POOL_REQUESTS.labels(status='hit')._value.get() == (
+            hits + 1
+        )
+
+        # the pool is refilled in the background
+        await pool._fill_task
+        assert len(pool) == 1
+        assert pool._idle[0].pid != pooled_pid
+        await spawner.stop()
+        assert await spawner.poll() is not None
+    finally:
+        await pool.stop()
+    assert len(pool) == 0
+
+
+async def test_spawner_pool_template_error():
+    class BrokenSpawner(LocalProcessSpawner):
+        def __init__(self, **kwargs):
+            raise RuntimeError("misconfigured")
+
+    pool = SpawnerPool(BrokenSpawner, 1)
+    pool.retry_delay = 0.01
+    try:
+        pool.fill()
+        await asyncio.sleep(0.1)
+        # keeps retrying without a template
+        assert not pool._fill_task.done()
+        assert pool.template is None
+        assert len(pool) == 0
+    finally:
+        await pool.stop()
+
+
+def test_pooled_module(db, tmpdir):
+    spawner = new_spawner(db)
+    env = spawner.get_env()
+    env['PATH'] = os.path.dirname(sys.executable)
+    spawner.cmd = [sys.executable, '-m', 'jupyterhub.singleuser']
+    assert spawner._pooled_module(env) == 'jupyterhub.singleuser'
+    # Python reads this on startup
+    assert spawner._pooled_module(dict(env, PYTHONPATH=str(tmpdir))) is None
+
+    # a different Python, e.g. in the user's own env
+    python = tmpdir.join('python')
+    python.mksymlinkto(sys.executable)
+    spawner.cmd = [str(python), '-m', 'jupyterhub.singleuser']
+    assert spawner._pooled_module(env) is None
+    singleuser = tmpdir.join('jupyterhub-singleuser')
+    singleuser.write('#!/bin/sh\n')
+    singleuser.chmod(0o755)
+    spawner.cmd = ['jupyterhub-singleuser']
+    env['PATH'] = str(tmpdir)
+    assert spawner._pooled_module(env) is None
+
+
 def test_setcwd():
     cwd = os.getcwd()
     with tempfile.TemporaryDirectory() as td:
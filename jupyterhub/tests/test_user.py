@@ -1,7 +1,14 @@
+import asyncio
+
 import pytest
+from tornado import web
 
+from .. import metrics
+from .. import objects
 from .. import orm
+from ..user import SpawnQueue
 from ..user import UserDict
+from .mocking import MockSpawner
 from .utils import add_user
 
 
@@ -23,6 +30,117 @@ async def test_userdict_get(db, attr):
     assert key in userdict
 
 
+async def test_userdict_server_counts(db):
+    u = add_user(db, name="finn", app=False)
+    userdict = UserDict(db_factory=lambda: db, settings={'spawner_class': MockSpawner})
+    user = userdict[u.id]
+    spawner = user.spawners['']
+    assert userdict.count_active_users()['active'] == 0
+
+    spawner._spawn_pending = True
+    counts = userdict.count_active_users()
+    assert counts['pending'] == 1
+    assert counts['spawn_pending'] == 1
+    assert counts['active'] == 1
+    assert userdict.check_active_counts()
+
+    orm_server = orm.Server(base_url='/user/finn/')
+    db.add(orm_server)
+    db.commit()
+    spawner.server = objects.Server(orm_server=orm_server)
+    spawner._spawn_pending = False
+    counts = userdict.count_active_users()
+    assert counts['pending'] == 0
+    assert counts['active'] == 1
+    assert counts['ready'] == 1
+    assert userdict.check_active_counts()
+
+    spawner._stop_pending = True
+    assert userdict.count_active_users()['stop_pending'] == 1
+    spawner.server = None
+    spawner._stop_pending = False
+    user.spawners.pop('')
+    counts = userdict.count_active_users()
+    assert counts['active'] == 0
+    assert counts['ready'] == 0
+    assert userdict.check_active_counts()
+
+    # drift is detected and corrected
+    userdict._server_counts['active'] = 5
+    assert not userdict.check_active_counts()
+    assert userdict.count_active_users()['active'] == 0
+
+
+async def test_spawn_queue(db):
+    settings = {
+        'spawner_class': MockSpawner,
+        'concurrent_spawn_limit': 2,
+        'spawn_queue_size': 3,
+        'spawn_queue_timeout': 0,
+        'spawn_queue_group_priority': {'vip': 10},
+    }
+    userdict = UserDict(db_factory=lambda: db, settings=settings)
+    queue = SpawnQueue(userdict, settings)
+    names = ['poe', 'kylo', 'bb', 'leia']
+    users = {}
+    for name in names:
+        users[name] = userdict[add_user(db, name=name, app=False).id]
+    vip = orm.Group(name='vip')
+    vip.users.append(users['leia'].orm_user)
+    db.add(vip)
+    db.commit()
+
+    # poe and one of kylo's servers are spawning, filling the limit
+    users['poe'].spawners['']._spawn_pending = True
+    users['kylo'].spawners['other']._spawn_pending = True
+    assert queue.enabled
+    assert queue.should_queue()
+
+    entries = {}
+    for name in ('kylo', 'bb', 'leia'):
+        entries[name] = entry = queue.add(users[name], '')
+        spawner = users[name].spawners['']
+        spawner._spawn_pending = True
+        spawner._spawn_queue_entry = entry
+    assert queue.full
+    assert metrics.SPAWN_QUEUE_LENGTH._value.get() == 3
+    # group priority first, then users with no spawn in progress
+    positions = {name: queue.position(entry) for name, entry in entries.items()}
+    assert positions == {'leia': 1, 'bb': 2, 'kylo': 3}
+
+    spawner = users['kylo'].spawners['']
+    events = spawner._generate_progress()
+    assert (await events.__anext__())['progress'] == 0
+    event = await events.__anext__()
+    assert event['queue_position'] == 3
+    await events.aclose()
+
+    # poe's spawn finishes, admitting leia
+    users['poe'].spawners['']._spawn_pending = False
+    queue.wake()
+    await asyncio.wait_for(queue.wait(entries['leia']), 5)
+    users['leia'].spawners['']._spawn_queue_entry = None
+    assert queue.position(entries['leia']) == 0
+    assert queue.position(entries['bb']) == 1
+    assert len(queue) == 2
+
+    # kylo gives up waiting
+    settings['spawn_queue_timeout'] = 0.1
+    with pytest.raises(web.HTTPError) as exc:
+        await queue.wait(entries['kylo'])
+    assert exc.value.status_code == 429
+    assert entries['kylo'].future.cancelled()
+    assert len(queue) == 1
+
+    # leia's spawn finishes, admitting bb
+    users['leia'].spawners['']._spawn_pending = False
+    users['kylo'].spawners['']._spawn_pending = False
+    queue.wake()
+    await asyncio.wait_for(queue.wait(entries['bb']), 5)
+    assert len(queue) == 0
+    assert metrics.SPAWN_QUEUE_LENGTH._value.get() == 0
+
+
 @pytest.mark.parametrize(
     "group_names",
     [
@@ -53,3 +171,42 @@ def test_sync_groups(app, user, group_names):
             assert user.orm_user in group.users
         else:
             assert user.orm_user not in group.users
+
+
+async def test_spawn_queue_reorder(db):
+    settings = {
+        'spawner_class': MockSpawner,
+        'concurrent_spawn_limit': 2,
+        'spawn_queue_size': 2,
+    }
+    userdict = UserDict(db_factory=lambda: db, settings=settings)
+    queue = SpawnQueue(userdict, settings)
+    users = {}
+    for name in ('rose', 'han', 'chewie'):
+        users[name] = userdict[add_user(db, name=name, app=False).id]
+
+    # rose and one of han's servers are spawning, filling the limit
+    users['rose'].spawners['']._spawn_pending = True
+    users['han'].spawners['other']._spawn_pending = True
+    entries = {}
+    for name in ('han', 'chewie'):
+        entries[name] = entry = queue.add(users[name], '')
+        spawner = users[name].spawners['']
+        spawner._spawn_pending = True
+        spawner._spawn_queue_entry = entry
+    assert queue.position(entries['chewie']) == 1
+
+    # han's other spawn finishes, while chewie starts another server
+    users['han'].spawners['other']._spawn_pending = False
+    users['chewie'].spawners['other']._spawn_pending = True
+    # rose's spawn finishes, admitting han, who now has fewer spawns in progress
+    users['rose'].spawners['']._spawn_pending = False
+    queue.wake()
+    await asyncio.wait_for(queue.wait(entries['han']), 5)
+    assert queue.position(entries['chewie']) == 1
+    assert len(queue) == 1
+
+    users['han'].spawners['']._spawn_pending = False
+    queue.wake()
+    await asyncio.wait_for(queue.wait(entries['chewie']), 5)
+    assert len(queue) == 0
@@ -1,8 +1,12 @@
 """Tests for utilities"""
 import asyncio
+import hashlib
+import os
 import time
+import timeit
 from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock
+from unittest.mock import patch
 
 import pytest
 from async_generator import aclosing
@@ -11,6 +15,7 @@ from tornado.concurrent import run_on_executor
 from tornado.httpserver import HTTPRequest
 from tornado.httputil import HTTPHeaders
 
+from .. import orm
 from .. import utils
 from ..utils import iterate_until
 
@@ -122,3 +127,85 @@ def test_browser_protocol(x_scheme, x_forwarded_proto, forwarded, expected):
 
     proto = utils.get_browser_protocol(request)
     assert proto == expected
+
+
+@pytest.mark.parametrize(
+    "algorithm, rounds",
+    [
+        ("sha512", 1),
+        ("sha512", 16384),
+        ("pbkdf2_sha512", 1),
+        ("pbkdf2_sha512", 1000),
+    ],
+)
+def test_hash_token(algorithm, rounds):
+    token = "abc123-secret"
+    hashed = utils.hash_token(token, rounds=rounds, algorithm=algorithm)
+    algo, srounds, salt, digest = hashed.split(":")
+    assert algo == algorithm
+    assert srounds == str(rounds)
+    assert utils.compare_token(hashed, token)
+    assert not utils.compare_token(hashed, token + "x")
+    # same salt, same hash
+    assert utils.hash_token(token, salt=salt, rounds=rounds, algorithm=algo) == hashed
+
+
+def _loop_hash_token(token, salt, rounds=16384):
+    """The original pure-Python implementation of sha512 token hashing"""
+    h = hashlib.sha512(salt.encode("utf8"))
+    btoken = token.encode("utf8")
+    for i in range(rounds):
+        h.update(btoken)
+    return f"sha512:{rounds}:{salt}:{h.hexdigest()}"
+
+
+def test_hash_token_legacy_digest():
+    """sha512 hashes match the original one-update-per-round scheme"""
+    for token in ("x" * 100, "y" * 2000):
+        expected = _loop_hash_token(token, "salt")
+        assert utils.hash_token(token, salt="salt", rounds=16384) == expected
+
+
+def test_compare_token_scheme():
+    """compare_token uses the algorithm and rounds recorded in the hash"""
+    token = "my-secret-api-token-from-config"
+    legacy = utils.hash_token(token, rounds=16384, algorithm="sha512")
+    current = utils.hash_token(token, rounds=1000, algorithm="pbkdf2_sha512")
+    with patch.object(
+        utils.hashlib, "pbkdf2_hmac", wraps=hashlib.pbkdf2_hmac
+    ) as pbkdf2_hmac:
+        assert utils.compare_token(current, token)
+        assert not utils.compare_token(current, token + "x")
+        assert pbkdf2_hmac.call_count == 2
+        algorithm, btoken, salt, rounds = pbkdf2_hmac.call_args[0]
+        assert algorithm == "sha512"
+        assert rounds == 1000
+        assert salt == current.split(":")[2].encode("utf8")
+
+        # sha512 hashes don't use pbkdf2
+        assert utils.compare_token(legacy, token)
+        assert pbkdf2_hmac.call_count == 2
+
+
+@pytest.mark.skipif(
+    not os.environ.get("JUPYTERHUB_TEST_BENCHMARK"),
+    reason="set $JUPYTERHUB_TEST_BENCHMARK to run benchmarks",
+)
+def test_compare_token_benchmark(capsys):
+    """Report per-check cost of token hashing schemes"""
+    token = "my-secret-api-token-from-config"
+    n = 5
+    legacy = utils.hash_token(token, rounds=16384, algorithm="sha512")
+    salt = legacy.split(":")[2]
+    current = utils.hash_token(
+        token, rounds=orm.Hashed.rounds, algorithm=orm.Hashed.algorithm
+    )
+    loop_time = timeit.timeit(lambda: _loop_hash_token(token, salt), number=n)
+    legacy_time = timeit.timeit(lambda: utils.compare_token(legacy, token), number=n)
+    current_time = timeit.timeit(lambda: utils.compare_token(current, token), number=n)
+    with capsys.disabled():
+        print(
+            f"\nper-check cost: sha512 loop {1e3 * loop_time / n:.2f}ms,"
+            f" sha512 {1e3 * legacy_time / n:.2f}ms,"
+            f" {orm.Hashed.algorithm}:{orm.Hashed.rounds} {1e3 * current_time / n:.2f}ms"
+        )
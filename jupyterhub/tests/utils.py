@@ -2,9 +2,11 @@ import asyncio
 import inspect
 import os
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import pytest
 import requests
+import sqlalchemy as sa
 from certipy import Certipy
 
 from jupyterhub import metrics
@@ -105,6 +107,37 @@ def check_db_locks(func):
     return new_func
 
 
+@contextmanager
+def count_queries(db, match=None):
+    """Record the SQL statements executed on a database session's engine
+
+    Yields the list of statements, which fills up until the context exits.
+    If `match` is given, only statements for which `match(statement)`
+    is true are recorded.
+
+    Examples
+    --------
+        with count_queries(db) as queries:
+            db.query(orm.User).all()
+        assert len(queries) == 1
+
+    """
+    queries = []
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        if match is None or match(statement):
+            queries.append(statement)
+
+    engine = db.get_bind()
+    sa.event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
 def find_user(db, name, app=None):
     """Find user in database."""
     orm_user = db.query(orm.User).filter(orm.User.name == name).first()
@@ -1,8 +1,12 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
+import asyncio
 import json
+import math
+import time
 import warnings
 from collections import defaultdict
+from collections import deque
 from datetime import datetime
 from datetime import timedelta
 from urllib.parse import quote
@@ -23,6 +27,10 @@ from .crypto import encrypt
 from .crypto import EncryptionUnavailable
 from .crypto import InvalidToken
 from .metrics import RUNNING_SERVERS
+from .metrics import SPAWN_QUEUE_ADMITTED
+from .metrics import SPAWN_QUEUE_LENGTH
+from .metrics import SPAWN_QUEUE_WAIT_DURATION_SECONDS
+from .metrics import SpawnQueueStatus
 from .metrics import TOTAL_USERS
 from .objects import Server
 from .spawner import LocalProcessSpawner
@@ -86,6 +94,9 @@ class UserDict(dict):
     def __init__(self, db_factory, settings):
         self.db_factory = db_factory
         self.settings = settings
+        # counts of active/pending/ready servers,
+        # updated by Spawners on every change of state
+        self._server_counts = defaultdict(int)
         super().__init__()
 
     @property
@@ -93,7 +104,9 @@ class UserDict(dict):
         return self.db_factory()
 
     def from_orm(self, orm_user):
-        return User(orm_user, self.settings)
+        user = User(orm_user, self.settings)
+        user.spawners.server_counts = self._server_counts
+        return user
 
     def add(self, orm_user):
         """Add a user to the UserDict"""
@@ -136,7 +149,7 @@ class UserDict(dict):
             # users[orm_user] returns User(orm_user)
             orm_user = key
             if orm_user.id not in self:
-                user = self[orm_user.id] = User(orm_user, self.settings)
+                user = self[orm_user.id] = self.from_orm(orm_user)
                 return user
             user = super().__getitem__(orm_user.id)
             user.db = self.db
@@ -170,6 +183,10 @@ class UserDict(dict):
 
     def __delitem__(self, key):
         user = self[key]
+        for spawner in user.spawners.values():
+            # removed users no longer contribute to server counts
+            spawner._track_server_counts(None)
+        user.spawners.server_counts = None
         for orm_spawner in user.orm_user._orm_spawners:
             if orm_spawner in self.db:
                 self.db.expunge(orm_spawner)
@@ -190,8 +207,19 @@ class UserDict(dict):
     def count_active_users(self):
         """Count the number of user servers that are active/pending/ready
 
+        Counts are updated incrementally by Spawners as their state changes,
+        so this does not need to scan all users.
+
         Returns dict with counts of active/pending/ready servers
         """
+        return defaultdict(int, self._server_counts)
+
+    def _scan_active_users(self):
+        """Count active/pending/ready servers by scanning all users and spawners
+
+        This is the full O(servers) scan that count_active_users avoids,
+        used to verify the incremental counts.
+        """
         counts = defaultdict(lambda: 0)
         for user in self.values():
             for spawner in user.spawners.values():
@@ -206,16 +234,328 @@ class UserDict(dict):
 
         return counts
 
+    def check_active_counts(self):
+        """Check the incremental server counts against a full scan
+
+        Inconsistencies are logged and the counts are reset from the scan.
+
+        Returns True if the counts were consistent, False otherwise.
+        """
+        scanned = self._scan_active_users()
+        counts = self.count_active_users()
+        mismatched = {
+            key: (counts[key], scanned[key])
+            for key in set(counts).union(scanned)
+            if counts[key] != scanned[key]
+        }
+        if not mismatched:
+            app_log.debug("Server counts consistent: %s", dict(scanned))
+            return True
+
+        app_log.warning("Server counts out of sync (counted, scanned): %s", mismatched)
+        # resynchronize every spawner with fresh counts
+        self._server_counts.clear()
+        for user in self.values():
+            for spawner in user.spawners.values():
+                spawner._counted_keys = ()
+                spawner._update_server_counts()
+        return False
+
+
+class _SpawnQueueEntry:
+    """A spawn request waiting in a SpawnQueue"""
+
+    def __init__(self, queue, user, server_name, priority, seq):
+        self.queue = queue
+        self.user = user
+        self.server_name = server_name
+        self.priority = priority
+        self.seq = seq
+        self.queued_at = time.perf_counter()
+        # resolved when the spawn is admitted, cancelled if it leaves the queue
+        self.future = asyncio.Future()
+
+    @property
+    def admitted(self):
+        return self.future.done() and not self.future.cancelled()
+
+    @property
+    def _log_name(self):
+        if self.server_name:
+            return f'{self.user.name}:{self.server_name}'
+        return self.user.name
+
+
+class SpawnQueue:
+    """Admission queue for spawns over `concurrent_spawn_limit`
+
+    Instead of being rejected, spawn requests over the limit wait here.
+    Each time a spawn finishes, waiting requests are admitted in order of:
+
+    1. highest priority of the user's groups (`spawn_queue_group_priority`)
+    2. fewest spawns already in progress for the same user
+    3. first come, first served
+
+    Configuration is read from the tornado settings,
+    so changes to the limits take effect immediately.
+
+    .. versionadded:: 2.3
+    """
+
+    # how often to re-check for free slots,
+    # in case a spawn stops being pending without waking the queue
+    check_interval = 1
+
+    # number of recent admissions used to estimate the admission rate
+    rate_window = 20
+
+    def __init__(self, users, settings):
+        self.users = users
+        self.settings = settings
+        self._entries = []
+        self._seq = 0
+        self._order = None
+        self._admitted_times = deque(maxlen=self.rate_window)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        return bool(
+            self.settings.get('concurrent_spawn_limit', 0)
+            and self.settings.get('spawn_queue_size', 0)
+        )
+
+    @property
+    def full(self):
+        return len(self._entries) >= self.settings.get('spawn_queue_size', 0)
+
+    def _in_flight(self):
+        """The number of spawns in progress that are not waiting in the queue"""
+        counts = self.users.count_active_users()
+        pending = counts['spawn_pending'] + counts['proxy_pending']
+        # queued spawns are already marked as pending spawns
+        return pending - len(self._entries)
+
+    def should_queue(self):
+        """Whether a new spawn request has to wait for admission
+
+        New requests never skip ahead of requests that are already waiting.
+        """
+        limit = self.settings.get('concurrent_spawn_limit', 0)
+        if not limit:
+            return False
+        return bool(self._entries) or self._in_flight() >= limit
+
+    def _priority(self, user):
+        group_priority = self.settings.get('spawn_queue_group_priority') or {}
+        if not group_priority:
+            return 0
+        return max(
+            (group_priority.get(group.name, 0) for group in user.groups), default=0
+        )
+
+    def _sort_key(self, entry):
+        user_pending = sum(
+            1
+            for name, spawner in entry.user.spawners.items()
+            if spawner.pending == 'spawn' and not self._is_queued(entry.user, name)
+        )
+        return (-entry.priority, user_pending, entry.seq)
+
+    def _is_queued(self, user, server_name):
+        spawner = user.spawners.get(server_name)
+        return spawner is not None and spawner._spawn_queue_entry is not None
+
+    def _ordered(self):
+        if self._order is None:
+            self._order = sorted(self._entries, key=self._sort_key)
+        return self._order
+
+    def add(self, user, server_name=''):
+        """Add a spawn request to the queue
+
+        Returns the queue entry to pass to :meth:`wait`.
+        """
+        self._seq += 1
+        entry = _SpawnQueueEntry(
+            self, user, server_name, self._priority(user), self._seq
+        )
+        self._entries.append(entry)
+        self._order = None
+        SPAWN_QUEUE_LENGTH.set(len(self._entries))
+        app_log.info(
+            "Queued spawn for %s, %i waiting", entry._log_name, len(self._entries)
+        )
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        else:
+            self.wake()
+        return entry
+
+    def _remove(self, entry, status):
+        if entry in self._entries:
+            self._entries.remove(entry)
+            self._order = None
+            SPAWN_QUEUE_LENGTH.set(len(self._entries))
+            SPAWN_QUEUE_WAIT_DURATION_SECONDS.labels(status=status).observe(
+                time.perf_counter() - entry.queued_at
+            )
+        if not entry.future.done():
+            entry.future.cancel()
+
+    async def wait(self, entry):
+        """Wait for a queued spawn request to be admitted
+
+        Raises 429 if it is not admitted within `spawn_queue_timeout`.
+        """
+        timeout = self.settings.get('spawn_queue_timeout', 0) or None
+        try:
+            await asyncio.wait_for(asyncio.shield(entry.future), timeout)
+        except AnyTimeoutError:
+            if entry.admitted:
+                # admitted just in time
+                return
+            self._remove(entry, SpawnQueueStatus.timeout)
+            app_log.warning(
+                "Spawn for %s not admitted after %s seconds", entry._log_name, timeout
+            )
+            raise web.HTTPError(
+                429,
+                "Too many users trying to start servers right now. Try again later.",
+            )
+        except asyncio.CancelledError:
+            self._remove(entry, SpawnQueueStatus.cancelled)
+            raise
+
+    def wake(self):
+        """Signal that a spawn slot may be free"""
+        self._wakeup.set()
+
+    def _admit(self):
+        limit = self.settings.get('concurrent_spawn_limit', 0)
+        in_flight = self._in_flight()
+        # spawns in progress may have changed since the queue was last sorted
+        self._order = None
+        while self._entries and (not limit or in_flight < limit):
+            entry = self._ordered()[0]
+            self._entries.remove(entry)
+            self._order = None
+            wait = time.perf_counter() - entry.queued_at
+            SPAWN_QUEUE_LENGTH.set(len(self._entries))
+            SPAWN_QUEUE_WAIT_DURATION_SECONDS.labels(
+                status=SpawnQueueStatus.admitted
+            ).observe(wait)
+            SPAWN_QUEUE_ADMITTED.inc()
+            self._admitted_times.append(time.perf_counter())
+            app_log.info(
+                "Admitted spawn for %s after %.3f seconds in queue",
+                entry._log_name,
+                wait,
+            )
+            entry.future.set_result(None)
+            # the admitted spawn is no longer subtracted as queued
+            in_flight += 1
+
+    async def _run(self):
+        """Admit waiting spawns whenever a slot is free"""
+        while self._entries:
+            self._admit()
+            if not self._entries:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def position(self, entry):
+        """Return the 1-based position of entry in the queue, or 0 if admitted"""
+        try:
+            return self._ordered().index(entry) + 1
+        except ValueError:
+            return 0
+
+    def estimate_wait(self, position):
+        """Estimate the seconds until a request at position is admitted
+
+        Based on the recent admission rate.
+        Returns None if there is no recent admission to go by.
+        """
+        times = self._admitted_times
+        if len(times) < 2:
+            return None
+        span = times[-1] - times[0]
+        if span <= 0:
+            return None
+        rate = (len(times) - 1) / span
+        # the time since the last admission counts towards the next one
+        elapsed = time.perf_counter() - times[-1]
+        return max(position / rate - elapsed, 0)
+
+    async def progress(self, entry, interval=5):
+        """Yield progress events while entry waits in the queue
+
+        An event is sent whenever the position in the queue changes.
+        """
+        last_position = None
+        while not entry.future.done():
+            position = self.position(entry)
+            if position and position != last_position:
+                last_position = position
+                wait = self.estimate_wait(position)
+                message = f"Waiting to start, number {position} in line"
+                if wait is not None:
+                    message += f" (about {_human_seconds(wait)})"
+                yield {
+                    "message": message,
+                    "queue_position": position,
+                    "queue_wait": None if wait is None else round(wait),
+                }
+            await asyncio.wait([entry.future], timeout=interval)
+
+
+def _human_seconds(seconds):
+    """Round a number of seconds to a human-friendly duration"""
+    if seconds < 90:
+        return "%i seconds" % (10 * math.ceil(seconds / 10))
+    return "%i minutes" % round(seconds / 60)
+
 
 class _SpawnerDict(dict):
     def __init__(self, spawner_factory):
         self.spawner_factory = spawner_factory
+        # server counts of the UserDict this user belongs to, if any
+        self.server_counts = None
 
     def __getitem__(self, key):
         if key not in self:
             self[key] = self.spawner_factory(key)
         return super().__getitem__(key)
 
+    def __setitem__(self, key, spawner):
+        old_spawner = super().get(key)
+        if old_spawner is not None and old_spawner is not spawner:
+            old_spawner._track_server_counts(None)
+        super().__setitem__(key, spawner)
+        if self.server_counts is not None:
+            spawner._track_server_counts(self.server_counts)
+
+    def __delitem__(self, key):
+        spawner = super().__getitem__(key)
+        super().__delitem__(key)
+        spawner._track_server_counts(None)
+
+    def pop(self, key, *args):
+        if key not in self:
+            return super().pop(key, *args)
+        spawner = super().pop(key)
+        spawner._track_server_counts(None)
+        return spawner
+
 
 class User:
     """High-level wrapper around an orm.User object"""
@@ -429,6 +769,7 @@ class User:
             cookie_options=self.settings.get('cookie_options', {}),
             trusted_alt_names=trusted_alt_names,
             user_options=orm_spawner.user_options or {},
+            server_pool=self.settings.get('server_pool'),
         )
 
         if self.settings.get('internal_ssl'):
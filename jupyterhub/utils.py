@@ -339,11 +339,17 @@ def new_token(*args, **kwargs):
 
 
 def hash_token(token, salt=8, rounds=16384, algorithm='sha512'):
-    """Hash a token, and return it as `algorithm:salt:hash`.
+    """Hash a token, and return it as `algorithm:rounds:salt:hash`.
 
     If `salt` is an integer, a random salt of that many bytes will be used.
+
+    `algorithm` may be any hashlib algorithm, hashing the salt followed by
+    `rounds` copies of the token,
+    or `pbkdf2_<algorithm>` for PBKDF2-HMAC with `rounds` iterations.
+
+    .. versionchanged:: 2.3
+        Added `pbkdf2_` algorithms.
     """
-    h = hashlib.new(algorithm)
     if isinstance(salt, int):
         salt = b2a_hex(secrets.token_bytes(salt))
     if isinstance(salt, bytes):
@@ -352,14 +358,32 @@ def hash_token(token, salt=8, rounds=16384, algorithm='sha512'):
     else:
         bsalt = salt.encode('utf8')
     btoken = token.encode('utf8', 'replace')
-    h.update(bsalt)
-    for i in range(rounds):
-        h.update(btoken)
-    digest = h.hexdigest()
+    if algorithm.startswith('pbkdf2_'):
+        digest = hashlib.pbkdf2_hmac(
+            algorithm[len('pbkdf2_') :], btoken, bsalt, rounds
+        ).hex()
+    else:
+        h = hashlib.new(algorithm)
+        h.update(bsalt)
+        # same result as calling h.update(btoken) once per round,
+        # but passing many copies at a time runs at C speed.
+        # Copies are chunked to bound memory for long tokens.
+        copies_per_chunk = max(1, _hash_chunk_size // max(len(btoken), 1))
+        chunks, remainder = divmod(rounds, copies_per_chunk)
+        if chunks:
+            chunk = btoken * copies_per_chunk
+            for i in range(chunks):
+                h.update(chunk)
+        h.update(btoken * remainder)
+        digest = h.hexdigest()
 
     return f"{algorithm}:{rounds}:{salt}:{digest}"
 
 
+# max bytes of repeated token to hash at once in hash_token
+_hash_chunk_size = 1 << 16
+
+
 def compare_token(compare, token):
     """Compare a token with a hashed token.
 
@@ -375,6 +399,16 @@ def compare_token(compare, token):
     return False
 
 
+def token_lookup_key(token):
+    """Return a deterministic digest of a token, for indexed lookup.
+
+    Unlike :func:`hash_token`, this is unsalted,
+    so it should only be stored for generated tokens,
+    which have enough entropy on their own.
+    """
+    return hashlib.sha256(token.encode('utf8', 'replace')).hexdigest()
+
+
 def url_path_join(*pieces):
     """Join components of url into a relative url.
 
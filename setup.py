@@ -104,6 +104,7 @@ setup_args = dict(
         'jupyterhub.proxies': [
             'default = jupyterhub.proxy:ConfigurableHTTPProxy',
             'configurable-http-proxy = jupyterhub.proxy:ConfigurableHTTPProxy',
+            'file = jupyterhub.proxy:FileProxy',
         ],
         'jupyterhub.spawners': [
             'default = jupyterhub.spawner:LocalProcessSpawner',